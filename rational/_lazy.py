@@ -0,0 +1,46 @@
+"""
+_lazy.py
+====================================
+Module level lazy loading (PEP 562) for the rational sub-packages.
+
+The backends (torch, keras, mxnet) and the fitting utilities (scipy,
+matplotlib) are expensive to import. The sub-packages only declare which
+attribute lives in which module, and the module is imported on first access.
+"""
+import importlib
+import sys
+
+
+def lazy_attributes(package_name, attributes):
+    """
+    Builds the module level ``__getattr__`` and ``__dir__`` of a package.
+
+    Arguments:
+            package_name (str):
+                The ``__name__`` of the package.\n
+            attributes (dict):
+                Maps every public attribute name to the (relative) module \
+                defining it, e.g. ``{"Rational": ".rationals"}``.\n
+    Returns:
+        tuple: (__getattr__, __dir__, __all__) to be set in the package.
+    """
+    package = sys.modules[package_name]
+
+    def __getattr__(name):
+        if name not in attributes:
+            raise AttributeError(f"module {package_name!r} has no attribute "
+                                 f"{name!r}")
+        module = importlib.import_module(attributes[name], package_name)
+        value = getattr(module, name)
+        # cache it, further accesses do not go through __getattr__
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(package)) | set(attributes))
+
+    if sys.version_info < (3, 7):
+        # module level __getattr__ is not supported, import everything
+        for name in attributes:
+            __getattr__(name)
+    return __getattr__, __dir__, sorted(attributes)
@@ -0,0 +1,8 @@
+from rational._lazy import lazy_attributes
+
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    "Rational": ".rationals",
+    "init_params": ".rationals",
+    "apply": ".rationals",
+    "rational_function": ".rational_jax_functions",
+})
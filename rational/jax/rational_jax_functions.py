@@ -0,0 +1,158 @@
+"""
+Rational functions in JAX, evaluated with Horner's scheme. Their gradients
+are the closed-form ones of the CUDA kernels (see `rational/_cuda/versions`),
+through `jax.custom_vjp`: only the inputs and coefficients are kept for the
+backward pass, that recomputes P, Q and their derivatives with Horner's
+scheme as well.
+"""
+from functools import partial
+
+import jax
+import jax.numpy as jnp
+
+
+def _horner(x, coefficients):
+    # c_0 + c_1 * x + ... + c_n * x^n, without the powers of x
+    result = jnp.full_like(x, coefficients[-1])
+    for i in range(len(coefficients) - 2, -1, -1):
+        result = result * x + coefficients[i]
+    return result
+
+
+def _horner_with_derivative(x, coefficients):
+    # the polynomial and its derivative
+    result = jnp.full_like(x, coefficients[-1])
+    derivative = jnp.zeros_like(x)
+    for i in range(len(coefficients) - 2, -1, -1):
+        derivative = derivative * x + result
+        result = result * x + coefficients[i]
+    return result, derivative
+
+
+def _power_sums(factor, x, nb_powers):
+    # the sums of factor * x^i over all the elements, for i < nb_powers
+    sums = []
+    for i in range(nb_powers):
+        if i > 0:
+            factor = factor * x
+        sums.append(jnp.sum(factor))
+    return jnp.stack(sums)
+
+
+def _denominator(x, denominator, version):
+    # Q(x), denominator being b_1, ... b_m (b_0, ... b_m for C)
+    if version == "A":
+        # |b_j * x^j| = |b_j| * |x|^j
+        abs_x = jnp.abs(x)
+        return 1. + abs_x * _horner(abs_x, jnp.abs(denominator))
+    if version == "C":
+        return 0.1 + jnp.abs(_horner(x, denominator))
+    return 1. + jnp.abs(x * _horner(x, denominator))
+
+
+@partial(jax.custom_vjp, nondiff_argnums=(3,))
+def rational_function(x, numerator, denominator, version="A"):
+    """
+    P(x) / Q(x) of the given version (`A`, `B` or `C`), elementwise, with \
+    shared coefficients.
+
+    Arguments:
+            x (array):
+                The inputs.\n
+            numerator (array):
+                The coefficients a_0, ... a_n of P.\n
+            denominator (array):
+                The coefficients b_1, ... b_m of Q (b_0, ... b_m for `C`).\n
+            version (str):
+                Version of Rational.\n
+                Default ``A``
+    Returns:
+        array: the outputs, in the dtype of `x`
+    """
+    numerator = numerator.astype(x.dtype)
+    denominator = denominator.astype(x.dtype)
+    return _horner(x, numerator) / _denominator(x, denominator, version)
+
+
+def _rational_forward(x, numerator, denominator, version):
+    return rational_function(x, numerator, denominator, version), \
+        (x, numerator, denominator)
+
+
+def _rational_backward(version, residuals, upstream):
+    x, numerator, denominator = residuals
+    num_coefficients = numerator.astype(x.dtype)
+    den_coefficients = denominator.astype(x.dtype)
+    p, p_derivative = _horner_with_derivative(x, num_coefficients)
+    # q, dq/dx, and the factor of dq/db_j = factor * base^(j-1) (base^j for C)
+    if version == "A":
+        abs_x = jnp.abs(x)
+        h, h_derivative = _horner_with_derivative(abs_x,
+                                                  jnp.abs(den_coefficients))
+        q = 1. + abs_x * h
+        q_derivative = jnp.sign(x) * (h + abs_x * h_derivative)
+        den_base, den_factor = abs_x, abs_x
+    elif version == "C":
+        r, r_derivative = _horner_with_derivative(x, den_coefficients)
+        q = 0.1 + jnp.abs(r)
+        q_derivative = jnp.sign(r) * r_derivative
+        den_base, den_factor = x, jnp.sign(r)
+    else:
+        h, h_derivative = _horner_with_derivative(x, den_coefficients)
+        sign = jnp.sign(x * h)
+        q = 1. + jnp.abs(x * h)
+        q_derivative = sign * (h + x * h_derivative)
+        den_base, den_factor = x, sign * x
+    upstream_q = upstream / q
+    y = p / q
+    d_x = upstream_q * (p_derivative - y * q_derivative)
+    d_numerator = _power_sums(upstream_q, x, len(numerator))
+    d_denominator = _power_sums(- upstream_q * y * den_factor, den_base,
+                                len(denominator))
+    if version == "A":
+        d_denominator = d_denominator * jnp.sign(den_coefficients)
+    return (d_x, d_numerator.astype(numerator.dtype),
+            d_denominator.astype(denominator.dtype))
+
+
+rational_function.defvjp(_rational_forward, _rational_backward)
+
+
+def noised_numerator(key, numerator, random_deviation=0.1):
+    """
+    The coefficients of P of version `D`, each one multiplied by a uniform \
+    noise in [1 - random_deviation, 1 + random_deviation] drawn from `key`.
+    """
+    noise = jax.random.uniform(key, numerator.shape, numerator.dtype,
+                               1 - random_deviation, 1 + random_deviation)
+    return numerator * noise
+
+
+def Rational_JAX_A_F(x, weight_numerator, weight_denominator, key=None):
+    # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X^n /
+    #               1 + | b_1 * X | + | b_2 * X^2| + ... + | b_m * X ^m|
+    return rational_function(x, weight_numerator, weight_denominator, "A")
+
+
+def Rational_JAX_B_F(x, weight_numerator, weight_denominator, key=None):
+    # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X^n /
+    #               1 + |b_1 * X + b_1 * X^2 + ... + b_m * X^m|
+    return rational_function(x, weight_numerator, weight_denominator, "B")
+
+
+def Rational_JAX_C_F(x, weight_numerator, weight_denominator, key=None):
+    # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X^n /
+    #               eps + |b_0 + b1 * X + b_2 * X^2 + ... + b_m*X^m|
+    return rational_function(x, weight_numerator, weight_denominator, "C")
+
+
+def Rational_JAX_D_F(x, weight_numerator, weight_denominator, key=None,
+                     random_deviation=0.1):
+    # P(X)/Q(X) = noised(a_0) + noised(a_1) * X + ... + noised(a_n) * X^n /
+    #                1 + |b_1 * X + b_2 * X^2 + ... + b_m*X^m|
+    # The noise of every coefficient is drawn from `key` (deterministic), as
+    # the pytorch version: without key (inference), it is version B.
+    if key is not None:
+        weight_numerator = noised_numerator(key, weight_numerator,
+                                            random_deviation)
+    return rational_function(x, weight_numerator, weight_denominator, "B")
@@ -0,0 +1,152 @@
+import jax
+import jax.numpy as jnp
+
+from rational.jax.rational_jax_functions import Rational_JAX_A_F, \
+    Rational_JAX_B_F, Rational_JAX_C_F, Rational_JAX_D_F, noised_numerator
+from rational.utils.get_weights import get_parameters
+
+_functions = {"A": Rational_JAX_A_F, "B": Rational_JAX_B_F,
+              "C": Rational_JAX_C_F, "D": Rational_JAX_D_F}
+
+
+def init_params(approx_func="leaky_relu", degrees=(5, 4), version="A",
+                channels=None, dtype=jnp.float32):
+    """
+    Returns the initial coefficients of a rational function, e.g. for the \
+    parameters of a Flax (``self.param``) or Haiku (``hk.get_parameter``) \
+    module.
+
+    Arguments:
+            approx_func (str):
+                The name of the approximated function for initialisation. \
+                The different initialable functions are available in \
+                `rational.rationals_config.json`. \n
+                Default ``leaky_relu``.
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            version (str):
+                Version of Rational to use.\n
+                Default ``A``
+            channels (int):
+                If not ``None``, the number of channels, each one with its \
+                own coefficients (leading axis of the coefficients).\n
+                Default ``None``
+            dtype (dtype):
+                The dtype of the coefficients.\n
+                Default ``float32``
+    Returns:
+        dict: {"numerator": array, "denominator": array}
+    """
+    w_numerator, w_denominator = get_parameters(version, degrees, approx_func)
+    numerator = jnp.asarray(w_numerator, dtype)
+    denominator = jnp.asarray(w_denominator, dtype)
+    if channels is not None:
+        numerator = jnp.tile(numerator, (channels, 1))
+        denominator = jnp.tile(denominator, (channels, 1))
+    return {"numerator": numerator, "denominator": denominator}
+
+
+def apply(params, x, version="A", axis=-1, key=None, random_deviation=0.1):
+    """
+    Applies the rational function of coefficients `params` to `x`, as a \
+    pure function (jit, grad and vmap compatible).
+
+    Arguments:
+            params (dict):
+                The coefficients (see :func:`init_params`), either shared \
+                (1D) or per channel (2D, one row per channel of `x`).\n
+            x (array):
+                The inputs.\n
+            version (str):
+                Version of Rational to use.\n
+                Default ``A``
+            axis (int):
+                The channel axis of `x`, for per channel coefficients.\n
+                Default ``-1``
+            key (PRNGKey):
+                The key of the noise of version `D` (training). Without \
+                key, version `D` is not noised.\n
+                Default ``None``
+            random_deviation (float):
+                The relative deviation of the noise of version `D`.\n
+                Default ``0.1``
+    Returns:
+        array: the outputs, of the shape and dtype of `x`
+    """
+    if version not in _functions:
+        raise ValueError("version %s not implemented" % version)
+    numerator, denominator = params["numerator"], params["denominator"]
+    if version == "D" and key is not None:
+        # drawn once for every channel, outside of vmap
+        numerator = noised_numerator(key, numerator, random_deviation)
+        version = "B"
+    function = _functions[version]
+    if numerator.ndim == 1:
+        return function(x, numerator, denominator)
+    per_channel = jax.vmap(function, in_axes=(axis % x.ndim, 0, 0),
+                           out_axes=axis % x.ndim)
+    return per_channel(x, numerator, denominator)
+
+
+class Rational():
+    """
+    Rational activation function based on JAX
+
+    Arguments:
+            approx_func (str):
+                The name of the approximated function for initialisation. \
+                The different initialable functions are available in \
+                `rational.rationals_config.json`. \n
+                Default ``leaky_relu``.
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            version (str):
+                Version of Rational to use. Rational(x) = P(x)/Q(x)\n
+                `A`: Q(x) = 1 + \\|b_1.x\\| + \\|b_2.x\\| + ... + \\|b_n.x\\|\n
+                `B`: Q(x) = 1 + \\|b_1.x + b_2.x + ... + b_n.x\\|\n
+                `C`: Q(x) = 0.1 + \\|b_1.x + b_2.x + ... + b_n.x\\|\n
+                `D`: like `B` with noise\n
+                Default ``A``
+            channels (int):
+                If not ``None``, the number of channels (along `axis`), \
+                each one with its own coefficients.\n
+                Default ``None``
+            axis (int):
+                The channel axis of the inputs.\n
+                Default ``-1``
+    Returns:
+        Module: Rational module, whose coefficients are `params`, to be \
+        used with :func:`apply` in transformed functions.
+    """
+    def __init__(self, approx_func="leaky_relu", degrees=(5, 4), version="A",
+                 channels=None, axis=-1):
+        if version not in _functions:
+            raise ValueError("version %s not implemented" % version)
+        self.params = init_params(approx_func, degrees, version, channels)
+        self.init_approximation = approx_func
+        self.degrees = degrees
+        self.version = version
+        self.channels = channels
+        self.axis = axis
+
+    @property
+    def numerator(self):
+        return self.params["numerator"]
+
+    @property
+    def denominator(self):
+        return self.params["denominator"]
+
+    def __call__(self, x, params=None, key=None):
+        """
+        Applies the rational function, with its coefficients or `params`, \
+        version `D` being noised if a PRNG `key` is given.
+        """
+        return apply(self.params if params is None else params, x,
+                     self.version, self.axis, key)
+
+    def __repr__(self):
+        return (f"Rational Activation Function (JAX version "
+                f"{self.version}) of degrees {self.degrees}")
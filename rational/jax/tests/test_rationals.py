@@ -0,0 +1,92 @@
+"""
+This file tests the JAX rational functions against the numpy ones, and their
+analytic gradients against the automatic differentiation of the evaluation
+with the powers of x.
+"""
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+from rational.jax import Rational, apply, init_params, rational_function
+from rational.numpy.rationals import rational_horner
+
+rng = np.random.default_rng(0)
+
+
+@pytest.fixture(autouse=True)
+def enable_x64():
+    # float64 for the comparisons, restored after every test
+    if hasattr(jax, "enable_x64"):
+        context = jax.enable_x64()
+    else:
+        from jax.experimental import enable_x64 as context_manager
+        context = context_manager()
+    with context:
+        yield
+
+
+def _reference(x, numerator, denominator, version):
+    numerator_powers = sum(numerator[i] * x ** i
+                           for i in range(len(numerator)))
+    if version == "A":
+        denominator_powers = 1. + sum(jnp.abs(denominator[j] * x ** (j + 1))
+                                      for j in range(len(denominator)))
+    elif version == "C":
+        denominator_powers = 0.1 + jnp.abs(sum(denominator[j] * x ** j for j
+                                               in range(len(denominator))))
+    else:
+        denominator_powers = 1. + jnp.abs(sum(denominator[j] * x ** (j + 1)
+                                              for j in range(len(denominator))))
+    return numerator_powers / denominator_powers
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C"])
+def test_rational_function(version):
+    x = jnp.asarray(rng.uniform(-3., 3., (16, 8)))
+    numerator = jnp.asarray(rng.standard_normal(6))
+    denominator = jnp.asarray(rng.standard_normal(5 if version == "C" else 4))
+    outputs = jax.jit(rational_function, static_argnums=3)(
+        x, numerator, denominator, version)
+    assert np.allclose(outputs, rational_horner(np.asarray(x), numerator,
+                                                denominator, version))
+    upstream = jnp.asarray(rng.standard_normal(x.shape))
+
+    def loss(function):
+        return lambda *args: jnp.sum(function(*args, version) * upstream)
+
+    gradients = jax.jit(jax.grad(loss(rational_function), (0, 1, 2)))(
+        x, numerator, denominator)
+    expected = jax.grad(loss(_reference), (0, 1, 2))(x, numerator, denominator)
+    for gradient, reference in zip(gradients, expected):
+        assert np.allclose(gradient, reference)
+
+
+def test_per_channel():
+    x = jnp.asarray(rng.uniform(-3., 3., (4, 3, 10)))
+    params = init_params("tanh", version="B", channels=3)
+    params = {name: value * jnp.asarray(rng.uniform(0.5, 1.5, value.shape))
+              for name, value in params.items()}
+    outputs = apply(params, x, "B", axis=1)
+    for channel in range(3):
+        expected = rational_function(x[:, channel], params["numerator"][channel],
+                                     params["denominator"][channel], "B")
+        assert np.allclose(outputs[:, channel], expected, atol=1e-6)
+    gradients = jax.grad(lambda p: jnp.sum(apply(p, x, "B", axis=1)))(params)
+    assert gradients["numerator"].shape == (3, 6)
+
+
+def test_version_d():
+    rational = Rational("tanh", version="D")
+    x = jnp.linspace(-3., 3., 50)
+    key = jax.random.PRNGKey(0)
+    inference = rational(x)
+    assert np.allclose(inference, Rational("tanh", version="B")(x))
+    assert np.allclose(inference, np.tanh(x), atol=0.05)
+    assert np.array_equal(rational(x, key=key), rational(x, key=key))
+    assert not np.allclose(rational(x, key=key), inference)
+    assert not np.allclose(rational(x, key=key),
+                           rational(x, key=jax.random.PRNGKey(1)))
+    gradients = jax.jit(jax.grad(lambda p, k: jnp.sum(apply(p, x, "D", key=k))))(
+        rational.params, key)
+    assert np.all(np.isfinite(gradients["numerator"]))
@@ -1,4 +1,13 @@
 """
 This file imports Rational into the keras directory.
+Tensorflow is only imported once Rational is accessed.
 """
-from .rationals import Rational
+from rational._lazy import lazy_attributes
+
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    "Rational": ".rationals",
+    "FrozenRational": ".export",
+    "LookupRational": ".export",
+    "freeze_rationals": ".export",
+    "convert_to_tflite": ".export",
+})
@@ -0,0 +1,172 @@
+"""
+This file contains the inference export of the rational activation functions, e.g. for TFLite.
+
+A trained Rational layer is frozen into a layer whose coefficients are constants of the graph:
+
+- ``FrozenRational`` evaluates p(x) / q(x) with Horner's scheme, i.e. about one MUL and one ADD \
+per coefficient, without variables, noise or custom gradient,
+- ``LookupRational`` gathers (and linearly interpolates) a table of the rational function \
+sampled on an input range, the inputs being clipped to it.
+"""
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import Layer
+
+from rational.keras.rationals import Rational
+
+
+def _horner(in_tensor, coefficients):
+    """
+    evaluates c_0 + c_1 * x + ... + c_n * x^n with Horner's scheme, for constant coefficients
+
+    :param in_tensor: input tensor x
+    :param coefficients: list of the (float) coefficients c_0, ... c_n
+    :return: the polynomial, shaped like x
+    """
+    if len(coefficients) == 1:
+        return tf.zeros_like(in_tensor) + coefficients[0]
+    result = in_tensor * coefficients[-1] + coefficients[-2]
+    for coefficient in coefficients[-3::-1]:
+        result = result * in_tensor + coefficient
+    return result
+
+
+class FrozenRational(Layer):
+    """
+    a rational activation function for inference, its coefficients being constants of the graph
+    """
+
+    def __init__(self, numerator, denominator, version="A", **kwargs):
+        """
+        :param numerator: the coefficients a_0, ... a_n
+        :param denominator: the coefficients b_1, ... b_m (b_0, ... b_m for version C)
+        :param version: Version of Rational (``D`` is evaluated as ``B``, without noise)
+        :param kwargs: keyword arguments of tensorflow.keras.layers.Layer
+        """
+        super(FrozenRational, self).__init__(**kwargs)
+        if version not in ['A', 'B', 'C', 'D']:
+            raise ValueError("rational activation function version %s not implemented" % version)
+        self.numerator = [float(c) for c in np.ravel(numerator)]
+        self.denominator = [float(c) for c in np.ravel(denominator)]
+        self.version = version
+
+    def call(self, inputs):
+        """
+        :param inputs: input tensor
+        :return: output tensor, with the rational activation function applied to it
+        """
+        numerator = _horner(inputs, self.numerator)
+        if self.version == 'A':
+            # |b_j * x^j| = |b_j| * |x|^j
+            abs_inputs = tf.abs(inputs)
+            denominator = 1. + abs_inputs * _horner(abs_inputs,
+                                                    [abs(c) for c in self.denominator])
+        elif self.version == 'C':
+            denominator = 0.1 + tf.abs(_horner(inputs, self.denominator))
+        else:
+            denominator = 1. + tf.abs(inputs * _horner(inputs, self.denominator))
+        return numerator / denominator
+
+    def get_config(self):
+        config = super(FrozenRational, self).get_config()
+        config.update(numerator=self.numerator, denominator=self.denominator,
+                      version=self.version)
+        return config
+
+
+class LookupRational(Layer):
+    """
+    a rational activation function for inference, as a lookup table of its values on an input
+    range, linearly interpolated. The inputs are clipped to the range.
+    """
+
+    def __init__(self, table, input_range, **kwargs):
+        """
+        :param table: the values of the function on ``len(table)`` evenly spaced points of
+        ``input_range``
+        :param input_range: the (min, max) of the inputs
+        :param kwargs: keyword arguments of tensorflow.keras.layers.Layer
+        """
+        super(LookupRational, self).__init__(**kwargs)
+        self.table = [float(value) for value in np.ravel(table)]
+        self.input_range = (float(input_range[0]), float(input_range[1]))
+        self.step = (self.input_range[1] - self.input_range[0]) / (len(self.table) - 1)
+
+    def call(self, inputs):
+        """
+        :param inputs: input tensor
+        :return: output tensor, with the interpolated rational activation function applied to it
+        """
+        table = tf.constant(self.table, inputs.dtype)
+        position = (tf.clip_by_value(inputs, *self.input_range) - self.input_range[0]) \
+            / self.step
+        index = tf.minimum(tf.cast(position, tf.int32), len(self.table) - 2)
+        weight = position - tf.cast(index, inputs.dtype)
+        lower = tf.gather(table, index)
+        return lower + weight * (tf.gather(table, index + 1) - lower)
+
+    def get_config(self):
+        config = super(LookupRational, self).get_config()
+        config.update(table=self.table, input_range=self.input_range)
+        return config
+
+
+def freeze_rational(rational, lut_size=None, input_range=(-5., 5.)):
+    """
+    freezes a Rational layer for inference
+
+    :param rational: the Rational layer
+    :param lut_size: if not None, the number of points of the lookup table
+    (``LookupRational``), else the function is evaluated with Horner's scheme
+    (``FrozenRational``)
+    :param input_range: the (min, max) of the inputs of the lookup table, outside of which the
+    inputs are clipped
+    :return: the frozen layer
+    """
+    numerator = rational.numerator.numpy()
+    denominator = rational.denominator.numpy()
+    version = rational.version
+    if lut_size is None:
+        return FrozenRational(numerator, denominator, version, name=rational.name)
+    if lut_size < 2:
+        raise ValueError("the lookup table needs at least 2 points")
+    points = np.linspace(input_range[0], input_range[1], lut_size).astype(np.float32)
+    table = FrozenRational(numerator, denominator, version)(tf.constant(points)).numpy()
+    return LookupRational(table, input_range, name=rational.name)
+
+
+def freeze_rationals(model, lut_size=None, input_range=(-5., 5.)):
+    """
+    returns a copy of a (Sequential or functional) Keras model, its Rational layers being frozen
+    for inference (see ``freeze_rational``), the other layers sharing the weights of the model
+
+    :param model: the Keras model
+    :param lut_size: if not None, the number of points of the lookup tables
+    :param input_range: the (min, max) of the inputs of the lookup tables
+    :return: the frozen model
+    """
+    def clone(layer):
+        if isinstance(layer, Rational):
+            return freeze_rational(layer, lut_size, input_range)
+        return layer
+
+    return tf.keras.models.clone_model(model, clone_function=clone)
+
+
+def convert_to_tflite(model, lut_size=None, input_range=(-5., 5.), optimize=False):
+    """
+    converts a Keras model to a TFLite flatbuffer, its Rational layers being frozen for inference
+    (see ``freeze_rationals``), i.e. lowered to a minimal Horner sequence of MUL, ADD, ABS and
+    DIV ops, or to a lookup table GATHER
+
+    :param model: the (Sequential or functional) Keras model
+    :param lut_size: if not None, the number of points of the lookup tables
+    :param input_range: the (min, max) of the inputs of the lookup tables
+    :param optimize: if True, applies the default TFLite optimizations (weight quantization)
+    :return: the TFLite model, as bytes
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(
+        freeze_rationals(model, lut_size, input_range))
+    if optimize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
@@ -15,7 +15,7 @@ class Rational(Layer):
     """
 
     def __init__(self, approx_func="leaky_relu", degrees=(5, 4), cuda=False, version="A",
-                 trainable=True, train_numerator=True, train_denominator=True):
+                 trainable=True, train_numerator=True, train_denominator=True, **kwargs):
         """
         Inherited from tensorflow.keras.layers.Layer
 
@@ -40,23 +40,28 @@ class Rational(Layer):
         Default ``True``
         :param train_numerator: whether numerator coefficients are trainable
         :param train_denominator: whether denominator coefficients are trainable
+        :param kwargs: keyword arguments of tensorflow.keras.layers.Layer, e.g. ``name`` or
+        ``dtype``, the dtype policy (e.g. ``mixed_float16``: computations in float16, weights in
+        float32)
         """
-        super(Rational, self).__init__()
+        super(Rational, self).__init__(**kwargs)
 
         w_numerator, w_denominator = get_parameters(version, degrees, approx_func)
 
         # add trainable weight vectors for numerator (a_0, ... a_n) and denominator (b_0, ... b_m)
+        # in the variable dtype of the policy (float32 for mixed precision policies)
         self.numerator = self.add_weight(shape=(len(w_numerator),), name='w_numerator',
                                          trainable=trainable and train_numerator,
-                                         initializer=tf.keras.initializers.Constant(w_numerator))
+                                         initializer=tf.keras.initializers.Constant(w_numerator),
+                                         dtype=self.variable_dtype)
 
         self.denominator = self.add_weight(shape=(len(w_denominator),), name='w_denominator',
                                            trainable=trainable and train_denominator,
                                            initializer=tf.keras.initializers
-                                           .Constant(w_denominator))
+                                           .Constant(w_denominator),
+                                           dtype=self.variable_dtype)
 
-        # record whether weights are trainable. Used later by call() method
-        self.training = trainable
+        self.version = version
 
         # set rational activation function version
         self.rational_func = {'A': _version_a, 'B': _version_b, 'C': _version_c, 'D': _version_d}\
@@ -77,7 +82,7 @@ class Rational(Layer):
         """
         super(Rational, self).build(input_shape)
 
-    def call(self, inputs, **kwargs):
+    def call(self, inputs, training=None):
         """
         Inherited from tensorflow.keras.layers.Layer
 
@@ -88,7 +93,27 @@ class Rational(Layer):
         - training (boolean, whether the call is in inference mode or training mode)
         - mask (boolean tensor encoding masked timesteps in the input, used in RNN layers)
 
+        The inputs are in the compute dtype of the layer's policy (e.g. float16 for
+        ``mixed_float16``), and so are the computations, the weights being cast to it.
+
         :param inputs: input tensor
+        :param training: whether the call is in training mode (version D only adds its noise in
+        training mode): a Python bool, a boolean tensor (e.g. a learning phase tensor) or
+        ``None`` (e.g. a direct call outside of ``fit``), meaning inference.
         :return: output tensor, with the respective rational activation function applied to it
         """
-        return self.rational_func(inputs, self.numerator, self.denominator, self.training)
+        return self.rational_func(inputs, self.numerator, self.denominator, training)
+
+    def freeze(self, lut_size=None, input_range=(-5., 5.)):
+        """
+        Returns a frozen copy of this layer for inference, e.g. for a TFLite export (see
+        ``rational.keras.export``): its coefficients become constants of the graph.
+
+        :param lut_size: if not None, the number of points of a lookup table of the function,
+        linearly interpolated. Else the function is evaluated with Horner's scheme.
+        :param input_range: the (min, max) of the inputs of the lookup table, outside of which
+        the inputs are clipped
+        :return: FrozenRational or LookupRational layer
+        """
+        from rational.keras.export import freeze_rational
+        return freeze_rational(self, lut_size, input_range)
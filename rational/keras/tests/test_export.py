@@ -0,0 +1,83 @@
+"""
+This file tests the inference export of the rational activation functions to TFLite, with the
+local TFLite interpreter
+"""
+import time
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rational.keras import Rational, convert_to_tflite, freeze_rationals
+
+input_shape = (32, 16)
+test_data = np.random.default_rng(0).uniform(-2., 2., input_shape).astype(np.float32)
+
+
+def _model(version):
+    return tf.keras.Sequential([tf.keras.Input(input_shape[1:], batch_size=input_shape[0]),
+                                tf.keras.layers.Dense(16),
+                                Rational(version=version, approx_func='tanh'),
+                                tf.keras.layers.Dense(4)])
+
+
+def _run(tflite_model, data, repeats=20):
+    """
+    runs a TFLite model in the local interpreter
+
+    :return: the outputs and the median latency
+    """
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    times = []
+    for _ in range(repeats):
+        interpreter.set_tensor(input_index, data)
+        start = time.perf_counter()
+        interpreter.invoke()
+        times.append(time.perf_counter() - start)
+    ops = [op['op_name'] for op in interpreter._get_ops_details()]
+    return interpreter.get_tensor(output_index), np.median(times), ops
+
+
+def _reference_tflite(model):
+    """
+    the TFLite conversion of the model, with the trainable Rational layer
+    """
+    return tf.lite.TFLiteConverter.from_keras_model(model).convert()
+
+
+@pytest.mark.parametrize("version", ['A', 'B', 'C', 'D'])
+def test_horner_export(version):
+    model = _model(version)
+    expected = model(test_data).numpy()
+    frozen = freeze_rationals(model)
+    assert np.allclose(frozen(test_data).numpy(), expected, atol=1e-5)
+    tflite_model = convert_to_tflite(model)
+    outputs, latency, ops = _run(tflite_model, test_data)
+    assert np.allclose(outputs, expected, atol=1e-4)
+    # no variables, nor unpacking of their coefficients
+    assert not {'VAR_HANDLE', 'READ_VARIABLE', 'UNPACK'} & set(ops)
+    reference_model = _reference_tflite(model)
+    reference_outputs, reference_latency, reference_ops = _run(reference_model, test_data)
+    assert np.allclose(outputs, reference_outputs, atol=1e-4)
+    assert len(tflite_model) <= len(reference_model)
+    assert len(ops) <= len(reference_ops)
+    print(f"version {version}: {len(reference_model)} -> {len(tflite_model)} bytes, "
+          f"{len(reference_ops)} -> {len(ops)} ops, "
+          f"{reference_latency * 1e6:.0f} -> {latency * 1e6:.0f} us")
+
+
+def test_lookup_export():
+    model = _model('B')
+    expected = model(test_data).numpy()
+    tflite_model = convert_to_tflite(model, lut_size=1024, input_range=(-8., 8.))
+    outputs, _, ops = _run(tflite_model, test_data)
+    assert 'GATHER' in ops
+    assert np.allclose(outputs, expected, atol=1e-3)
+    # the inputs are clipped to the range of the table
+    rational = model.layers[1]
+    lookup = rational.freeze(lut_size=256, input_range=(-1., 1.))
+    assert np.allclose(lookup(tf.constant([-3., 0.5, 3.])).numpy(),
+                       rational(tf.constant([-1., 0.5, 1.])).numpy(), atol=1e-3)
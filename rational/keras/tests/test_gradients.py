@@ -0,0 +1,71 @@
+"""
+This file tests the analytic gradients of the Horner evaluation of the rational activation
+functions against the automatic differentiation of the evaluation with the powers of x
+"""
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rational.keras.versions import _rational, _version_d
+
+rng = np.random.default_rng(0)
+
+
+def _reference(in_tensor, numerator_weights, denominator_weights, version):
+    """
+    rational activation function computed with the powers of x
+    """
+    numerator = sum(numerator_weights[i] * in_tensor ** i
+                    for i in range(numerator_weights.shape[0]))
+    if version == 'A':
+        denominator = 1. + sum(tf.abs(denominator_weights[j] * in_tensor ** (j + 1))
+                               for j in range(denominator_weights.shape[0]))
+    elif version == 'C':
+        denominator = 0.1 + tf.abs(sum(denominator_weights[j] * in_tensor ** j
+                                       for j in range(denominator_weights.shape[0])))
+    else:
+        denominator = 1. + tf.abs(sum(denominator_weights[j] * in_tensor ** (j + 1)
+                                      for j in range(denominator_weights.shape[0])))
+    return numerator / denominator
+
+
+def _gradients(function, version, random_deviation=None):
+    x = tf.constant(rng.uniform(-3., 3., (8, 16)))
+    numerator = tf.Variable(rng.standard_normal(6))
+    denominator = tf.Variable(rng.standard_normal(5 if version == 'C' else 4))
+    upstream = tf.constant(rng.standard_normal((8, 16)))
+    with tf.GradientTape() as tape:
+        tape.watch(x)
+        if random_deviation is None:
+            y = function(x, numerator, denominator, version)
+        else:
+            y = function(x, numerator, denominator, True, random_deviation)
+        loss = tf.reduce_sum(y * upstream)
+    return [y] + tape.gradient(loss, [x, numerator, denominator])
+
+
+@pytest.mark.parametrize("version", ['A', 'B', 'C'])
+def test_gradients(version):
+    state = rng.bit_generator.state
+    results = _gradients(_rational, version)
+    rng.bit_generator.state = state
+    expected = _gradients(_reference, version)
+    for result, reference in zip(results, expected):
+        assert np.allclose(result.numpy(), reference.numpy())
+
+
+def test_noised_gradients():
+    state = rng.bit_generator.state
+    results = _gradients(_version_d, 'B', random_deviation=0.)
+    rng.bit_generator.state = state
+    expected = _gradients(_reference, 'B')
+    for result, reference in zip(results, expected):
+        assert np.allclose(result.numpy(), reference.numpy())
+    # the noise of the backward pass is the one of the forward pass
+    state = rng.bit_generator.state
+    y, d_x, d_numerator, d_denominator = _gradients(_version_d, 'B', random_deviation=0.1)
+    rng.bit_generator.state = state
+    x = tf.constant(rng.uniform(-3., 3., (8, 16)))
+    assert not np.allclose(y.numpy(), _reference(x, tf.constant(rng.standard_normal(6)),
+                                                 tf.constant(rng.standard_normal(4)), 'B'))
+    assert np.all(np.isfinite(d_numerator.numpy())) and d_denominator.shape == (4,)
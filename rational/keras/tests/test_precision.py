@@ -0,0 +1,82 @@
+"""
+This file tests the training argument, the mixed precision policies and the XLA compilation of
+the rational activation functions
+"""
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rational.keras import Rational
+
+test_tensor = tf.convert_to_tensor(np.linspace(-3., 3., 64, dtype=np.float32).reshape(8, 8))
+
+
+def test_training_argument():
+    """
+    version D is noised in training mode only
+    """
+    rational_d = Rational(version='D')
+    rational_b = Rational(version='B')
+    inference = rational_d(test_tensor).numpy()
+    assert np.array_equal(inference, rational_d(test_tensor, training=False).numpy())
+    assert np.allclose(inference, rational_b(test_tensor).numpy())
+    assert not np.allclose(inference, rational_d(test_tensor, training=True).numpy())
+
+
+def test_tensor_training_argument():
+    """
+    version D accepts a constant or symbolic boolean tensor as training argument
+    """
+    rational_d = Rational(version='D')
+    inference = rational_d(test_tensor).numpy()
+    assert np.array_equal(inference, rational_d(test_tensor, training=tf.constant(False)).numpy())
+    assert not np.allclose(inference, rational_d(test_tensor, training=tf.constant(True)).numpy())
+
+    @tf.function(input_signature=[tf.TensorSpec([], tf.bool)])
+    def symbolic_call(training):
+        return rational_d(test_tensor, training=training)
+
+    assert np.array_equal(inference, symbolic_call(tf.constant(False)).numpy())
+    assert not np.allclose(inference, symbolic_call(tf.constant(True)).numpy())
+
+
+@pytest.mark.parametrize("policy", ['mixed_float16', 'mixed_bfloat16'])
+@pytest.mark.parametrize("version", ['A', 'B', 'C', 'D'])
+def test_mixed_precision(policy, version):
+    """
+    the computations are in the compute dtype, the weights and their gradients in float32
+    """
+    rational = Rational(version=version, dtype=policy)
+    reference = Rational(version=version)
+    compute_dtype = rational.compute_dtype
+    with tf.GradientTape() as tape:
+        outputs = rational(test_tensor, training=True)
+        loss = tf.reduce_sum(tf.cast(outputs, tf.float32))
+    gradients = tape.gradient(loss, [rational.numerator, rational.denominator])
+    assert outputs.dtype == compute_dtype
+    assert rational.numerator.dtype == tf.float32
+    assert all(gradient.dtype == tf.float32 for gradient in gradients)
+    assert all(np.all(np.isfinite(gradient.numpy())) for gradient in gradients)
+    assert np.allclose(tf.cast(rational(test_tensor), tf.float32).numpy(),
+                       reference(test_tensor).numpy(), atol=5e-2)
+
+
+@pytest.mark.parametrize("version", ['A', 'B', 'C', 'D'])
+def test_jit_compile(version):
+    rational = Rational(version=version)
+
+    @tf.function(jit_compile=True)
+    def forward_backward(inputs):
+        with tf.GradientTape() as tape:
+            tape.watch(inputs)
+            outputs = rational(inputs)
+        return outputs, tape.gradient(outputs, [inputs, rational.numerator])
+
+    outputs, gradients = forward_backward(test_tensor)
+    with tf.GradientTape() as tape:
+        tape.watch(test_tensor)
+        expected = rational(test_tensor)
+    expected_gradients = tape.gradient(expected, [test_tensor, rational.numerator])
+    assert np.allclose(outputs.numpy(), expected.numpy(), atol=1e-5)
+    for gradient, expected_gradient in zip(gradients, expected_gradients):
+        assert np.allclose(gradient.numpy(), expected_gradient.numpy(), atol=1e-4)
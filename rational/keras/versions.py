@@ -5,25 +5,155 @@ a,b,c and d.
 import tensorflow as tf
 
 
-def _get_xps(in_tensor, numerator_weights, denominator_weights):
+def _horner(in_tensor, coefficients):
     """
-    creates a list of ascending powers of x
+    evaluates c_0 + c_1 * x + ... + c_n * x^n with Horner's scheme, without the powers of x
+
+    :param in_tensor: input tensor x
+    :param coefficients: list of the coefficients c_0, ... c_n (scalars or tensors shaped like x)
+    :return: the polynomial, shaped like x
+    """
+    result = tf.zeros_like(in_tensor) + coefficients[-1]
+    for coefficient in coefficients[-2::-1]:
+        result = result * in_tensor + coefficient
+    return result
+
+
+def _horner_with_derivative(in_tensor, coefficients):
+    """
+    evaluates c_0 + c_1 * x + ... + c_n * x^n and its derivative with Horner's scheme
+
+    :param in_tensor: input tensor x
+    :param coefficients: list of the coefficients c_0, ... c_n (scalars or tensors shaped like x)
+    :return: the polynomial and its derivative, shaped like x
+    """
+    result = tf.zeros_like(in_tensor) + coefficients[-1]
+    derivative = tf.zeros_like(in_tensor)
+    for coefficient in coefficients[-2::-1]:
+        derivative = derivative * in_tensor + result
+        result = result * in_tensor + coefficient
+    return result, derivative
+
+
+def _power_sums(factor, in_tensor, nb_powers, noises=None, dtype=None):
+    """
+    sums of factor * x^i (times the noise of the coefficient i) over all the elements, for
+    i in 0, ... nb_powers - 1, computed with one running product
+
+    :param factor: tensor shaped like x
+    :param in_tensor: input tensor x
+    :param nb_powers: number of sums
+    :param noises: optional list of the noise tensors of the coefficients
+    :param dtype: the dtype of the sums, e.g. float32 for float16 inputs (mixed precision), in
+    which the products are computed as well
+    :return: vector of the nb_powers sums
+    """
+    if dtype is not None and dtype != in_tensor.dtype:
+        factor, in_tensor = tf.cast(factor, dtype), tf.cast(in_tensor, dtype)
+        if noises is not None:
+            noises = [tf.cast(noise, dtype) for noise in noises]
+    sums = []
+    for i in range(nb_powers):
+        if i > 0:
+            factor = factor * in_tensor
+        sums.append(tf.reduce_sum(factor if noises is None else factor * noises[i]))
+    return tf.stack(sums)
+
+
+def _noises(in_tensor, seed, nb_coefficients, offset, random_deviation):
+    """
+    uniform noises in [1 - random_deviation, 1 + random_deviation] shaped like x, one per
+    coefficient. They are generated from a seed, thus regenerated in the backward pass instead
+    of being kept in memory.
+    """
+    return [tf.random.stateless_uniform(tf.shape(in_tensor), seed + [0, offset + i],
+                                        minval=1 - random_deviation,
+                                        maxval=1 + random_deviation, dtype=in_tensor.dtype)
+            for i in range(nb_coefficients)]
+
+
+def _rational(in_tensor, numerator_weights, denominator_weights, version, random_deviation=None):
+    """
+    rational activation function p(x) / q(x) of the given version, evaluated with Horner's scheme.
+    Its gradients are the analytic ones (see the CUDA backward kernels of the torch version):
+    only x, q(x) and f(x) are kept for the backward pass, that recomputes the polynomials and
+    their derivatives with Horner's scheme as well.
 
     :param in_tensor: input tensor
     :param numerator_weights: vector containing the weights a_0, ... a_n
-    :param denominator_weights: vector containing the weights b_0, ... b_m
-    :return: a list that looks approximately like this [1-tensor, x, x^2, ... x^m]
+    :param denominator_weights: vector containing the weights b_1, ... b_m (b_0, ... b_m for C)
+    :param version: 'A', 'B' or 'C'
+    :param random_deviation: if not None, every coefficient is noised for every element (version
+    D in training mode, computed as B)
+    :return: f(x), i.e. the input tensor with the rational activation function applied to it,
+    computed in the dtype of the input tensor (e.g. float16 with float32 weights for mixed
+    precision), the gradients of the weights being accumulated in their dtype
     """
-    # create a list
-    xps = list()
-    # append the input tensor to the list
-    xps.append(in_tensor)
-    # add x^2, x^3, ... x^{max(n,m)} to the list
-    for _ in range(max(numerator_weights.shape[0], denominator_weights.shape[0])):
-        xps.append(xps[-1] * in_tensor)
-    # inserts a tensor that is shaped like x, but contains only 1s as the first element
-    xps.insert(0, tf.ones_like(in_tensor))
-    return xps
+    numerator_weights = tf.convert_to_tensor(numerator_weights)
+    denominator_weights = tf.convert_to_tensor(denominator_weights)
+    nb_num, nb_den = numerator_weights.shape[0], denominator_weights.shape[0]
+    seed = None
+    if random_deviation is not None:
+        seed = tf.random.uniform([2], maxval=tf.int32.max, dtype=tf.int32)
+
+    def coefficients(x, numerator, denominator):
+        # the (noised) coefficients of p and of r, q being 1 + |r| (0.1 + |r| for C)
+        num_coefficients = tf.unstack(tf.cast(numerator, x.dtype), nb_num)
+        den_coefficients = tf.unstack(tf.cast(denominator, x.dtype), nb_den)
+        num_noises = den_noises = None
+        if seed is not None:
+            num_noises = _noises(x, seed, nb_num, 0, random_deviation)
+            den_noises = _noises(x, seed, nb_den, nb_num, random_deviation)
+            num_coefficients = [c * noise for c, noise in zip(num_coefficients, num_noises)]
+            den_coefficients = [c * noise for c, noise in zip(den_coefficients, den_noises)]
+        if version == 'A':
+            # |b_j * x^j| = |b_j| * |x|^j
+            den_coefficients = [tf.abs(c) for c in den_coefficients]
+        return num_coefficients, den_coefficients, num_noises, den_noises
+
+    @tf.custom_gradient
+    def forward(x, numerator, denominator):
+        num_coefficients, den_coefficients, _, _ = coefficients(x, numerator, denominator)
+        if version == 'A':
+            abs_x = tf.abs(x)
+            q = 1. + abs_x * _horner(abs_x, den_coefficients)
+        elif version == 'C':
+            q = 0.1 + tf.abs(_horner(x, den_coefficients))
+        else:
+            q = 1. + tf.abs(x * _horner(x, den_coefficients))
+        y = _horner(x, num_coefficients) / q
+
+        def grad(upstream):
+            num_coefficients, den_coefficients, num_noises, den_noises = \
+                coefficients(x, numerator, denominator)
+            _, p_derivative = _horner_with_derivative(x, num_coefficients)
+            # dq/dx, and the running factor of dq/db_j = factor * x^(j-1) (x^j for C)
+            if version == 'A':
+                abs_x = tf.abs(x)
+                h, h_derivative = _horner_with_derivative(abs_x, den_coefficients)
+                q_derivative = tf.sign(x) * (h + abs_x * h_derivative)
+                den_base, den_factor = abs_x, abs_x
+            elif version == 'C':
+                r, r_derivative = _horner_with_derivative(x, den_coefficients)
+                q_derivative = tf.sign(r) * r_derivative
+                den_base, den_factor = x, tf.sign(r)
+            else:
+                h, h_derivative = _horner_with_derivative(x, den_coefficients)
+                sign = tf.sign(x * h)
+                q_derivative = sign * (h + x * h_derivative)
+                den_base, den_factor = x, sign * x
+            upstream_q = upstream / q
+            d_x = upstream_q * (p_derivative - y * q_derivative)
+            d_numerator = _power_sums(upstream_q, x, nb_num, num_noises, numerator.dtype)
+            d_denominator = _power_sums(- upstream_q * y * den_factor, den_base, nb_den,
+                                        den_noises, denominator.dtype)
+            if version == 'A':
+                d_denominator = d_denominator * tf.sign(denominator)
+            return d_x, d_numerator, d_denominator
+
+        return y, grad
+
+    return forward(in_tensor, numerator_weights, denominator_weights)
 
 
 def _version_a(in_tensor, numerator_weights, denominator_weights, training):
@@ -41,20 +171,7 @@ def _version_a(in_tensor, numerator_weights, denominator_weights, training):
     :param training: whether the call is in inference mode or training mode
     :return: f(x), i.e. the input tensor with the rational activation function applied to it
     """
-
-    xps = _get_xps(in_tensor, numerator_weights, denominator_weights)
-
-    numerator = 0
-    for i in range(numerator_weights.shape[0]):
-        w_n = numerator_weights[i]
-        numerator = numerator + w_n * xps[i]
-
-    denominator = 1.0
-    for j in range(denominator_weights.shape[0]):
-        w_d = denominator_weights[j]
-        denominator = denominator + tf.abs(w_d * xps[j + 1])
-
-    return numerator / denominator
+    return _rational(in_tensor, numerator_weights, denominator_weights, 'A')
 
 
 def _version_b(in_tensor, numerator_weights, denominator_weights, training):
@@ -72,20 +189,7 @@ def _version_b(in_tensor, numerator_weights, denominator_weights, training):
     :param training: whether the call is in inference mode or training mode
     :return: f(x), i.e. the input tensor with the rational activation function applied to it
     """
-
-    xps = _get_xps(in_tensor, numerator_weights, denominator_weights)
-
-    numerator = 0
-    for i in range(numerator_weights.shape[0]):
-        w_n = numerator_weights[i]
-        numerator = numerator + w_n * xps[i]
-
-    denominator = 0
-    for j in range(denominator_weights.shape[0]):
-        w_d = denominator_weights[j]
-        denominator = denominator + w_d * xps[j + 1]
-
-    return numerator / (1 + tf.abs(denominator))
+    return _rational(in_tensor, numerator_weights, denominator_weights, 'B')
 
 
 def _version_c(in_tensor, numerator_weights, denominator_weights, training):
@@ -103,20 +207,7 @@ def _version_c(in_tensor, numerator_weights, denominator_weights, training):
     :param training: whether the call is in inference mode or training mode
     :return: f(x), i.e. the input tensor with the rational activation function applied to it
     """
-
-    xps = _get_xps(in_tensor, numerator_weights, denominator_weights)
-
-    numerator = 0
-    for i in range(numerator_weights.shape[0]):
-        w_n = numerator_weights[i]
-        numerator = numerator + w_n * xps[i]
-
-    denominator = 0
-    for j in range(denominator_weights.shape[0]):
-        w_d = denominator_weights[j]
-        denominator = denominator + w_d * xps[j]
-
-    return numerator / (0.1 + tf.abs(denominator))
+    return _rational(in_tensor, numerator_weights, denominator_weights, 'C')
 
 
 def _version_d(in_tensor, numerator_weights, denominator_weights, training, random_deviation=0.1):
@@ -133,38 +224,24 @@ def _version_d(in_tensor, numerator_weights, denominator_weights, training, rand
     :param in_tensor: input tensor
     :param numerator_weights: vector containing the weights a_0, ... a_n
     :param denominator_weights: vector containing the weights b_0, ... b_m
-    :param training: whether the call is in inference mode or training mode
+    :param training: whether the call is in inference mode or training mode, a Python bool,
+    ``None`` (inference) or a boolean tensor (branched with ``tf.cond``)
     :param random_deviation: random deviation
     :return: f(x), i.e. the input tensor with the rational activation function applied to it
 
     """
-    # if in training mode, apply Function B
-    if not training:
+    def noised():
+        # in training mode, noise every coefficient for every element
+        return _rational(in_tensor, numerator_weights, denominator_weights, 'B',
+                         random_deviation=random_deviation)
+
+    def inference():
+        # in inference mode, apply Function B
         return _version_b(in_tensor, numerator_weights, denominator_weights, training)
 
-    # else: inference mode
-    # get list of polynomial [1, X, X^2, X^3....X^n]
-    xps = _get_xps(in_tensor, numerator_weights, denominator_weights)
-
-    # replace None wiht 1 in in_tensor.shape to avoid value error
-    input_shape = [1 if x is None else x for x in in_tensor.shape]
-
-    # assign weights to coefficients of numerator of polynomial
-    numerator = 0
-    for i in range(numerator_weights.shape[0]):
-        # assign noise factor with uniform distribution
-        noise = tf.random.uniform(shape=input_shape, minval=1 - random_deviation,
-                                  maxval=1+random_deviation, dtype=tf.dtypes.float32)
-        w_n_noised = numerator_weights[i] * noise
-        numerator = numerator + w_n_noised * xps[i]
-
-    # assign weights to coefficients of denominator of polynomial
-    denominator = 0
-    for j in range(denominator_weights.shape[0]):
-        # assign noise factor with uniform distribution
-        noise = tf.random.uniform(shape=input_shape, minval=1 - random_deviation,
-                                  maxval=1+random_deviation, dtype=tf.dtypes.float32)
-        w_d_noised = denominator_weights[j] * noise
-        denominator = denominator + w_d_noised * xps[j]
-
-    return numerator / (1 + tf.abs(denominator))
+    # training may be a Python bool, None (inference) or a (symbolic) boolean tensor
+    static_training = training if training is None or isinstance(training, bool) \
+        else tf.get_static_value(training)
+    if static_training is None and training is not None:
+        return tf.cond(tf.cast(training, tf.bool), noised, inference)
+    return noised() if static_training else inference()
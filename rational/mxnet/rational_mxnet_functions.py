@@ -1,101 +1,110 @@
 from mxnet import nd
 
 
-def get_xps(weight_denominator, weight_numerator, z):
-    xps = list()
-    xps.append(z)
-    for _ in range(max(len(weight_numerator), len(weight_denominator))):
-        xps.append(nd.multiply(xps[-1], z))
-    xps.insert(0, nd.ones_like(z))
-    return xps
-
-
-def Rational_MXNET_A_F(x, weight_numerator, weight_denominator, training):
+def _coefficients(F, weights, size):
+    # the coefficients of a weight vector, as `size` arrays (symbols) of shape (1,)
+    if size == 1:
+        return [weights]
+    return list(F.split(weights, num_outputs=size, axis=0))
+
+
+def _horner(F, z, coefficients):
+    # c_0 + c_1 * z + ... + c_n * z^n with Horner's scheme, without the powers of z, the
+    # coefficients being of shape (1,) or of the shape of z (noised coefficients)
+    if len(coefficients) == 1:
+        return F.broadcast_add(F.zeros_like(z), coefficients[0])
+    result = F.broadcast_add(F.broadcast_mul(z, coefficients[-1]), coefficients[-2])
+    for coefficient in coefficients[-3::-1]:
+        result = F.broadcast_add(result * z, coefficient)
+    return result
+
+
+def _sizes(weight_numerator, weight_denominator, degrees, version):
+    # number of coefficients of P and Q, from the degrees for symbols (of unknown shapes)
+    if degrees is None:
+        return len(weight_numerator), len(weight_denominator)
+    return degrees[0] + 1, degrees[1] + (version == "C")
+
+
+def _noised(F, weight_numerator, weight_denominator, random_deviation, noise):
+    # the coefficients times a uniform noise in [1 - random_deviation, 1 + random_deviation],
+    # drawn once per call (`call`) or once per coefficient (`coefficient`)
+    low, high = 1 - random_deviation, 1 + random_deviation
+    if noise == "call":
+        factor = F.random.uniform(low=low, high=high, shape=(1,))
+        return F.broadcast_mul(weight_numerator, factor), F.broadcast_mul(weight_denominator, factor)
+    return (weight_numerator * F.random.uniform_like(weight_numerator, low=low, high=high),
+            weight_denominator * F.random.uniform_like(weight_denominator, low=low, high=high))
+
+
+def Rational_MXNET_A_F(x, weight_numerator, weight_denominator, training, F=nd, degrees=None):
     # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X ^ n /
     #               1 + | b_0 * X | + | b_1 * X | ^ 2 + ... + | b_i * X | ^ {i + 1}
+    # written against F (mx.nd or mx.sym), for HybridBlock.hybridize
+    nb_num, nb_den = _sizes(weight_numerator, weight_denominator, degrees, "A")
+    z = F.reshape(x, shape=(-1,))
+    abs_z = F.abs(z)
 
-    z = nd.reshape(x, shape=(-1,))
-
-    xps = get_xps(weight_denominator, weight_numerator, z)
-
-    numerator = nd.array([0], dtype='float32')
-    for i, w_n in enumerate(weight_numerator):
-        numerator = numerator + nd.multiply(w_n, xps[i])
+    numerator = _horner(F, z, _coefficients(F, weight_numerator, nb_num))
+    # |b_j * X^j| = |b_j| * |X|^j
+    denominator = 1. + abs_z * _horner(F, abs_z, _coefficients(F, F.abs(weight_denominator),
+                                                               nb_den))
+    return F.reshape_like(numerator / denominator, x)
 
-    denominator = nd.array([1.0], dtype='float32')
-    for j, w_d in enumerate(weight_denominator):
-        denominator = denominator + nd.abs(nd.multiply(w_d, xps[j + 1]))
 
-    return nd.divide(numerator, denominator).reshape(x.shape)
-
-
-def Rational_MXNET_B_F(x, weight_numerator, weight_denominator, training):
+def Rational_MXNET_B_F(x, weight_numerator, weight_denominator, training, F=nd, degrees=None):
     # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X ^ n /
     #               1 + |b_0*X + b_1*X^2 + ... + b_{n-1}*X^n|
+    # written against F (mx.nd or mx.sym), for HybridBlock.hybridize
+    nb_num, nb_den = _sizes(weight_numerator, weight_denominator, degrees, "B")
+    z = F.reshape(x, shape=(-1,))
 
-    z = nd.reshape(x, shape=(-1,))
-
-    xps = get_xps(weight_denominator, weight_numerator, z)
+    numerator = _horner(F, z, _coefficients(F, weight_numerator, nb_num))
+    denominator = z * _horner(F, z, _coefficients(F, weight_denominator, nb_den))
+    return F.reshape_like(numerator / (1. + F.abs(denominator)), x)
 
-    numerator = nd.array([0], dtype='float32')
-    for i, w_n in enumerate(weight_numerator):
-        numerator = numerator + nd.multiply(w_n, xps[i])
 
-    denominator = nd.array([0], dtype='float32')
-    for j, w_d in enumerate(weight_denominator):
-        denominator = denominator + nd.multiply(w_d, xps[j + 1])
-
-    return nd.divide(numerator, (1.0 + nd.abs(denominator))).reshape(x.shape)
-
-
-def Rational_MXNET_C_F(x, weight_numerator, weight_denominator, training):
+def Rational_MXNET_C_F(x, weight_numerator, weight_denominator, training, F=nd, degrees=None):
     # P(X) / Q(X) = a_0 + a_1 * X + ... + a_n * X ^ n /
     #               eps + |b_1*X + b_1*X^2 + ... + b_{n-1}*X^n|
+    # written against F (mx.nd or mx.sym), for HybridBlock.hybridize
+    nb_num, nb_den = _sizes(weight_numerator, weight_denominator, degrees, "C")
+    z = F.reshape(x, shape=(-1,))
 
-    z = nd.reshape(x, shape=(-1,))
-
-    xps = get_xps(weight_denominator, weight_numerator, z)
-
-    numerator = nd.array([0], dtype='float32')
-    for i, w_n in enumerate(weight_numerator):
-        numerator = numerator + nd.multiply(w_n, xps[i])
-
-    denominator = nd.array([0], dtype='float32')
-    for j, w_d in enumerate(weight_denominator):
-        denominator = denominator + nd.multiply(w_d, xps[j])
-
-    return nd.divide(numerator, (0.1 + nd.abs(denominator))).reshape(x.shape)
+    numerator = _horner(F, z, _coefficients(F, weight_numerator, nb_num))
+    denominator = _horner(F, z, _coefficients(F, weight_denominator, nb_den))
+    return F.reshape_like(numerator / (0.1 + F.abs(denominator)), x)
 
 
-def Rational_MXNET_D_F(x, weight_numerator, weight_denominator, training, random_deviation=0.1):
+def Rational_MXNET_D_F(x, weight_numerator, weight_denominator, training, random_deviation=0.1,
+                       F=nd, degrees=None, noise="coefficient"):
     # P(X)/Q(X) = noised(a_0) + noised(a_1)*X +noised(a_2)*X^2 + ... + noised(a_n)*X^n /
     #                1 + |noised(b_0)*X + noised(b_1)*X^2 + ... + noised(b_{n-1})*X^n|
     # Noised parameters have uniform noise to be in range [(1-random_deviation)*parameter,(1+random_deviation)*parameter].
+    # The noise is drawn once per call (`call`), once per coefficient (`coefficient`) or for every
+    # coefficient and every element (`element`), the latter by a single draw of all the noises.
+    # written against F (mx.nd or mx.sym), for HybridBlock.hybridize
 
     if not training:
         # do not add noise
-        return Rational_MXNET_B_F(x, weight_numerator, weight_denominator, training)
-
-    z = nd.reshape(x, shape=(-1,))
-    lower_bound = nd.array([1 - random_deviation])
-    upper_bound = nd.array([1 + random_deviation])
-
-    xps = get_xps(weight_denominator, weight_numerator, z)
-
-    numerator = nd.array([0], dtype='float32')
-    for i, w_n in enumerate(weight_numerator):
-        w_n_noised = nd.multiply(w_n, nd.sample_uniform(low=lower_bound,
-                                                        high=upper_bound,
-                                                        shape=z.shape,
-                                                        dtype='float32'))
-        numerator = numerator + nd.multiply(w_n_noised, xps[i])
-
-    denominator = nd.array([0], dtype='float32')
-    for j, w_d in enumerate(weight_denominator):
-        w_d_noised = nd.multiply(w_d, nd.sample_uniform(low=lower_bound,
-                                                        high=upper_bound,
-                                                        shape=z.shape,
-                                                        dtype='float32'))
-        denominator = denominator + nd.multiply(w_d_noised, xps[j + 1])
-
-    return nd.divide(numerator, (1 + nd.abs(denominator))).reshape(x.shape)
+        return Rational_MXNET_B_F(x, weight_numerator, weight_denominator, training, F, degrees)
+
+    if noise in ["call", "coefficient"]:
+        weight_numerator, weight_denominator = _noised(F, weight_numerator, weight_denominator,
+                                                       random_deviation, noise)
+        return Rational_MXNET_B_F(x, weight_numerator, weight_denominator, training, F, degrees)
+    if noise != "element":
+        raise ValueError("noise granularity %s not implemented" % noise)
+
+    low, high = 1 - random_deviation, 1 + random_deviation
+    nb_num, nb_den = _sizes(weight_numerator, weight_denominator, degrees, "D")
+    z = F.reshape(x, shape=(-1,))
+    # all the noised coefficients at once, [nb_num + nb_den, elements]
+    weights = F.expand_dims(F.concat(weight_numerator, weight_denominator, dim=0), axis=1)
+    template = F.broadcast_axis(F.expand_dims(z, axis=0), axis=0, size=nb_num + nb_den)
+    noised = F.broadcast_mul(F.random.uniform_like(template, low=low, high=high), weights)
+    coefficients = list(F.split(noised, num_outputs=nb_num + nb_den, axis=0, squeeze_axis=True))
+
+    numerator = _horner(F, z, coefficients[:nb_num])
+    denominator = z * _horner(F, z, coefficients[nb_num:])
+    return F.reshape_like(numerator / (1. + F.abs(denominator)), x)
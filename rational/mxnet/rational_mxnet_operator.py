@@ -0,0 +1,137 @@
+"""
+Fused Rational operator for MXNet (``mx.nd.Custom(..., op_type="rational")``).
+
+The forward pass evaluates P and Q with Horner's scheme, and the backward pass
+computes the closed-form gradients of the CUDA kernels (see
+`rational/_cuda/rational_cuda_kernels.cu`). Only the inputs are kept for the
+backward pass, that recomputes P, Q and their derivatives the same way,
+instead of autograd storing every intermediate of the evaluation.
+
+The operator is stateless: the noise of version D is drawn by the caller on
+the coefficients (see `Rational(fused=True)`), autograd propagating the
+gradients of the noised coefficients to the weights. The coefficients stay
+NDArrays, on the device of the inputs, without any synchronization.
+"""
+import mxnet as mx
+from mxnet import nd
+
+from rational.mxnet.rational_mxnet_functions import _coefficients, _horner
+
+
+def _horner_with_derivative(z, coefficients):
+    # the polynomial and its derivative, the coefficients being of shape (1,)
+    if len(coefficients) == 1:
+        return nd.broadcast_add(nd.zeros_like(z), coefficients[0]), nd.zeros_like(z)
+    result = nd.broadcast_add(nd.broadcast_mul(z, coefficients[-1]), coefficients[-2])
+    derivative = nd.broadcast_add(nd.zeros_like(z), coefficients[-1])
+    for coefficient in coefficients[-3::-1]:
+        derivative = derivative * z + result
+        result = nd.broadcast_add(result * z, coefficient)
+    return result, derivative
+
+
+def _power_sums(factor, z, nb_powers):
+    # the sums of factor * z^i over all the elements, for i < nb_powers
+    sums = []
+    for i in range(nb_powers):
+        if i > 0:
+            factor = factor * z
+        sums.append(nd.sum(factor).reshape((1,)))
+    return nd.concat(*sums, dim=0)
+
+
+class RationalOperator(mx.operator.CustomOp):
+    """
+    Rational activation function with Horner's scheme and analytic gradients.
+    """
+    def __init__(self, version):
+        super(RationalOperator, self).__init__()
+        self.version = version
+
+    def _denominator_coefficients(self, denominator):
+        if self.version == "A":
+            # |b_j * x^j| = |b_j| * |x|^j
+            denominator = nd.abs(denominator)
+        return _coefficients(nd, denominator, len(denominator))
+
+    def forward(self, is_train, req, in_data, out_data, aux):
+        x, numerator, denominator = in_data
+        z = x.reshape((-1,))
+        den_coefficients = self._denominator_coefficients(denominator)
+        if self.version == "A":
+            abs_z = nd.abs(z)
+            q = 1. + abs_z * _horner(nd, abs_z, den_coefficients)
+        elif self.version == "C":
+            q = 0.1 + nd.abs(_horner(nd, z, den_coefficients))
+        else:
+            q = 1. + nd.abs(z * _horner(nd, z, den_coefficients))
+        p = _horner(nd, z, _coefficients(nd, numerator, len(numerator)))
+        self.assign(out_data[0], req[0], (p / q).reshape(x.shape))
+
+    def backward(self, req, out_grad, in_data, out_data, in_grad, aux):
+        x, numerator, denominator = in_data
+        z = x.reshape((-1,))
+        p, p_derivative = _horner_with_derivative(
+            z, _coefficients(nd, numerator, len(numerator)))
+        den_coefficients = self._denominator_coefficients(denominator)
+        # q, dq/dx, and the factor of dq/db_j = factor * base^(j-1) (base^j for C)
+        if self.version == "A":
+            abs_z = nd.abs(z)
+            h, h_derivative = _horner_with_derivative(abs_z, den_coefficients)
+            q = 1. + abs_z * h
+            q_derivative = nd.sign(z) * (h + abs_z * h_derivative)
+            den_base, den_factor = abs_z, abs_z
+        elif self.version == "C":
+            r, r_derivative = _horner_with_derivative(z, den_coefficients)
+            q = 0.1 + nd.abs(r)
+            q_derivative = nd.sign(r) * r_derivative
+            den_base, den_factor = z, nd.sign(r)
+        else:
+            h, h_derivative = _horner_with_derivative(z, den_coefficients)
+            sign = nd.sign(z * h)
+            q = 1. + nd.abs(z * h)
+            q_derivative = sign * (h + z * h_derivative)
+            den_base, den_factor = z, sign * z
+        grad_q = out_grad[0].reshape((-1,)) / q
+        y = p / q
+        self.assign(in_grad[0], req[0],
+                    (grad_q * (p_derivative - y * q_derivative)).reshape(x.shape))
+        d_numerator = _power_sums(grad_q, z, len(numerator))
+        d_denominator = _power_sums(- grad_q * y * den_factor, den_base, len(denominator))
+        if self.version == "A":
+            d_denominator = d_denominator * nd.sign(denominator)
+        self.assign(in_grad[1], req[1], d_numerator)
+        self.assign(in_grad[2], req[2], d_denominator)
+
+
+@mx.operator.register("rational")
+class RationalOperatorProp(mx.operator.CustomOpProp):
+    """
+    Properties of the fused Rational operator, its attribute `version` (A, B,
+    C or D) being a string. Version D is evaluated as B, on coefficients
+    noised by the caller.
+    """
+    def __init__(self, version="A"):
+        super(RationalOperatorProp, self).__init__(need_top_grad=True)
+        if version not in ["A", "B", "C", "D"]:
+            raise ValueError("version %s not implemented" % version)
+        self.version = "B" if version == "D" else version
+
+    def list_arguments(self):
+        return ["data", "numerator", "denominator"]
+
+    def list_outputs(self):
+        return ["output"]
+
+    def infer_shape(self, in_shape):
+        return in_shape, [in_shape[0]], []
+
+    def infer_type(self, in_type):
+        return in_type, [in_type[0]], []
+
+    def declare_backward_dependency(self, out_grad, in_data, out_data):
+        # the outputs are recomputed, only the inputs are kept
+        return out_grad + in_data
+
+    def create_operator(self, ctx, shapes, dtypes):
+        return RationalOperator(self.version)
@@ -1,7 +1,11 @@
+from functools import partial
+
+import numpy as np
 from rational.utils.get_weights import get_parameters
 from mxnet.gluon.block import HybridBlock
-from mxnet import initializer, cpu, gpu
-from rational.mxnet.rational_mxnet_functions import Rational_MXNET_A_F, Rational_MXNET_B_F, Rational_MXNET_C_F, Rational_MXNET_D_F
+from mxnet import autograd, initializer, cpu, gpu
+from rational.mxnet.rational_mxnet_functions import Rational_MXNET_A_F, Rational_MXNET_B_F, Rational_MXNET_C_F, Rational_MXNET_D_F, \
+    _noised
 
 
 class Rational(HybridBlock):
@@ -32,27 +36,55 @@ class Rational(HybridBlock):
                 If the weights are trainable, i.e, if they are updated during \
                 backward pass\n
                 Default ``True``
+            noise (str):
+                The granularity of the noise of version `D`: `call` (one \
+                factor for all the coefficients), `coefficient` (one factor \
+                per coefficient) or `element` (one factor per coefficient \
+                and per element, drawn at once). The noise is only drawn in \
+                training mode (``autograd.record()``).\n
+                Default ``coefficient``
+            fused (bool):
+                If ``True``, uses the fused operator (see \
+                `rational_mxnet_operator`): Horner's scheme forward, analytic \
+                backward that only keeps the inputs. The coefficients of \
+                version `D` are noised before the operator, per call or per \
+                coefficient.\n
+                Default ``False``
+            random_deviation (float):
+                The relative deviation of the noise of version `D`, with or \
+                without the fused operator.\n
+                Default ``0.1``
+
+    The block is hybridizable: after ``hybridize(static_alloc=True)``, \
+    it runs as a static graph, and ``export`` saves its symbol and \
+    parameters. The graph of version `D` is rebuilt when the training mode \
+    changes, with or without noise.
+
     Returns:
         Module: Rational module
     """
     def __init__(self, approx_func='leaky_relu', degrees=(5, 4), cuda=False,
                  version="A", trainable=True, train_numerator=True,
-                 train_denominator=True):
+                 train_denominator=True, noise="coefficient", fused=False,
+                 random_deviation=0.1):
         super(Rational, self).__init__()
         w_numerator, w_denominator = get_parameters(version, degrees, approx_func)
         self.device = gpu() if cuda else cpu()
 
         with self.name_scope():
             self.numerator = self.params.get(name='w_numerator', shape=(len(w_numerator),),
-                                             init=initializer.Constant(w_numerator),
+                                             init=initializer.Constant(np.array(w_numerator)),
                                              grad_req='write' if train_numerator and trainable else 'null')
             self.denominator = self.params.get(name='w_denominator', shape=(len(w_denominator),),
-                                               init=initializer.Constant(w_denominator),
+                                               init=initializer.Constant(np.array(w_denominator)),
                                                grad_req='write' if train_denominator and trainable else 'null')
 
         self.degrees = degrees
         self.version = version
         self.training = trainable
+        self.noise = noise
+        self.fused = fused
+        self.random_deviation = random_deviation
 
         self.init_approximation = approx_func
 
@@ -63,13 +95,43 @@ class Rational(HybridBlock):
         elif version == "C":
             rational_func = Rational_MXNET_C_F
         elif version == "D":
-            rational_func = Rational_MXNET_D_F
+            if noise not in ["call", "coefficient", "element"]:
+                raise ValueError("noise granularity %s not implemented" % noise)
+            rational_func = partial(Rational_MXNET_D_F, noise=noise,
+                                    random_deviation=random_deviation)
         else:
             raise ValueError("version %s not implemented" % version)
 
         self.activation_function = rational_func
+        # training mode of the cached graph (hybridized), for the noise of D
+        self._graph_training = None
+        if fused:
+            # registers the operator
+            from rational.mxnet import rational_mxnet_operator  # noqa: F401
+            if noise == "element":
+                raise ValueError("noise granularity element not implemented by the fused "
+                                 "operator")
+
+    def forward(self, x, *args):
+        if self._active and self.version == "D":
+            # the noise is part of the graph, that is rebuilt for the other mode
+            training = autograd.is_training()
+            if training != self._graph_training:
+                self._clear_cached_op()
+                self._graph_training = training
+        return super(Rational, self).forward(x, *args)
 
-    def hybrid_forward(self, F, x, *args, **kwargs):
-        out = self.activation_function(x, self.numerator.data(self.device),
-                                       self.denominator.data(self.device), self.training)
+    def hybrid_forward(self, F, x, numerator, denominator):
+        # the parameters are passed by Gluon, as NDArrays (imperative) or Symbols (hybridized),
+        # and all the operations go through F: the block can be hybridized and exported
+        training = self.training and autograd.is_training()
+        if self.fused:
+            if self.version == "D" and training:
+                # the operator gets the noised coefficients, autograd the noise
+                numerator, denominator = _noised(F, numerator, denominator,
+                                                 self.random_deviation, self.noise)
+            return F.Custom(x, numerator, denominator, op_type="rational",
+                            version=self.version)
+        out = self.activation_function(x, numerator, denominator, training,
+                                       F=F, degrees=self.degrees)
         return out
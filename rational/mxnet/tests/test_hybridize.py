@@ -0,0 +1,59 @@
+"""
+This file tests the hybridization of the mxnet Rational block: the static
+graph computes the outputs and gradients of the imperative block, and the
+exported symbol and parameters are imported back.
+"""
+import os
+
+import numpy as np
+import pytest
+
+mx = pytest.importorskip("mxnet")
+autograd = mx.autograd
+
+from rational.mxnet import Rational
+
+versions = ["A", "B", "C", "D"]
+
+
+def _outputs_and_gradients(rational, x):
+    x = x.copy()
+    x.attach_grad()
+    # version D is not noised in predict mode
+    with autograd.record(train_mode=False):
+        outputs = rational(x)
+    outputs.backward()
+    return (outputs.asnumpy(), x.grad.asnumpy(),
+            rational.numerator.grad().asnumpy(),
+            rational.denominator.grad().asnumpy())
+
+
+@pytest.mark.parametrize("version", versions)
+def test_hybridized_outputs(version):
+    x = mx.nd.random.normal(shape=(8, 16))
+    rational = Rational("leaky_relu", version=version)
+    rational.initialize()
+    expected = _outputs_and_gradients(rational, x)
+    rational.hybridize(static_alloc=True, static_shape=True)
+    for _ in range(2):
+        # built at the first call, cached for the second
+        hybridized = _outputs_and_gradients(rational, x)
+        for result, reference in zip(hybridized, expected):
+            assert np.allclose(result, reference, atol=1e-5)
+
+
+@pytest.mark.parametrize("version", versions)
+def test_export(version, tmp_path):
+    x = mx.nd.random.normal(shape=(8, 16))
+    rational = Rational("tanh", version=version)
+    rational.initialize()
+    with mx.autograd.pause():
+        # trained coefficients
+        rational.numerator.set_data(rational.numerator.data() * 1.1)
+    rational.hybridize()
+    expected = rational(x).asnumpy()
+    prefix = os.path.join(tmp_path, "rational")
+    rational.export(prefix)
+    imported = mx.gluon.SymbolBlock.imports(prefix + "-symbol.json", ["data"],
+                                            prefix + "-0000.params")
+    assert np.allclose(imported(x).asnumpy(), expected, atol=1e-6)
@@ -0,0 +1,74 @@
+"""
+This file tests the noise of version D of the mxnet rational functions
+(rational.mxnet.rational_mxnet_functions): its granularity, and that it is
+only drawn in training mode.
+"""
+import numpy as np
+import pytest
+
+mx = pytest.importorskip("mxnet")
+autograd = mx.autograd
+
+from rational.mxnet import Rational
+from rational.mxnet.rational_mxnet_functions import Rational_MXNET_D_F
+
+# P(x) = f_0 + f_1.x and Q(x) = 1: the outputs at x = 0 are the noise factors
+# f_0 of a_0 and, if shared by the elements, the differences of the outputs at
+# x = 1 and x = 0 the ones of a_1
+x = mx.nd.array([0.] * 100 + [1.] * 100)
+numerator = mx.nd.array([1., 1.])
+denominator = mx.nd.array([0., 0.])
+
+
+def _noise(noise):
+    outputs = Rational_MXNET_D_F(x, numerator, denominator, True,
+                                 noise=noise).asnumpy()
+    return outputs[:100], outputs[100:] - outputs[:100]
+
+
+@pytest.mark.parametrize("noise", ["call", "coefficient", "element"])
+def test_noise_range(noise):
+    outputs = Rational_MXNET_D_F(x, numerator, denominator, True,
+                                 noise=noise).asnumpy()
+    # f_0 at x = 0, f_0 + f_1 at x = 1
+    assert np.all(np.abs(outputs[:100] - 1.) <= 0.1 + 1e-6)
+    assert np.all(np.abs(outputs[100:] - 2.) <= 0.2 + 1e-6)
+
+
+def test_noise_per_call():
+    # one factor for the whole layer
+    first, second = _noise("call")
+    assert np.allclose(first, first[0]) and np.allclose(second, first[0])
+
+
+def test_noise_per_coefficient():
+    # one factor per coefficient, shared by the elements
+    first, second = _noise("coefficient")
+    assert np.allclose(first, first[0]) and np.allclose(second, second[0])
+    assert not np.isclose(first[0], second[0])
+
+
+def test_noise_per_element():
+    # one factor per coefficient and per element
+    first, second = _noise("element")
+    assert len(np.unique(first)) > 1 and len(np.unique(second)) > 1
+
+
+@pytest.mark.parametrize("noise", ["call", "coefficient", "element"])
+@pytest.mark.parametrize("hybridize", [False, True])
+def test_no_noise_in_eval_mode(noise, hybridize):
+    rational = Rational("tanh", version="D", noise=noise)
+    reference = Rational("tanh", version="B")
+    rational.initialize()
+    reference.initialize()
+    if hybridize:
+        rational.hybridize()
+    inputs = mx.nd.random.normal(shape=(4, 50))
+    expected = reference(inputs).asnumpy()
+    with autograd.record():
+        noised = rational(inputs).asnumpy()
+    assert not np.allclose(noised, expected)
+    # out of autograd.record(), and recorded in predict mode
+    assert np.allclose(rational(inputs).asnumpy(), expected, atol=1e-6)
+    with autograd.record(train_mode=False):
+        assert np.allclose(rational(inputs).asnumpy(), expected, atol=1e-6)
@@ -0,0 +1,72 @@
+"""
+This file tests the fused mxnet Rational operator
+(rational.mxnet.rational_mxnet_operator): its outputs and analytic gradients
+against the ones of autograd through the functions of
+rational.mxnet.rational_mxnet_functions.
+"""
+import numpy as np
+import pytest
+
+mx = pytest.importorskip("mxnet")
+autograd = mx.autograd
+
+from rational.mxnet import Rational
+
+
+def _outputs_and_gradients(rational, inputs, train_mode, seed):
+    # two calls in one record: every backward must use the noise of its call
+    inputs = [x.copy() for x in inputs]
+    for x in inputs:
+        x.attach_grad()
+    mx.random.seed(seed)
+    with autograd.record(train_mode=train_mode):
+        outputs = [rational(x) for x in inputs]
+        loss = sum((output * output).sum() for output in outputs)
+    loss.backward()
+    return ([output.asnumpy() for output in outputs] +
+            [x.grad.asnumpy() for x in inputs] +
+            [rational.numerator.grad().asnumpy(),
+             rational.denominator.grad().asnumpy()])
+
+
+@pytest.mark.parametrize("version, noise", [("A", "coefficient"), ("B", "coefficient"),
+                                            ("C", "coefficient"), ("D", "call"),
+                                            ("D", "coefficient")])
+@pytest.mark.parametrize("train_mode", [False, True])
+@pytest.mark.parametrize("hybridize", [False, True])
+def test_fused_gradients(version, noise, train_mode, hybridize):
+    inputs = [mx.nd.random.normal(shape=(8, 16)), mx.nd.random.normal(shape=(4, 5))]
+    results = []
+    for fused in [False, True]:
+        rational = Rational("tanh", version=version, noise=noise, fused=fused)
+        rational.initialize()
+        if hybridize:
+            rational.hybridize()
+        results.append(_outputs_and_gradients(rational, inputs, train_mode, seed=1))
+    for fused, reference in zip(*results):
+        assert np.allclose(fused, reference, rtol=1e-4, atol=1e-5)
+
+
+def test_noise_in_training():
+    x = mx.nd.random.normal(shape=(8, 16))
+    rational = Rational("tanh", version="D", fused=True)
+    rational.initialize()
+    with autograd.record():
+        noised = rational(x).asnumpy()
+    assert not np.allclose(noised, rational(x).asnumpy())
+
+
+@pytest.mark.parametrize("noise", ["call", "coefficient"])
+def test_random_deviation(noise):
+    # both paths draw the noise of the deviation of the block, from the same seed
+    x = mx.nd.random.normal(shape=(8, 16))
+    outputs = []
+    for fused, random_deviation in [(False, 0.5), (True, 0.5), (True, 0.1)]:
+        rational = Rational("tanh", version="D", noise=noise, fused=fused,
+                            random_deviation=random_deviation)
+        rational.initialize()
+        mx.random.seed(1)
+        with autograd.record():
+            outputs.append(rational(x).asnumpy())
+    assert np.allclose(outputs[0], outputs[1], rtol=1e-4, atol=1e-5)
+    assert not np.allclose(outputs[1], outputs[2])
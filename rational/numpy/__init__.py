@@ -1 +1,6 @@
-from .rationals import Rational
+from rational._lazy import lazy_attributes
+
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    "Rational": ".rationals",
+    "rational_batch": ".rationals",
+})
@@ -1,3 +1,7 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 
@@ -43,11 +47,69 @@ class Rational():
         else:
             raise ValueError("version %s not implemented" % version)
         self.activation_function = rational_func
+        # scratch buffers of the denominator, one per calling thread
+        self._buffers = threading.local()
 
-    def __call__(self, x):
+    def __call__(self, x, out=None, threads=None):
         if type(x) is int:
             x = float(x)
-        return self.activation_function(x, self.numerator, self.denominator)
+        if threads is None:
+            # below 16 blocks, the threads cost more than they save
+            threads = 1 if np.size(x) < 16 * 65536 else os.cpu_count()
+        if threads > 1:
+            return rational_parallel(x, self.numerator, self.denominator,
+                                     self.version, out, threads)
+        # scratch buffer of the denominator, reused between the calls of a
+        # thread (concurrent calls do not share it)
+        dtype = np.asarray(x).dtype if out is None else out.dtype
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+        scratch = getattr(self._buffers, "scratch", None)
+        if scratch is None or scratch.dtype != dtype or \
+                scratch.size < min(np.size(x), 65536):
+            scratch = np.empty(min(np.size(x), 65536), dtype)
+            self._buffers.scratch = scratch
+        return self.activation_function(x, self.numerator, self.denominator,
+                                        out, scratch)
+
+    def __getstate__(self):
+        # the thread-local buffers are not copied (nor pickled)
+        state = self.__dict__.copy()
+        del state["_buffers"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buffers = threading.local()
+
+    def transform_file(self, input_path, output_path, threads=None,
+                       block=65536):
+        """
+        Evaluates the rational function on the array of a `.npy` file, into \
+        a new `.npy` file, out of core: both are memory-mapped and processed \
+        by blocks (see :func:`rational_parallel`).
+
+        Arguments:
+                input_path (str):
+                    The `.npy` file of the inputs.\n
+                output_path (str):
+                    The `.npy` file of the outputs, of the shape (and float \
+                    dtype) of the inputs.\n
+                threads (int):
+                    The number of threads. If ``None``, one per CPU.\n
+                    Default ``None``
+                block (int):
+                    The number of elements evaluated at once by a thread.\n
+                    Default ``65536``
+        Returns:
+            np.memmap: the outputs
+        """
+        x = np.load(input_path, mmap_mode="r")
+        dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
+        out = np.lib.format.open_memmap(output_path, mode="w+", dtype=dtype,
+                                        shape=x.shape)
+        return rational_parallel(x, self.numerator, self.denominator,
+                                 self.version, out, threads, block)
 
     def torch(self, cuda=None, trainable=True, train_numerator=True,
               train_denominator=True):
@@ -81,7 +143,7 @@ class Rational():
                                           requires_grad=trainable and train_denominator)
         return rtorch
 
-    def fit(self, function, x_range=np.arange(-3., 3., 0.1)):
+    def fit(self, function, x_range=np.arange(-3., 3., 0.1), weights=None):
         """
         Compute the parameters a, b, c, and d to have the neurally equivalent \
         function of the provided one as close as possible to this rational \
@@ -94,10 +156,10 @@ class Rational():
                     The range on which the curves of the functions are fitted \
                     together. \n
                     Default ``True``
-                show (bool):
-                    If  ``True``, plots the final fitted function and \
-                    rational (using matplotlib) \n
-                    Default ``False``
+                weights (array):
+                    The least-squares weights of the points of `x_range`, \
+                    e.g. the frequencies of the input distribution bins. \n
+                    Default ``None``
 
         Returns:
             tuple: ((a, b, c, d), dist) with: \n
@@ -108,7 +170,7 @@ class Rational():
         """
         from rational.utils import find_closest_equivalent
         (a, b, c, d), distance = find_closest_equivalent(self, function,
-                                                         x_range)
+                                                         x_range, weights)
         return (a, b, c, d), distance
 
     def __repr__(self):
@@ -166,45 +228,237 @@ class Rational():
             return plt.gcf()
 
 
-def Rational_version_A(x, w_array, d_array):
-    xi = np.ones_like(x)
-    P = np.ones_like(x) * w_array[0]
-    for i in range(len(w_array) - 1):
-        xi *= x
-        P += w_array[i+1] * xi
-    xi = np.ones_like(x)
-    Q = np.ones_like(x)
-    for i in range(len(d_array)):
-        xi *= x
-        Q += np.abs(d_array[i] * xi)
-    return P/Q
-
-
-def Rational_version_B(x, w_array, d_array):
-    xi = np.ones_like(x)
-    P = np.ones_like(x) * w_array[0]
-    for i in range(len(w_array) - 1):
-        xi *= x
-        P += w_array[i+1] * xi
-    xi = np.ones_like(x)
-    Q = np.zeros_like(x)
-    for i in range(len(d_array)):
-        xi *= x
-        Q += d_array[i] * xi
-    Q = np.abs(Q) + np.ones_like(Q)
-    return P/Q
-
-
-def Rational_version_C(x, w_array, d_array):
-    xi = np.ones_like(x)
-    P = np.ones_like(x) * w_array[0]
-    for i in range(len(w_array) - 1):
-        xi *= x
-        P += w_array[i+1] * xi
-    xi = np.ones_like(x)
-    Q = np.zeros_like(x)
-    for i in range(len(d_array)):
-        Q += d_array[i] * xi  # Here b0 is considered
-        xi *= x
-    Q = np.abs(Q) + np.full_like(Q, 0.1)
-    return P/Q
+def _horner(x, coefficients, out):
+    # c_0 + c_1.x + ... + c_n.x^n in out, with Horner's scheme. Without any
+    # coefficient the sum is 0, Q being then the constant of its version
+    if len(coefficients) == 0:
+        out.fill(0.)
+        return out
+    out.fill(coefficients[-1])
+    for coefficient in coefficients[-2::-1]:
+        np.multiply(out, x, out=out)
+        np.add(out, coefficient, out=out)
+    return out
+
+
+def _rational_block(x, numerator, denominator, version, out, scratch):
+    # P(x) / Q(x) in out, Q(x) being computed in scratch
+    if version == "A":
+        # Q(x) = 1 + |x|.(|b_1| + |b_2|.|x| + ...), |x| held in out
+        np.abs(x, out=out)
+        _horner(out, np.abs(denominator), scratch)
+        np.multiply(scratch, out, out=scratch)
+        np.add(scratch, 1., out=scratch)
+    elif version == "C":
+        _horner(x, denominator, scratch)
+        np.abs(scratch, out=scratch)
+        np.add(scratch, 0.1, out=scratch)
+    else:
+        _horner(x, denominator, scratch)
+        np.multiply(scratch, x, out=scratch)
+        np.abs(scratch, out=scratch)
+        np.add(scratch, 1., out=scratch)
+    _horner(x, numerator, out)
+    return np.divide(out, scratch, out=out)
+
+
+def rational_horner(x, numerator, denominator, version="A", out=None,
+                    scratch=None, block=65536):
+    """
+    Evaluates the rational function P(x) / Q(x) of the given version with \
+    Horner's scheme, without any temporary array but `out` and `scratch`. \
+    Float inputs keep their precision (e.g. float32), other inputs are \
+    computed in float64. P and Q are evaluated by blocks of `block` \
+    elements, that stay in cache.
+
+    Arguments:
+            x (array):
+                The inputs.\n
+            numerator (array):
+                The coefficients of P, a_0 to a_n.\n
+            denominator (array):
+                The coefficients of Q, b_1 to b_m (b_0 to b_m for `C`).\n
+            version (str):
+                Version of Rational (`A`, `B` or `C`).\n
+                Default ``A``
+            out (array):
+                The (contiguous) output array, of the shape of `x`, not \
+                sharing its memory.\n
+                Default ``None``
+            scratch (array):
+                A buffer of at least min(x.size, block) elements of the \
+                dtype of the output, reused between the calls.\n
+                Default ``None``
+            block (int):
+                The number of elements evaluated at once.\n
+                Default ``65536``
+    Returns:
+        array: `out`, or a new array (a scalar for a scalar `x`)
+    """
+    if version not in ["A", "B", "C"]:
+        raise ValueError("version %s not implemented" % version)
+    scalar = np.ndim(x) == 0
+    x = np.asarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(np.float64)
+    dtype = x.dtype
+    numerator = np.asarray(numerator, dtype)
+    denominator = np.asarray(denominator, dtype)
+    if out is None:
+        out = np.empty(x.shape, dtype)
+    elif out.shape != x.shape or not out.flags.c_contiguous:
+        raise ValueError("out must be contiguous, of the shape of x")
+    elif np.shares_memory(out, x):
+        raise ValueError("out can not share the memory of x")
+    size = min(x.size, block)
+    if scratch is None or scratch.dtype != out.dtype or scratch.size < size:
+        scratch = np.empty(size, out.dtype)
+    x_flat, out_flat, scratch = x.reshape(-1), out.reshape(-1), scratch.reshape(-1)
+    for start in range(0, x.size, block):
+        stop = min(start + block, x.size)
+        _rational_block(x_flat[start:stop], numerator, denominator, version,
+                        out_flat[start:stop], scratch[:stop - start])
+    return out[()] if scalar else out
+
+
+def rational_parallel(x, numerator, denominator, version="A", out=None,
+                      threads=None, block=65536):
+    """
+    Evaluates the rational function P(x) / Q(x) of the given version by \
+    blocks of `block` elements on a pool of threads (numpy releases the GIL \
+    in its ufuncs), each thread reusing its own scratch buffer. Only the \
+    current blocks are held in memory: `x` and `out` can be `np.memmap` \
+    arrays larger than the memory, the non float inputs being converted by \
+    block.
+
+    Arguments:
+            x (array):
+                The inputs, e.g. a `np.memmap`.\n
+            numerator (array):
+                The coefficients of P, a_0 to a_n.\n
+            denominator (array):
+                The coefficients of Q, b_1 to b_m (b_0 to b_m for `C`).\n
+            version (str):
+                Version of Rational (`A`, `B` or `C`).\n
+                Default ``A``
+            out (array):
+                The (contiguous) output array, of the shape of `x`, e.g. a \
+                `np.memmap` (flushed at the end). It may be `x` itself.\n
+                Default ``None``
+            threads (int):
+                The number of threads. If ``None``, one per CPU.\n
+                Default ``None``
+            block (int):
+                The number of elements evaluated at once by a thread.\n
+                Default ``65536``
+    Returns:
+        array: `out`, or a new array
+    """
+    if version not in ["A", "B", "C"]:
+        raise ValueError("version %s not implemented" % version)
+    x = np.asanyarray(x)
+    dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
+    if out is None:
+        out = np.empty(x.shape, dtype)
+    elif out.shape != x.shape or not out.flags.c_contiguous:
+        raise ValueError("out must be contiguous, of the shape of x")
+    elif not np.issubdtype(out.dtype, np.floating):
+        raise ValueError("out must be a float array")
+    # in place, every block of x is copied before its outputs are written
+    in_place = np.shares_memory(out, x)
+    if in_place and (x.dtype != out.dtype or x.strides != out.strides or
+                     x.__array_interface__["data"][0] !=
+                     out.__array_interface__["data"][0]):
+        raise ValueError("out can only share the memory of x if it is x")
+    numerator = np.asarray(numerator, out.dtype)
+    denominator = np.asarray(denominator, out.dtype)
+    x_flat, out_flat = x.reshape(-1), out.reshape(-1)
+    buffers = threading.local()
+
+    def evaluate(start):
+        stop = min(start + block, x.size)
+        if not hasattr(buffers, "scratch"):
+            buffers.scratch = np.empty(block, out.dtype)
+            buffers.inputs = np.empty(block, out.dtype)
+        x_block = x_flat[start:stop]
+        if in_place or x_block.dtype != out.dtype:
+            # copied (and converted), as out is overwritten
+            x_block = buffers.inputs[:stop - start]
+            x_block[...] = x_flat[start:stop]
+        _rational_block(x_block, numerator, denominator, version,
+                        out_flat[start:stop], buffers.scratch[:stop - start])
+
+    starts = range(0, x.size, block)
+    threads = os.cpu_count() if threads is None else threads
+    if threads <= 1 or len(starts) <= 1:
+        for start in starts:
+            evaluate(start)
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            # consumed for the exceptions of the threads
+            for _ in executor.map(evaluate, starts):
+                pass
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def rational_batch(x, numerators, denominators, version="A"):
+    """
+    Evaluates K rational functions of the given version on the same inputs \
+    at once: the powers of x are computed once, and P and Q of every \
+    function by a matrix product.
+
+    Arguments:
+            x (array):
+                The shared inputs, of any shape.\n
+            numerators (array):
+                The coefficients of the K numerators, [K, n + 1].\n
+            denominators (array):
+                The coefficients of the K denominators, [K, m] ([K, m + 1] \
+                for `C`).\n
+            version (str):
+                Version of Rational (`A`, `B` or `C`).\n
+                Default ``A``
+    Returns:
+        array: the outputs, [K, *x.shape]
+    """
+    if version not in ["A", "B", "C"]:
+        raise ValueError("version %s not implemented" % version)
+    x = np.asarray(x)
+    dtype = x.dtype if np.issubdtype(x.dtype, np.floating) else np.float64
+    numerators = np.atleast_2d(np.asarray(numerators, dtype))
+    denominators = np.atleast_2d(np.asarray(denominators, dtype))
+    if len(numerators) != len(denominators):
+        raise ValueError("as many numerators as denominators are needed")
+    first_power = 0 if version == "C" else 1
+    nb_powers = max(numerators.shape[1],
+                    denominators.shape[1] + first_power)
+    # powers of x, in the dtype of x (np.vander promotes float32)
+    xps = np.empty((x.size, nb_powers), dtype)
+    xps[:, 0] = 1.
+    for i in range(1, nb_powers):
+        np.multiply(xps[:, i - 1], x.reshape(-1), out=xps[:, i])
+    features = xps[:, first_power:first_power + denominators.shape[1]]
+    P = numerators.dot(xps[:, :numerators.shape[1]].T)
+    if version == "A":
+        # |b_i.x^i| = |b_i|.|x|^i
+        Q = np.abs(denominators).dot(np.abs(features).T)
+        Q += 1.
+    else:
+        Q = np.abs(denominators.dot(features.T))
+        Q += 0.1 if version == "C" else 1.
+    P /= Q
+    return P.reshape((len(numerators),) + x.shape)
+
+
+def Rational_version_A(x, w_array, d_array, out=None, scratch=None):
+    return rational_horner(x, w_array, d_array, "A", out, scratch)
+
+
+def Rational_version_B(x, w_array, d_array, out=None, scratch=None):
+    return rational_horner(x, w_array, d_array, "B", out, scratch)
+
+
+def Rational_version_C(x, w_array, d_array, out=None, scratch=None):
+    return rational_horner(x, w_array, d_array, "C", out, scratch)
@@ -0,0 +1,84 @@
+"""
+This file tests the Horner evaluation of the numpy rational functions.
+"""
+import numpy as np
+import pytest
+
+from rational.numpy import Rational
+from rational.numpy.rationals import rational_horner
+
+rng = np.random.default_rng(0)
+numerator = rng.standard_normal(6)
+
+
+def _powers(x, numerator, denominator, version):
+    # P(x) / Q(x) with the powers of x
+    numerator_powers = np.stack([x ** i for i in range(len(numerator))])
+    P = numerator.dot(numerator_powers)
+    if version == "A":
+        Q = 1. + np.abs(denominator[:, None] *
+                        np.stack([x ** (i + 1) for i in range(len(denominator))])).sum(0)
+    elif version == "B":
+        Q = 1. + np.abs(denominator.dot(np.stack([x ** (i + 1) for i in range(len(denominator))])))
+    else:
+        Q = 0.1 + np.abs(denominator.dot(np.stack([x ** i for i in range(len(denominator))])))
+    return P / Q
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C"])
+@pytest.mark.parametrize("block", [7, 65536])
+def test_horner(version, block):
+    denominator = rng.standard_normal(5 if version == "C" else 4)
+    x = rng.uniform(-3., 3., (40, 5))
+    expected = _powers(x.ravel(), numerator, denominator, version).reshape(x.shape)
+    assert np.allclose(rational_horner(x, numerator, denominator, version,
+                                       block=block), expected)
+    out, scratch = np.empty_like(x), np.empty(block)
+    result = rational_horner(x, numerator, denominator, version, out, scratch,
+                             block)
+    assert result is out and np.allclose(out, expected)
+
+
+@pytest.mark.parametrize("version, constant", [("A", 1.), ("B", 1.), ("C", 0.1)])
+def test_empty_coefficients(version, constant):
+    # e.g. a denominator of degree 0: Q is the constant of the version
+    x = rng.uniform(-3., 3., 50)
+    polynomial = numerator.dot(np.stack([x ** i for i in range(len(numerator))]))
+    assert np.allclose(rational_horner(x, numerator, [], version),
+                       polynomial / constant)
+    assert np.array_equal(rational_horner(x, [], [0.5], version),
+                          np.zeros_like(x))
+
+
+def test_dtypes():
+    denominator = rng.standard_normal(4)
+    x = rng.uniform(-3., 3., 100).astype(np.float32)
+    assert rational_horner(x, list(numerator), list(denominator)).dtype == np.float32
+    assert rational_horner(np.arange(-3, 3), numerator, denominator).dtype == np.float64
+    scalar = rational_horner(1.5, numerator, denominator)
+    assert np.ndim(scalar) == 0
+    assert np.isclose(scalar, _powers(np.array([1.5]), numerator, denominator, "A")[0])
+    with pytest.raises(ValueError):
+        rational_horner(x, numerator, denominator, out=x)
+
+
+def test_rational_out():
+    rational = Rational("tanh", version="B")
+    x = np.linspace(-3., 3., 100, dtype=np.float32)
+    out = np.empty_like(x)
+    assert rational(x, out=out) is out
+    assert out.dtype == np.float32
+    assert np.abs(out - np.tanh(x)).max() < 1e-2
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C"])
+def test_rational_batch(version):
+    from rational.numpy import rational_batch
+    numerators = rng.standard_normal((7, 6))
+    denominators = rng.standard_normal((7, 5 if version == "C" else 4))
+    x = rng.uniform(-3., 3., (10, 20)).astype(np.float32)
+    outputs = rational_batch(x, numerators, denominators, version)
+    assert outputs.shape == (7, 10, 20) and outputs.dtype == np.float32
+    for output, num, den in zip(outputs, numerators, denominators):
+        assert np.allclose(output, rational_horner(x, num, den, version),
+                           rtol=1e-4, atol=1e-5)
@@ -0,0 +1,74 @@
+"""
+This file tests the threaded and out of core evaluation of the numpy rational
+functions.
+"""
+import numpy as np
+import pytest
+
+from rational.numpy import Rational
+from rational.numpy.rationals import rational_horner, rational_parallel
+
+rng = np.random.default_rng(0)
+numerator = rng.standard_normal(6)
+denominator = rng.standard_normal(4)
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C"])
+@pytest.mark.parametrize("threads", [1, 4])
+def test_parallel(version, threads):
+    denominator = rng.standard_normal(5 if version == "C" else 4)
+    x = rng.uniform(-3., 3., (100, 37)).astype(np.float32)
+    expected = rational_horner(x, numerator, denominator, version)
+    result = rational_parallel(x, numerator, denominator, version,
+                               threads=threads, block=100)
+    assert result.dtype == np.float32
+    assert np.array_equal(result, expected)
+
+
+def test_in_place_and_conversion():
+    x = rng.uniform(-3., 3., 1000)
+    expected = rational_horner(x, numerator, denominator)
+    assert rational_parallel(x, numerator, denominator, out=x, threads=3,
+                             block=64) is x
+    assert np.array_equal(x, expected)
+    integers = np.arange(-500, 500)
+    assert np.allclose(rational_parallel(integers, numerator, denominator,
+                                         block=64),
+                       rational_horner(integers, numerator, denominator))
+    with pytest.raises(ValueError):
+        rational_parallel(x[1:], numerator, denominator, out=x[:-1])
+
+
+def test_memmap(tmp_path):
+    rational = Rational("tanh", version="B")
+    x = rng.uniform(-3., 3., (300, 100)).astype(np.float32)
+    np.save(tmp_path / "x.npy", x)
+    outputs = rational.transform_file(tmp_path / "x.npy", tmp_path / "y.npy",
+                                      threads=2, block=1000)
+    assert isinstance(outputs, np.memmap)
+    saved = np.load(tmp_path / "y.npy")
+    assert saved.dtype == np.float32 and saved.shape == x.shape
+    assert np.array_equal(saved, rational(x, threads=1))
+    assert np.array_equal(rational(x, threads=2), saved)
+
+
+def test_concurrent_calls():
+    import copy
+    from concurrent.futures import ThreadPoolExecutor
+    rational = Rational("tanh", version="B")
+    inputs = [rng.uniform(-3., 3., 65536) * scale for scale in range(1, 9)]
+
+    def call(x):
+        for _ in range(10):
+            result = rational(x, threads=1)
+        # every thread has its own scratch buffer
+        return result, rational._buffers.scratch
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(call, inputs))
+    for x, (result, _) in zip(inputs, results):
+        assert np.array_equal(result, rational_horner(x, rational.numerator,
+                                                      rational.denominator,
+                                                      "B"))
+    assert len(set(id(scratch) for _, scratch in results)) > 1
+    assert np.array_equal(copy.deepcopy(rational)(inputs[0]), results[0][0])
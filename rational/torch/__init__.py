@@ -1 +1,10 @@
-from .rationals import Rational, RecurrentRational, RecurrentRationalModule
+from rational._lazy import lazy_attributes
+
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    "Rational": ".rationals",
+    "RecurrentRational": ".rationals",
+    "RecurrentRationalModule": ".rationals",
+    "AugmentedRational": ".rationals",
+    "batched_fit": ".batched_fitting",
+    "rational_batch": ".batched_fitting",
+})
@@ -0,0 +1,211 @@
+"""
+Batched fitting of rational functions in pytorch
+================================================
+
+Fits B independent rational functions to B target curves sharing the same
+input grid at once, with a batched Levenberg-Marquardt (damped Gauss-Newton)
+solver. The jacobians are the closed form ones of the CUDA backward kernels.
+"""
+import torch
+
+
+def _denominator_features(xps, degrees, version):
+    # powers of x (of |x| for version A) multiplied by the denominator coeffs
+    if version == "A":
+        return xps[:, 1:degrees[1]+1].abs()
+    elif version == "C":
+        return xps[:, :degrees[1]+1]
+    return xps[:, 1:degrees[1]+1]
+
+
+def rational_batch(x, numerators, denominators, version="A", training=False,
+                   random_deviation=0.1):
+    """
+    Evaluates K rational functions of the given version on the same inputs \
+    at once: the powers of x are computed once, and P and Q of every \
+    function by a matrix product (differentiable w.r.t. x and the \
+    coefficients).
+
+    Arguments:
+            x (tensor):
+                The shared inputs, of any shape.\n
+            numerators (tensor):
+                The coefficients of the K numerators, [K, n + 1].\n
+            denominators (tensor):
+                The coefficients of the K denominators, [K, m] ([K, m + 1] \
+                for `C`).\n
+            version (str):
+                Version of Rational (`A`, `B`, `C` or `D`).\n
+                Default ``A``
+            training (bool):
+                If ``True``, version `D` noises the numerators (see \
+                `Rational_PYTORCH_D_F`), independently for every function.\n
+                Default ``False``
+            random_deviation (float):
+                The relative deviation of the noise of `D`.\n
+                Default ``0.1``
+    Returns:
+        tensor: the outputs, [K, *x.shape]
+    """
+    if version not in ["A", "B", "C", "D"]:
+        raise ValueError("version %s not implemented" % version)
+    numerators = torch.atleast_2d(numerators).to(x.dtype)
+    denominators = torch.atleast_2d(denominators).to(x.dtype)
+    if len(numerators) != len(denominators):
+        raise ValueError("as many numerators as denominators are needed")
+    if version == "D":
+        if training:
+            numerators = numerators * torch.empty_like(numerators).uniform_(
+                1 - random_deviation, 1 + random_deviation)
+        version = "B"
+    degrees = numerators.shape[1] - 1, denominators.shape[1] - (version == "C")
+    xps = torch.vander(x.reshape(-1), max(degrees) + 1, increasing=True)
+    features = _denominator_features(xps, degrees, version)
+    numerator = numerators.matmul(xps[:, :degrees[0] + 1].t())
+    if version == "A":
+        # |b_i.x^i| = |b_i|.|x|^i
+        denominator = 1. + denominators.abs().matmul(features.t())
+    else:
+        poly = denominators.matmul(features.t())
+        denominator = (0.1 if version == "C" else 1.) + poly.abs()
+    return (numerator / denominator).view((len(numerators),) + x.shape)
+
+
+def _rational_and_jacobian(xps, params, degrees, version):
+    """
+    Returns the rational functions [B, N] and their jacobian [B, N, n_params]
+    """
+    nb_num = degrees[0] + 1
+    w_params, d_params = params[:, :nb_num], params[:, nb_num:]
+    features = _denominator_features(xps, degrees, version)
+    numerator = w_params.matmul(xps[:, :nb_num].t())
+    if version == "A":
+        # Q = 1 + sum |b_i|.|x|^i, dQ/db_i = sign(b_i).|x|^i
+        denominator = 1. + d_params.abs().matmul(features.t())
+        d_denominator = features.unsqueeze(0) * d_params.sign().unsqueeze(1)
+    else:
+        # Q = eps + |A(x)|, dQ/db_i = sign(A(x)).x^i
+        poly = d_params.matmul(features.t())
+        denominator = (0.1 if version == "C" else 1.) + poly.abs()
+        d_denominator = features.unsqueeze(0) * poly.sign().unsqueeze(2)
+    jacobian = torch.cat([xps[:, :nb_num].unsqueeze(0) / denominator.unsqueeze(2),
+                          d_denominator * (- numerator / denominator ** 2).unsqueeze(2)],
+                         dim=2)
+    return numerator / denominator, jacobian
+
+
+def _linear_initialization(xps, y, degrees, version, max_iter=10):
+    """
+    Batched Sanathanan-Koerner iterations, as
+    `rational.utils.utils._linear_initialization`.
+    """
+    nb_num = degrees[0] + 1
+    # linearized with Q(x) = 1 + b_1.x + ... (powers of |x| for A)
+    if version == "A":
+        features = xps[:, 1:degrees[1]+1].abs()
+    else:
+        features = xps[:, 1:degrees[1]+1]
+    system = torch.cat([xps[:, :nb_num].expand(len(y), -1, -1),
+                        - y.unsqueeze(2) * features.unsqueeze(0)], dim=2)
+    weights = torch.ones_like(y)
+    for _ in range(max_iter):
+        sqrt_w = weights.sqrt().unsqueeze(2)
+        params = torch.linalg.lstsq(system * sqrt_w, (y.unsqueeze(2) * sqrt_w)).solution[..., 0]
+        denominator = (1. + params[:, nb_num:].matmul(features.t())).abs()
+        weights = 1. / denominator.clamp(min=1e-3) ** 2
+    if version == "A":
+        params[:, nb_num:] = params[:, nb_num:].abs()
+    elif version == "C":
+        # 0.1 + |b_0 + b_1.x + ...| = 1 + b_1.x + ... for b_0 = 0.9
+        params = torch.cat([params[:, :nb_num],
+                            torch.full_like(params[:, :1], 0.9),
+                            params[:, nb_num:]], dim=1)
+    return params
+
+
+def batched_fit(x, y, degrees=(5, 4), version="A", p0=None, max_iter=200,
+                tol=1e-10, dtype=torch.float64):
+    """
+    Fits B rational functions to B target curves at once, with a batched \
+    Levenberg-Marquardt solver.
+
+    Arguments:
+            x (tensor):
+                The input grid [N], shared by every target.\n
+            y (tensor):
+                The targets [B, N] (or [N] for a single fit).\n
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            version (str):
+                Version of Rational to fit (`D` is fitted as `B`).\n
+                Default ``A``
+            p0 (tensor):
+                The initial coefficients [B, n_params], numerators then \
+                denominators. If ``None``, found by linearized least squares.\n
+                Default ``None``
+            max_iter (int):
+                The maximum number of iterations.\n
+                Default ``200``
+            tol (float):
+                Stops a fit when its relative cost decrease is below `tol`.\n
+                Default ``1e-10``
+            dtype (torch.dtype):
+                The precision used for the fit.\n
+                Default ``torch.float64``
+    Returns:
+        tuple: (numerators [B, n+1], denominators [B, m], rmse [B])
+    """
+    if version not in ["A", "B", "C", "D"]:
+        raise ValueError("version %s not implemented" % version)
+    x = torch.as_tensor(x, dtype=dtype)
+    y = torch.as_tensor(y, dtype=dtype, device=x.device)
+    single = y.dim() == 1
+    if single:
+        y = y.unsqueeze(0)
+    nb_num = degrees[0] + 1
+    xps = torch.vander(x, max(degrees) + 1, increasing=True)
+    if p0 is None:
+        params = _linear_initialization(xps, y, degrees, version)
+    else:
+        params = torch.as_tensor(p0, dtype=dtype, device=x.device).clone()
+        if params.dim() == 1:
+            params = params.expand(len(y), -1).clone()
+    fallback = ~torch.isfinite(params).all(1)
+    params[fallback] = 1.
+
+    rational, jacobian = _rational_and_jacobian(xps, params, degrees, version)
+    residuals = rational - y
+    cost = (residuals ** 2).sum(1)
+    damping = torch.full_like(cost, 1e-3)
+    active = torch.ones_like(cost, dtype=torch.bool)
+    eye = torch.eye(params.shape[1], dtype=dtype, device=x.device)
+    for _ in range(max_iter):
+        jtj = jacobian.transpose(1, 2).matmul(jacobian)
+        jtr = jacobian.transpose(1, 2).matmul(residuals.unsqueeze(2))[..., 0]
+        diag = jtj.diagonal(dim1=1, dim2=2).clamp(min=1e-12)
+        lhs = jtj + damping[:, None, None] * diag.unsqueeze(2) * eye
+        step = torch.linalg.solve(lhs, - jtr)
+        step[~active] = 0.
+        new_params = params + step
+        new_rational, new_jacobian = _rational_and_jacobian(xps, new_params,
+                                                            degrees, version)
+        new_residuals = new_rational - y
+        new_cost = (new_residuals ** 2).sum(1)
+        improved = (new_cost < cost) & active
+        decrease = (cost - new_cost) / cost.clamp(min=1e-300)
+        # accepted steps
+        params = torch.where(improved[:, None], new_params, params)
+        residuals = torch.where(improved[:, None], new_residuals, residuals)
+        jacobian = torch.where(improved[:, None, None], new_jacobian, jacobian)
+        cost = torch.where(improved, new_cost, cost)
+        damping = torch.where(improved, damping / 3., damping * 2.)
+        converged = (improved & (decrease < tol)) | (damping > 1e10) | (cost < 1e-30)
+        active = active & ~converged
+        if not active.any():
+            break
+    rmse = (cost / y.shape[1]).sqrt()
+    numerators, denominators = params[:, :nb_num], params[:, nb_num:]
+    if single:
+        return numerators[0], denominators[0], rmse[0]
+    return numerators, denominators, rmse
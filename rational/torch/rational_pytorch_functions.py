@@ -52,3 +52,75 @@ def Rational_PYTORCH_D_F(x, weight_numerator, weight_denominator, training, rand
                        ).sum(1)
     denominator = xps[:, 1:len_deno+1].mul(weight_denominator).sum(1).abs()
     return numerator.div(1 + denominator).view(x.shape)
+
+
+def _horner_plan(coefficients, first_power=0, skip_zeros=True):
+    # (parity, powers) of the evaluation of sum_i c_i * X^(first_power + i):
+    # the powers of the (non zero) terms, and their parity if they share one
+    powers = tuple(first_power + i for i, c in enumerate(coefficients.tolist())
+                   if c != 0 or not skip_zeros)
+    parities = set(power % 2 for power in powers)
+    parity = parities.pop() if len(parities) == 1 and len(powers) > 1 else None
+    return parity, powers
+
+
+def _horner(x, coefficients, first_power=0, plan=None, inplace=False):
+    # sum_i c_i * X^(first_power + i) with Horner's scheme, without the powers
+    # of X, over the powers of the plan (in X^2 if they share their parity)
+    if plan is None:
+        plan = None, tuple(range(first_power, first_power + len(coefficients)))
+    parity, powers = plan
+    if not powers:
+        return torch.zeros_like(x)
+    coefficients = coefficients.unbind()
+    base, exponents = x, powers
+    if parity is not None:
+        base = x * x
+        exponents = tuple((power - parity) // 2 for power in powers)
+    mul = torch.Tensor.mul_ if inplace else torch.mul
+    add = torch.Tensor.add_ if inplace else torch.add
+    result = None
+    previous = exponents[-1]
+    top = coefficients[powers[-1] - first_power]
+    for exponent, power in zip(exponents[-2::-1], powers[-2::-1]):
+        gap = previous - exponent
+        if result is None:
+            result, gap = base * top, gap - 1
+        for _ in range(gap):
+            result = mul(result, base)
+        result = add(result, coefficients[power - first_power])
+        previous = exponent
+    if result is None:
+        if previous == 0:
+            result = top * torch.ones_like(x)
+        else:
+            result, previous = base * top, previous - 1
+    for _ in range(previous):
+        result = mul(result, base)
+    if parity == 1:
+        result = mul(result, x)
+    return result
+
+
+def Rational_PYTORCH_horner_F(x, weight_numerator, weight_denominator,
+                              training, version="B", plans=(None, None)):
+    # P(X) / Q(X) of versions A, B, C (and D without noise), evaluated with
+    # Horner's scheme: a few element-wise operations (in place without
+    # autograd), fused by torch.compile. The plans (see _horner_plan) skip
+    # the zero terms of P and Q.
+    inplace = not (torch.is_grad_enabled() and (x.requires_grad or
+                                                weight_numerator.requires_grad or
+                                                weight_denominator.requires_grad))
+    numerator = _horner(x, weight_numerator, 0, plans[0], inplace)
+    if version == "A":
+        abs_x = x.abs()
+        denominator = _horner(abs_x, weight_denominator.abs(), 1, plans[1],
+                              inplace)
+    else:
+        denominator = _horner(x, weight_denominator, 0 if version == "C" else 1,
+                              plans[1], inplace)
+        denominator = denominator.abs_() if inplace else denominator.abs()
+    eps = 0.1 if version == "C" else 1.
+    if inplace:
+        return numerator.div_(denominator.add_(eps))
+    return numerator / (denominator + eps)
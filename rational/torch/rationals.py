@@ -5,6 +5,8 @@ Padé Activation Units - Rational Activation Functions for pytorch
 This module allows you to create Rational Neural Networks using Padé Activation
 Units - Learnabe Rational activation functions.
 """
+from functools import partial
+
 import torch.nn as nn
 from torch.cuda import is_available as torch_cuda_available
 from rational.utils.get_weights import get_parameters
@@ -18,6 +20,7 @@ if torch_cuda_available():
         exit(1)
 
 from rational.torch.rational_pytorch_functions import *
+from rational.torch.rational_pytorch_functions import _horner_plan
 
 
 class RecurrentRational():
@@ -91,8 +94,9 @@ class RecurrentRationalModule(nn.Module):
     def numpy(self):
         return self.rational.numpy()
 
-    def fit(self, function, x=None, show=False):
-        return self.rational.fit(function=function, x=x, show=show)
+    def fit(self, function, x=None, show=False, weights=None):
+        return self.rational.fit(function=function, x=x, show=show,
+                                 weights=weights)
 
     def input_retrieve_mode(self, auto_stop=True, max_saves=1000, bin_width=0.1):
         """
@@ -228,6 +232,7 @@ class Rational(nn.Module):
         self.distribution = None
         self.best_fitted_function = None
         self.best_fitted_function_params = None
+        self.frozen = False
 
     def forward(self, x):
         return self.activation_function(x, self.numerator, self.denominator,
@@ -253,6 +258,8 @@ class Rational(nn.Module):
         self.device = "cpu"
         self.numerator = nn.Parameter(self.numerator.cpu())
         self.denominator = nn.Parameter(self.denominator.cpu())
+        if getattr(self, "frozen", False):
+            self.freeze(self._compile)
 
     def cuda(self, device="0"):
         if self.version == "A":
@@ -272,6 +279,8 @@ class Rational(nn.Module):
         self.activation_function = rational_func.apply
         self.numerator = nn.Parameter(self.numerator.to(self.device))
         self.denominator = nn.Parameter(self.denominator.to(self.device))
+        if getattr(self, "frozen", False):
+            self.freeze(self._compile)
 
     def to(self, device):
         if "cpu" in str(device):
@@ -291,6 +300,36 @@ class Rational(nn.Module):
         else:
             return super._apply(fn)
 
+    def freeze(self, compile=False):
+        """
+        Freezes the coefficients and evaluates this rational function with \
+        Horner's scheme, for inference (e.g. as a surrogate of an \
+        activation). The zero coefficients are skipped, and P or Q is \
+        evaluated in x^2 if only its odd (or even) terms are not zero. \
+        Version D is evaluated without noise. Freeze again after modifying \
+        the coefficients.
+
+        Arguments:
+                compile (bool):
+                    If ``True``, fuses the evaluation in one kernel with \
+                    `torch.compile`.\n
+                    Default ``False``
+        """
+        self.numerator.requires_grad_(False)
+        self.denominator.requires_grad_(False)
+        self.training = False
+        self.frozen = True
+        self._compile = compile
+        plans = (_horner_plan(self.numerator),
+                 _horner_plan(self.denominator,
+                              0 if self.version == "C" else 1))
+        rational_func = partial(Rational_PYTORCH_horner_F,
+                                version=self.version, plans=plans)
+        if compile:
+            rational_func = torch.compile(rational_func)
+        self.activation_function = rational_func
+        return self
+
     def numpy(self):
         """
         Returns a numpy version of this activation function.
@@ -302,7 +341,7 @@ class Rational(nn.Module):
         rational_n.denominator = self.denominator.tolist()
         return rational_n
 
-    def fit(self, function, x=None, show=False):
+    def fit(self, function, x=None, show=False, weights=None):
         """
         Compute the parameters a, b, c, and d to have the neurally equivalent \
         function of the provided one as close as possible to this rational \
@@ -313,12 +352,16 @@ class Rational(nn.Module):
                     The function you want to fit to rational.\n
                 x (array):
                     The range on which the curves of the functions are fitted
-                    together.\n
-                    Default ``True``
+                    together. If ``None``, the bins of the input distribution \
+                    (if retrieved) weighted by their frequencies.\n
+                    Default ``None``
                 show (bool):
                     If  ``True``, plots the final fitted function and \
                     rational (using matplotlib).\n
                     Default ``False``
+                weights (array):
+                    The least-squares weights of the points of `x`.\n
+                    Default ``None``
         Returns:
             tuple: ((a, b, c, d), dist) with: \n
             a, b, c, d: the parameters to adjust the function \
@@ -330,17 +373,17 @@ class Rational(nn.Module):
             function = function.numpy()
         used_dist = False
         rational_numpy = self.numpy()
-        if x is not None:
-            (a, b, c, d), distance = rational_numpy.fit(function, x)
-        else:
+        if x is None:
             if self.distribution is not None:
                 freq, bins = _cleared_arrays(self.distribution)
                 x = bins
+                # the bins are weighted by their frequencies
+                weights = freq
                 used_dist = True
             else:
                 import numpy as np
                 x = np.arange(-3., 3., 0.1)
-            (a, b, c, d), distance = rational_numpy.fit(function, x)
+        (a, b, c, d), distance = rational_numpy.fit(function, x, weights)
         if show:
             import matplotlib.pyplot as plt
             import torch
@@ -365,15 +408,56 @@ class Rational(nn.Module):
             self.best_fitted_function_params = (a, b, c, d)
         return (a, b, c, d), distance
 
-    def best_fit(self, functions_list, x=None, shows=False):
-        if self.distribution is not None:
-            freq, bins = _cleared_arrays(self.distribution)
-            x = bins
+    def best_fit(self, functions_list, x=None, shows=False, incremental=False,
+                 parallel=False, k=3):
+        """
+        Finds the function of `functions_list` closest to this rational \
+        function (see :meth:`fit`).
+
+        Arguments:
+                functions_list (list of callable or FunctionIndex):
+                    The candidate functions. If a \
+                    :class:`rational.utils.FunctionIndex`, only the `k` \
+                    nearest indexed functions are fitted.\n
+                x (array):
+                    The range on which the curves are fitted. If ``None``, \
+                    the bins of the input distribution (if retrieved) \
+                    weighted by their frequencies.\n
+                    Default ``None``
+                shows (bool):
+                    If  ``True``, plots every fitted function.\n
+                    Default ``False``
+                incremental (bool):
+                    If ``True``, reuses the previous incremental call: \
+                    nothing is refitted if the distribution and the \
+                    rational barely changed, fits are warm-started and \
+                    hopeless candidates skipped (see \
+                    :func:`rational.utils.incremental_best_fit`).\n
+                    Default ``False``
+                parallel (bool):
+                    If ``True``, fits the candidates in a thread pool, \
+                    after pruning them on a coarse grid (see \
+                    :func:`rational.utils.parallel_best_fit`).\n
+                    Default ``False``
+                k (int):
+                    The number of candidates retrieved from a \
+                    `FunctionIndex`.\n
+                    Default ``3``
+        Returns:
+            tuple: (function, (a, b, c, d))
+        """
+        from rational.utils import FunctionIndex
+        if isinstance(functions_list, FunctionIndex):
+            return self._index_best_fit(functions_list, x, k)
+        if incremental:
+            return self._incremental_best_fit(functions_list, x)
+        if parallel:
+            return self._parallel_best_fit(functions_list, x)
         (a, b, c, d), distance = self.fit(functions_list[0], x=x, show=shows)
         min_dist = distance
         print(f"{functions_list[0]}: {distance:>3}")
         params = (a, b, c, d)
-        final_function = functions_list[0]
+        final_func = functions_list[0]
         for func in functions_list[1:]:
             (a, b, c, d), distance = self.fit(func, x=x, show=shows)
             print(f"{func}: {distance:>3}")
@@ -384,7 +468,45 @@ class Rational(nn.Module):
                 print(f"{func} is the new best fitted function")
         self.best_fitted_function = final_func
         self.best_fitted_function_params = params
-        return final_func, (a, b, c, d)
+        return final_func, params
+
+    def _fit_inputs(self, x=None):
+        # inputs (and their weights) of the fits
+        weights = None
+        if x is None:
+            if self.distribution is not None:
+                weights, x = _cleared_arrays(self.distribution)
+            else:
+                import numpy as np
+                x = np.arange(-3., 3., 0.1)
+        return x, weights
+
+    def _parallel_best_fit(self, functions_list, x=None):
+        from rational.utils import parallel_best_fit
+        x, weights = self._fit_inputs(x)
+        final_func, params, _, _ = parallel_best_fit(self.numpy(),
+                                                     functions_list, x,
+                                                     weights)
+        self.best_fitted_function = final_func
+        self.best_fitted_function_params = params
+        return final_func, params
+
+    def _index_best_fit(self, index, x=None, k=3):
+        x, weights = self._fit_inputs(x)
+        final_func, params, _ = index.best_fit(self.numpy(), x, weights, k)
+        self.best_fitted_function = final_func
+        self.best_fitted_function_params = params
+        return final_func, params
+
+    def _incremental_best_fit(self, functions_list, x=None):
+        from rational.utils import incremental_best_fit
+        x, weights = self._fit_inputs(x)
+        final_func, params, _, self._best_fit_state = incremental_best_fit(
+            self.numpy(), functions_list, x, weights,
+            getattr(self, "_best_fit_state", None))
+        self.best_fitted_function = final_func
+        self.best_fitted_function_params = params
+        return final_func, params
 
 
     def _from_old(self, old_rational_func):
@@ -609,7 +731,7 @@ def _cleared_arrays(hist, tolerance=0.001):
     return freq[first:last], bins[first:last]
 
 
-class AugmentedRational(nn.Module):
+class AugmentedRational(Rational):
     """
     Augmented Rational activation function inherited from ``Rational``
 
@@ -644,11 +766,14 @@ class AugmentedRational(nn.Module):
     def __init__(self, approx_func="leaky_relu", degrees=(5, 4), cuda=None,
                  version="A", trainable=True, train_numerator=True,
                  train_denominator=True):
-        super(AugmentedRational, self).__init__()
-        self.in_bias = nn.Parameter(torch.FloatTensor([0.0]))
-        self.out_bias = nn.Parameter(torch.FloatTensor([0.0]))
-        self.vertical_scale = nn.Parameter(torch.FloatTensor([1.0]))
-        self.horizontal_scale = nn.Parameter(torch.FloatTensor([1.0]))
+        super(AugmentedRational, self).__init__(approx_func, degrees, cuda,
+                                                version, trainable,
+                                                train_numerator,
+                                                train_denominator)
+        self.in_bias = nn.Parameter(torch.FloatTensor([0.0]).to(self.device))
+        self.out_bias = nn.Parameter(torch.FloatTensor([0.0]).to(self.device))
+        self.vertical_scale = nn.Parameter(torch.FloatTensor([1.0]).to(self.device))
+        self.horizontal_scale = nn.Parameter(torch.FloatTensor([1.0]).to(self.device))
 
     def forward(self, x):
         x = self.horizontal_scale * x + self.in_bias
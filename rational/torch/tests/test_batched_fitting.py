@@ -0,0 +1,69 @@
+"""
+This file tests the batched fitting (rational.torch.batched_fitting) and the
+batched evaluation (rational_batch) of rational functions in torch.
+"""
+import torch
+import numpy as np
+from rational.torch.batched_fitting import batched_fit
+from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
+    Rational_version_C
+
+
+x = torch.arange(-3., 3., 0.01, dtype=torch.float64)
+targets = torch.stack([torch.tanh(x), torch.sigmoid(x), x * torch.sigmoid(x)])
+rational_funcs = {"A": Rational_version_A, "B": Rational_version_B,
+                  "C": Rational_version_C, "D": Rational_version_B}
+
+
+def _test_batched_fit(version):
+    numerators, denominators, rmse = batched_fit(x, targets, (5, 4), version)
+    assert numerators.shape == (3, 6)
+    assert denominators.shape == (3, 5 if version == "C" else 4)
+    assert np.all(rmse.numpy() < 1e-4)
+    # consistent with the numpy rational functions
+    for num, den, target in zip(numerators, denominators, targets):
+        approx = rational_funcs[version](x.numpy(), num.numpy(), den.numpy())
+        assert np.allclose(approx, target.numpy(), atol=1e-3)
+
+
+def test_batched_fit_A():
+    _test_batched_fit("A")
+
+
+def test_batched_fit_B():
+    _test_batched_fit("B")
+
+
+def test_batched_fit_C():
+    _test_batched_fit("C")
+
+
+def test_batched_fit_D():
+    _test_batched_fit("D")
+
+
+def test_batched_fit_single():
+    numerator, denominator, rmse = batched_fit(x, targets[0], (5, 4), "B",
+                                               p0=torch.ones(10))
+    assert numerator.shape == (6,) and rmse < 1e-4
+
+
+def test_rational_batch():
+    from rational.torch import rational_batch
+    from rational.torch.rational_pytorch_functions import \
+        Rational_PYTORCH_horner_F
+    grid = x.view(20, 30)
+    for version in ["A", "B", "C", "D"]:
+        numerators = torch.randn(4, 6, dtype=torch.float64, requires_grad=True)
+        denominators = torch.randn(4, 5 if version == "C" else 4,
+                                   dtype=torch.float64)
+        outputs = rational_batch(grid, numerators, denominators, version)
+        assert outputs.shape == (4, 20, 30)
+        for output, num, den in zip(outputs, numerators, denominators):
+            expected = Rational_PYTORCH_horner_F(grid, num, den, False,
+                                                 version)
+            assert torch.allclose(output, expected)
+        outputs.sum().backward()
+        assert numerators.grad.shape == numerators.shape
+    noised = rational_batch(x, numerators, denominators, "D", training=True)
+    assert not torch.allclose(noised, outputs.view(4, -1))
@@ -1,2 +1,21 @@
-from .utils import fit_rational_to_base_function, find_closest_equivalent
-from .find_init_weights import find_weights
+from rational._lazy import lazy_attributes
+
+__getattr__, __dir__, __all__ = lazy_attributes(__name__, {
+    "fit_rational_to_base_function": ".utils",
+    "find_closest_equivalent": ".utils",
+    "incremental_best_fit": ".utils",
+    "find_weights": ".find_init_weights",
+    "batch_fit": ".batch_fitting",
+    "parallel_best_fit": ".best_fit",
+    "best_fit_model": ".best_fit",
+    "FunctionIndex": ".function_index",
+    "torch_activations": ".function_index",
+    "StreamingFit": ".streaming_fitting",
+    "streaming_fit": ".streaming_fitting",
+    "convert_to_rational": ".convert_network",
+    "convert_to_rational_surrogates": ".convert_network",
+    "convert_rational_to_native": ".convert_network",
+    "fold_augmented_rationals": ".folding",
+    "simplify_rational": ".simplify",
+    "simplify_rationals": ".simplify",
+})
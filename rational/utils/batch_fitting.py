@@ -0,0 +1,245 @@
+"""
+batch_fitting.py
+====================================
+Non interactive fitting of many rational approximations in parallel, e.g. to
+regenerate `rationals_config.json`.
+
+usage: python -m rational.utils.batch_fitting --functions relu tanh \
+           --versions A B C D --degrees 5/4 --bounds -3 3
+
+The fits are distributed over a process pool, and all the results are stored
+in the configuration file at once.
+"""
+import argparse
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .find_init_weights import rational_versions, store_in_config_file
+from .utils import fit_rational_to_base_function
+
+
+def _swish(x):
+    import torch
+    return x * torch.sigmoid(x)
+
+
+def _identity(x):
+    return x
+
+
+# known functions, from torch.nn.functional unless specified
+known_functions = {"relu": "relu", "leaky_relu": "leaky_relu",
+                   "tanh": "torch:tanh", "sigmoid": "torch:sigmoid",
+                   "gelu": "gelu", "swish": _swish, "identity": _identity}
+
+
+def resolve_function(name):
+    """
+    Returns the function named `name`: either a known one (see \
+    `known_functions`), or a ``module:function`` path.
+    """
+    path = known_functions.get(name, name)
+    if callable(path):
+        return path
+    if ":" not in path:
+        path = f"torch.nn.functional:{path}"
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _fit_task(task):
+    """
+    Fits one rational approximation, in a worker process.
+    """
+    import torch
+    function_name, version, degrees, bounds, nb_points = task
+    function = resolve_function(function_name)
+    lb, ub = bounds
+    x = np.arange(lb, ub, (ub - lb) / nb_points)
+
+    def function_to_approx(x):
+        return function(torch.tensor(x)).numpy()
+
+    rational = rational_versions[version]
+    start = time.perf_counter()
+    try:
+        w_params, d_params = fit_rational_to_base_function(
+            rational, function_to_approx, x, degrees=degrees, version=version)
+    except RuntimeError as err:
+        return {"task": task, "error": str(err),
+                "time": time.perf_counter() - start}
+    duration = time.perf_counter() - start
+    error = rational(x, w_params, d_params) - function_to_approx(x)
+    return {"task": task, "numerator": w_params, "denominator": d_params,
+            "time": duration, "rmse": float(np.sqrt(np.mean(error ** 2))),
+            "max_error": float(np.abs(error).max())}
+
+
+def _torch_fit_tasks(tasks):
+    """
+    Fits the tasks sharing their version, degrees and grid in one call of \
+    the batched torch solver.
+    """
+    import torch
+    from rational.torch.batched_fitting import batched_fit
+    groups = {}
+    for task in tasks:
+        groups.setdefault(task[1:], []).append(task)
+    results = {}
+    for (version, degrees, bounds, nb_points), group in groups.items():
+        lb, ub = bounds
+        x = torch.from_numpy(np.arange(lb, ub, (ub - lb) / nb_points))
+        y = torch.stack([resolve_function(task[0])(x) for task in group])
+        start = time.perf_counter()
+        numerators, denominators, _ = batched_fit(x, y, degrees, version)
+        duration = (time.perf_counter() - start) / len(group)
+        rational = rational_versions[version]
+        for task, w_params, d_params, y_task in zip(group, numerators.numpy(),
+                                                    denominators.numpy(),
+                                                    y.numpy()):
+            error = rational(x.numpy(), w_params, d_params) - y_task
+            results[task] = {"task": task, "numerator": w_params,
+                             "denominator": d_params, "time": duration,
+                             "rmse": float(np.sqrt(np.mean(error ** 2))),
+                             "max_error": float(np.abs(error).max())}
+    return [results[task] for task in tasks]
+
+
+def batch_fit(functions, versions=("A", "B", "C", "D"), degrees=((5, 4),),
+              bounds=(-3., 3.), nb_points=100000, workers=None, save=True,
+              config_file=None, verbose=True, solver="scipy"):
+    """
+    Fits rational functions to every combination of the given functions, \
+    versions and degrees, in parallel.
+
+    Arguments:
+            functions (list of str):
+                The names of the functions to approximate, known ones \
+                (`relu`, `leaky_relu`, `tanh`, `sigmoid`, `gelu`, `swish`, \
+                `identity`) or ``module:function`` paths.\n
+            versions (list of str):
+                The versions of Rational to fit.\n
+                Default ``("A", "B", "C", "D")``
+            degrees (list of tuple):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``((5, 4),)``
+            bounds (tuple):
+                The range (lower bound, upper bound) to approximate on.\n
+                Default ``(-3., 3.)``
+            nb_points (int):
+                The number of points of the approximation range.\n
+                Default ``100000``
+            workers (int):
+                The number of processes, ``None`` for the number of cores.\n
+                Default ``None``
+            save (bool):
+                If ``True``, stores all the found coefficients in the \
+                configuration file, in one write.\n
+                Default ``True``
+            config_file (str):
+                The configuration file to update.\n
+                Default ``None`` (rationals_config.json of the package)
+            verbose (bool):
+                If ``True``, prints the time and residual of every fit.\n
+                Default ``True``
+            solver (str):
+                `scipy`: one least-squares fit per process of the pool.\n
+                `torch`: one batched fit (see \
+                :func:`rational.torch.batched_fitting.batched_fit`) for all \
+                the functions sharing a version and degrees, the time \
+                reported is then the average per fit.\n
+                Default ``scipy``
+    Returns:
+        list: one dictionary per fit, with the keys `task`, `numerator`, \
+        `denominator`, `time`, `rmse` and `max_error` (or `error` if the fit \
+        failed).
+    """
+    tasks = [(function, version, tuple(degs), tuple(bounds), nb_points)
+             for function in functions for version in versions
+             for degs in degrees]
+    if solver == "torch":
+        results = _torch_fit_tasks(tasks)
+    elif solver == "scipy":
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_fit_task, tasks))
+    else:
+        raise ValueError("solver %s not implemented" % solver)
+    if verbose:
+        print(f"{'function':<16}{'version':<9}{'degrees':<9}{'time (s)':>10}"
+              f"{'rmse':>12}{'max error':>12}")
+        for res in results:
+            function, version, degs, _, _ = res["task"]
+            line = f"{function:<16}{version:<9}{'%d/%d' % degs:<9}" \
+                   f"{res['time']:>10.2f}"
+            if "error" in res:
+                print(f"{line}  failed: {res['error']}")
+            else:
+                print(f"{line}{res['rmse']:>12.2e}{res['max_error']:>12.2e}")
+    if save:
+        entries = []
+        for res in results:
+            if "error" in res:
+                continue
+            function, version, degs, (lb, ub), _ = res["task"]
+            params = {"version": version, "nd": degs[0], "dd": degs[1],
+                      "lb": lb, "ub": ub}
+            entries.append((params, function.split(":")[-1],
+                            res["numerator"], res["denominator"]))
+        store_in_config_file(entries, config_file)
+        if verbose:
+            print(f"{len(entries)} approximations stored in "
+                  f"{config_file or 'rationals_config.json'}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fits rational functions to the given functions, in "
+                    "parallel, and stores them in rationals_config.json")
+    parser.add_argument("--spec", help="json file with the keys functions, "
+                        "versions, degrees, bounds and nb_points, "
+                        "overridden by the command line")
+    parser.add_argument("--functions", nargs="+")
+    parser.add_argument("--versions", nargs="+")
+    parser.add_argument("--degrees", nargs="+",
+                        help="degree pairs, e.g. 5/4 7/6")
+    parser.add_argument("--bounds", nargs=2, type=float)
+    parser.add_argument("--nb-points", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--solver", choices=["scipy", "torch"],
+                        default="scipy")
+    parser.add_argument("--config-file")
+    parser.add_argument("--no-save", action="store_true",
+                        help="only report the fits")
+    args = parser.parse_args(argv)
+    spec = {}
+    if args.spec is not None:
+        with open(args.spec) as spec_file:
+            spec = json.load(spec_file)
+    if args.functions is not None:
+        spec["functions"] = args.functions
+    if args.versions is not None:
+        spec["versions"] = args.versions
+    if args.degrees is not None:
+        spec["degrees"] = [[int(d) for d in degs.split("/")]
+                           for degs in args.degrees]
+    if args.bounds is not None:
+        spec["bounds"] = args.bounds
+    if args.nb_points is not None:
+        spec["nb_points"] = args.nb_points
+    if "functions" not in spec:
+        parser.error("no function to approximate (--functions or --spec)")
+    config_file = args.config_file
+    if config_file is not None:
+        config_file = os.path.abspath(config_file)
+    batch_fit(workers=args.workers, save=not args.no_save, solver=args.solver,
+              config_file=config_file, **spec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+best_fit.py
+====================================
+Parallel search of the known functions closest to rational functions.
+
+The outputs of every rational function are computed once and shared by all
+the candidate fits. The candidates are first fitted on a coarse subset of the
+inputs, and only the promising ones are refined on the full inputs (starting
+from their coarse fit). This pruning is a heuristic: a candidate far off on
+the coarse inputs may still have been the closest one on the full inputs. It
+is disabled with ``prune_ratio=None``, every candidate being then fitted on
+the full inputs. The fits are distributed over a thread (or process) pool,
+for one rational function or for all the Rational layers of a model.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .utils import find_closest_equivalent
+
+
+def _equivalent_distance(func, params, x, weights, y):
+    a, b, c, d = params
+    output = np.asarray(a * func(c * x + d) + b, float)
+    return np.sqrt((weights * (y - output) ** 2).sum())
+
+
+def _layer_outputs(module, x):
+    """
+    The outputs of the forward of a torch Rational layer on x, e.g. with the \
+    affine parameters of an AugmentedRational, without noise (version D) \
+    nor the hooks recording the input distribution.
+    """
+    import torch
+    parameter = module.numerator
+    training = module.training
+    module.eval()
+    try:
+        with torch.no_grad():
+            outputs = module.forward(torch.as_tensor(
+                x, dtype=parameter.dtype, device=parameter.device))
+    finally:
+        module.train(training)
+    return outputs.double().cpu().numpy()
+
+
+def _fit_task(task):
+    """
+    Fits one candidate to one rational function, in a worker. On a coarse \
+    subset if `indices` is not None, the returned distance being then the \
+    one of the coarse parameters on all the inputs.
+    """
+    func, x, weights, y, indices, initials = task
+    try:
+        if indices is None:
+            return find_closest_equivalent(None, func, x, weights, initials,
+                                           y=y)
+        params, _ = find_closest_equivalent(None, func, x[indices],
+                                            weights[indices], initials,
+                                            y=y[indices])
+        return params, _equivalent_distance(func, params, x, weights, y)
+    except (RuntimeError, ValueError, FloatingPointError):
+        return None, np.inf
+
+
+def _pool(executor, workers):
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    elif executor == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError("executor %s not implemented" % executor)
+
+
+def _best_fits(problems, functions, executor="thread", workers=None,
+               coarse_points=32, prune_ratio=2.):
+    """
+    problems: list of (x, weights, y), returns for each problem \
+    (function, (a, b, c, d), distance, {function: distance}). The coarse \
+    pruning is skipped if `prune_ratio` is None.
+    """
+    problems = [(np.asarray(x, float),
+                 np.ones(len(x)) if weights is None else np.asarray(weights, float),
+                 np.asarray(y, float)) for x, weights, y in problems]
+    fits = [{func: (None, np.inf) for func in functions} for _ in problems]
+    with _pool(executor, workers) as pool:
+        candidates = [list(functions) for _ in problems]
+        # coarse fits, to prune the hopeless candidates
+        coarse_tasks, coarse_keys = [], []
+        for i, (x, weights, y) in enumerate(problems):
+            if prune_ratio is None or len(x) < 2 * coarse_points:
+                continue
+            indices = np.unique(np.linspace(0, len(x) - 1,
+                                            coarse_points).astype(int))
+            for func in functions:
+                coarse_tasks.append((func, x, weights, y, indices, None))
+                coarse_keys.append((i, func))
+        for (i, func), fit in zip(coarse_keys, pool.map(_fit_task, coarse_tasks)):
+            fits[i][func] = fit
+        for i in set(i for i, _ in coarse_keys):
+            # heuristic: the best coarse distance is reached (its fit is only
+            # refined), but the pruned candidates may have done better on the
+            # full inputs than on the coarse ones
+            best_coarse = min(dist for _, dist in fits[i].values())
+            candidates[i] = [func for func in functions
+                             if fits[i][func][1] <= prune_ratio * best_coarse]
+        # full fits of the remaining candidates, from their coarse fit
+        full_tasks, full_keys = [], []
+        for i, (x, weights, y) in enumerate(problems):
+            for func in candidates[i]:
+                full_tasks.append((func, x, weights, y, None, fits[i][func][0]))
+                full_keys.append((i, func))
+        for (i, func), fit in zip(full_keys, pool.map(_fit_task, full_tasks)):
+            if fit[1] <= fits[i][func][1]:
+                fits[i][func] = fit
+    results = []
+    for problem_fits in fits:
+        best = min(functions, key=lambda func: problem_fits[func][1])
+        params, distance = problem_fits[best]
+        results.append((best, params, distance,
+                        {func: dist for func, (_, dist) in problem_fits.items()}))
+    return results
+
+
+def parallel_best_fit(rational_func, functions, x, weights=None,
+                      executor="thread", workers=None, coarse_points=32,
+                      prune_ratio=2.):
+    """
+    Finds the function of `functions` closest to `rational_func`, such that \
+    a * function(c * x + d) + b is as close as possible to rational_func.
+
+    Arguments:
+            rational_func (callable):
+                The (numpy) rational function, evaluated once on `x`.\n
+            functions (list of callable):
+                The candidate functions (picklable for processes).\n
+            x (array):
+                The inputs, e.g. the bins of the input distribution.\n
+            weights (array):
+                The least-squares weights of `x`, e.g. the bins frequencies.\n
+                Default ``None``
+            executor (str):
+                `thread` or `process` pool.\n
+                Default ``thread``
+            workers (int):
+                The size of the pool, ``None`` for the executor default.\n
+                Default ``None``
+            coarse_points (int):
+                The number of inputs of the coarse fits.\n
+                Default ``32``
+            prune_ratio (float):
+                Only the candidates whose coarse fit is within this ratio \
+                of the best coarse fit (distances on all the inputs) are \
+                refined. This is a heuristic, that may prune the closest \
+                function; ``None`` fits every candidate on all the inputs.\n
+                Default ``2.``
+    Returns:
+        tuple: (function, (a, b, c, d), distance, distances), distances \
+        being the distance of every candidate (coarse one if pruned).
+    """
+    y = rational_func(np.asarray(x, float))
+    return _best_fits([(x, weights, y)], functions, executor, workers,
+                      coarse_points, prune_ratio)[0]
+
+
+def best_fit_model(model, functions, x=None, executor="thread", workers=None,
+                   coarse_points=32, prune_ratio=2., verbose=True):
+    """
+    Finds the closest function of `functions` for every Rational layer of \
+    a torch model, all the fits sharing one pool. The inputs are the bins \
+    of the retrieved input distribution of every layer (weighted by their \
+    frequencies), or `x`. The results are stored in the \
+    `best_fitted_function` and `best_fitted_function_params` of the layers. \
+    See :func:`parallel_best_fit` for the coarse pruning heuristic \
+    (`coarse_points`, `prune_ratio`).
+
+    Returns:
+        dict: layer name -> (function, (a, b, c, d), distance)
+    """
+    from rational.torch import Rational
+    from rational.torch.rationals import _cleared_arrays
+    names, problems = [], []
+    for name, module in model.named_modules():
+        if not isinstance(module, Rational):
+            continue
+        weights, inputs = None, x
+        if inputs is None:
+            if module.distribution is not None:
+                weights, inputs = _cleared_arrays(module.distribution)
+            else:
+                inputs = np.arange(-3., 3., 0.1)
+        inputs = np.asarray(inputs, float)
+        names.append(name)
+        problems.append((inputs, weights, _layer_outputs(module, inputs)))
+    results = _best_fits(problems, functions, executor, workers,
+                         coarse_points, prune_ratio)
+    best_fits = {}
+    modules = dict(model.named_modules())
+    for name, (func, params, distance, _) in zip(names, results):
+        modules[name].best_fitted_function = func
+        modules[name].best_fitted_function_params = params
+        best_fits[name] = (func, params, distance)
+        if verbose:
+            func_name = getattr(func, "__name__", str(func))
+            print(f"{name}: {func_name} ({distance:.3e})")
+    return best_fits
@@ -1,12 +1,27 @@
+import copy
+import time
+
 from rational.torch import Rational as RationalPyTorch
+import numpy as np
+import torch
 import torch.nn as nn
 
 # mapping of known activation functions
 activations = {nn.ReLU: 'relu', nn.LeakyReLU: 'leaky_relu', nn.Tanh: 'tanh', nn.Sigmoid: 'sigmoid', nn.GELU: 'gelu',
-               nn.Hardswish: 'swish'}
+               nn.SiLU: 'swish', nn.Hardswish: 'hardswish'}
+# native activations, by name of their torch.nn.functional function
+native_activations = {'relu': nn.ReLU, 'leaky_relu': nn.LeakyReLU, 'elu': nn.ELU, 'gelu': nn.GELU, 'silu': nn.SiLU,
+                      'softplus': nn.Softplus, 'hardswish': nn.Hardswish, 'tanh': nn.Tanh, 'sigmoid': nn.Sigmoid}
+# activations computing transcendental functions, replaced by surrogates
+surrogates = {nn.GELU: 'gelu', nn.SiLU: 'swish', nn.Hardswish: 'hardswish', nn.Tanh: 'tanh', nn.Sigmoid: 'sigmoid'}
 
 
 def convert_pytorch_model_to_rational(model, rational_version='A', rational_cuda=False):
+    """
+    Rebuilds the (sequential) model, with Rational layers instead of the \
+    known activations, down to two levels. See :func:`convert_to_rational` \
+    for models with their own `forward`.
+    """
     converted = nn.Sequential()
     for name, layer in model.named_children():
         childs = layer.children()
@@ -26,3 +41,333 @@ def _convert_pytorch_layer(name, layer, version, cuda):
             return f'Rational_{name}', RationalPyTorch(version=version, approx_func=activations[activation], cuda=cuda)
     # handle default here
     return name, layer
+
+
+def _share_key(share, name, approx_func):
+    if share is None:
+        return name
+    elif share == "type":
+        return approx_func
+    elif share == "stage":
+        # the stages are the children of the model
+        return name.split(".")[0], approx_func
+    elif callable(share):
+        return share(name, approx_func)
+    raise ValueError("share policy %s not implemented" % share)
+
+
+def convert_to_rational(model, version='A', degrees=(5, 4), cuda=False,
+                        share=None, inplace=True):
+    """
+    Replaces the known activations of `model` (see `activations`) by \
+    Rational layers, at any depth, in the original module tree: the \
+    `forward` of every module is kept (residuals, attention...).
+
+    Arguments:
+            model (Module):
+                The model to convert.\n
+            version (str):
+                Version of the Rational layers.\n
+                Default ``A``
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            cuda (bool):
+                Device of the Rational layers (see \
+                :class:`rational.torch.Rational`).\n
+                Default ``False``
+            share (str or callable):
+                `None`: one Rational layer per activation.\n
+                `type`: one Rational layer per type of activation, shared \
+                by the whole model.\n
+                `stage`: one Rational layer per type of activation in every \
+                child of the model.\n
+                A callable (module name, approximated function) -> key: one \
+                Rational layer per key.\n
+                Default ``None``
+            inplace (bool):
+                If ``False``, converts a copy of the model.\n
+                Default ``True``
+    Returns:
+        Module: the converted model (`model` itself if inplace)
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    rationals = {}
+
+    def rational_for(name, layer):
+        for activation, approx_func in activations.items():
+            if isinstance(layer, activation):
+                key = _share_key(share, name, approx_func)
+                if key not in rationals:
+                    rationals[key] = RationalPyTorch(approx_func, degrees, cuda,
+                                                     version)
+                return rationals[key]
+        return None
+
+    rational = rational_for("", model)
+    if rational is not None:
+        return rational
+    for name, module in list(model.named_modules()):
+        # named_children() skips the repeated occurrences of a shared layer
+        for child_name, child in list(module._modules.items()):
+            full_name = f"{name}.{child_name}" if name else child_name
+            rational = rational_for(full_name, child)
+            if rational is not None:
+                setattr(module, child_name, rational)
+    return model
+
+
+def _time(function, x, repeats):
+    function(x)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(x)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def convert_to_rational_surrogates(model, sample_inputs, version='B',
+                                   degrees=(5, 4), max_error=None,
+                                   min_speedup=None, compile=False,
+                                   inplace=True, repeats=10, verbose=True):
+    """
+    Replaces the activations of `surrogates` (GELU, SiLU, Hardswish, Tanh, \
+    Sigmoid) of a trained model by frozen Rational layers (see \
+    :meth:`rational.torch.Rational.freeze`), initialized from \
+    `rationals_config.json`. A calibration pass on `sample_inputs` records \
+    the inputs of every activation, on which the error and the speedup of \
+    its surrogate are measured.
+
+    Arguments:
+            model (Module):
+                The trained model.\n
+            sample_inputs (tensor or tuple):
+                The calibration inputs of the model.\n
+            version (str):
+                Version of the Rational layers.\n
+                Default ``B``
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            max_error (float):
+                Only the activations whose surrogate max absolute error (on \
+                the calibration inputs) is below are replaced.\n
+                Default ``None``
+            min_speedup (float):
+                Only the activations whose surrogate is at least this much \
+                faster are replaced.\n
+                Default ``None``
+            compile (bool):
+                If ``True``, the surrogates are fused with `torch.compile`.\n
+                Default ``False``
+            inplace (bool):
+                If ``False``, converts a copy of the model.\n
+                Default ``True``
+            repeats (int):
+                The number of timed runs (median) of every activation.\n
+                Default ``10``
+            verbose (bool):
+                If ``True``, prints the report.\n
+                Default ``True``
+    Returns:
+        tuple: (model, report), the report holding a dictionary per \
+        activation (`name`, `function`, `max_error`, `rmse`, `speedup`, \
+        `replaced`) in `layers`, and the deviation of the model outputs in \
+        `output_max_error`.
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    if not isinstance(sample_inputs, tuple):
+        sample_inputs = (sample_inputs,)
+    model.eval()
+    layers = {name: module for name, module in model.named_modules()
+              if type(module) in surrogates}
+    recorded = {}
+
+    def recorder(name):
+        def hook(module, inputs, output):
+            recorded.setdefault(name, []).append(inputs[0].detach())
+        return hook
+
+    handles = [module.register_forward_hook(recorder(name))
+               for name, module in layers.items()]
+    with torch.no_grad():
+        reference = model(*sample_inputs)
+    for handle in handles:
+        handle.remove()
+
+    rationals, report = {}, {"layers": []}
+    modules = dict(model.named_modules())
+    for name, layer in layers.items():
+        approx_func = surrogates[type(layer)]
+        entry = {"name": name, "function": approx_func, "max_error": 0.,
+                 "rmse": 0., "speedup": None, "replaced": False}
+        x = None
+        if name in recorded:
+            x = torch.cat([inputs.reshape(-1) for inputs in recorded[name]])
+        if approx_func not in rationals:
+            # one frozen surrogate per function, shared by its activations
+            device = "cpu" if x is None else str(x.device)
+            rationals[approx_func] = RationalPyTorch(approx_func, degrees, device,
+                                                     version).freeze(compile)
+        rational = rationals[approx_func]
+        if x is not None:
+            with torch.no_grad():
+                error = rational(x) - layer(x)
+                entry["max_error"] = error.abs().max().item()
+                entry["rmse"] = error.pow(2).mean().sqrt().item()
+                entry["speedup"] = _time(layer, x, repeats) / \
+                    _time(rational, x, repeats)
+        entry["replaced"] = (max_error is None or entry["max_error"] <= max_error) \
+            and (min_speedup is None or entry["speedup"] is None
+                 or entry["speedup"] >= min_speedup)
+        if entry["replaced"]:
+            parent_name, _, child_name = name.rpartition(".")
+            setattr(modules[parent_name], child_name, rational)
+        report["layers"].append(entry)
+
+    with torch.no_grad():
+        output = model(*sample_inputs)
+    report["output_max_error"] = (output - reference).abs().max().item()
+    if verbose:
+        print(f"{'layer':<24}{'function':<11}{'max error':>11}{'rmse':>11}"
+              f"{'speedup':>9}  replaced")
+        for entry in report["layers"]:
+            speedup = "-" if entry["speedup"] is None else f"{entry['speedup']:.2f}"
+            print(f"{entry['name']:<24}{entry['function']:<11}"
+                  f"{entry['max_error']:>11.2e}{entry['rmse']:>11.2e}"
+                  f"{speedup:>9}  {entry['replaced']}")
+        print(f"max deviation of the model outputs: "
+              f"{report['output_max_error']:.2e}")
+    return model, report
+
+
+def _histogram(inputs, bins=200):
+    # inputs weighted by their frequencies, as the retrieved distributions
+    values = torch.cat([x.reshape(-1) for x in inputs]).float().cpu().numpy()
+    freq, edges = np.histogram(values, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2.
+    kept = freq > 0
+    return centers[kept], freq[kept] / freq.sum()
+
+
+def _model_time(model, sample_inputs, repeats):
+    with torch.no_grad():
+        return _time(lambda inputs: model(*inputs), sample_inputs, repeats)
+
+
+def convert_rational_to_native(model, sample_inputs, functions=None,
+                               max_error=1e-2, metric=None, inplace=True,
+                               repeats=10, verbose=True):
+    """
+    Replaces the Rational layers of a trained model that are close to \
+    a * f(c * x + d) + b, f being a native activation (see \
+    `native_activations`), by f: a, b, c and d are folded in the \
+    neighbouring Linear/Conv layers (see \
+    :func:`rational.utils.folding.fold_affine_activation`), or kept in \
+    `ScalarAffine` layers. The closest functions are found by \
+    :func:`rational.utils.best_fit_model` on the inputs of the Rational \
+    layers, recorded on `sample_inputs`.
+
+    Arguments:
+            model (Module):
+                The trained model.\n
+            sample_inputs (tensor or tuple):
+                The calibration inputs of the model.\n
+            functions (list of str):
+                The names of the candidate native activations.\n
+                Default ``None`` (all of `native_activations`)
+            max_error (float):
+                Only the Rational layers whose RMS distance to the found \
+                function (weighted by the inputs distribution) is below \
+                are replaced.\n
+                Default ``1e-2``
+            metric (callable):
+                outputs -> float, e.g. the accuracy on the calibration \
+                inputs, reported before and after the conversion.\n
+                Default ``None``
+            inplace (bool):
+                If ``False``, converts a copy of the model.\n
+                Default ``True``
+            repeats (int):
+                The number of timed runs (median) of the model.\n
+                Default ``10``
+            verbose (bool):
+                If ``True``, prints the report.\n
+                Default ``True``
+    Returns:
+        tuple: (model, report), the report holding a dictionary per \
+        Rational layer (`name`, `function`, `params`, `error`, `replaced`, \
+        `folded`) in `layers`, the deviation of the model outputs in \
+        `output_max_error`, the `speedup` of the model and the `metric` \
+        (before, after) if given.
+    """
+    from rational.utils.best_fit import _best_fits, _layer_outputs
+    from rational.utils.function_index import TorchFunction
+    from rational.utils.folding import fold_affine_activation
+    if not inplace:
+        model = copy.deepcopy(model)
+    if not isinstance(sample_inputs, tuple):
+        sample_inputs = (sample_inputs,)
+    if functions is None:
+        functions = list(native_activations)
+    candidates = [TorchFunction(name, "torch") if name in ["tanh", "sigmoid"]
+                  else TorchFunction(name) for name in functions]
+    model.eval()
+    rationals = {name: module for name, module in model.named_modules()
+                 if isinstance(module, RationalPyTorch)}
+    recorded = {}
+
+    def recorder(name):
+        def hook(module, inputs, output):
+            recorded.setdefault(name, []).append(inputs[0].detach())
+        return hook
+
+    handles = [module.register_forward_hook(recorder(name))
+               for name, module in rationals.items()]
+    with torch.no_grad():
+        reference = model(*sample_inputs)
+    for handle in handles:
+        handle.remove()
+    time_before = _model_time(model, sample_inputs, repeats)
+
+    names = [name for name in rationals if name in recorded]
+    problems = []
+    for name in names:
+        x, weights = _histogram(recorded[name])
+        problems.append((x, weights, _layer_outputs(rationals[name], x)))
+    results = _best_fits(problems, candidates)
+    report = {"layers": []}
+    for name, (x, weights, _), (func, params, distance, _) in \
+            zip(names, problems, results):
+        # the weights sum to one: the distance is the weighted RMS one
+        entry = {"name": name, "function": func.name, "params": params,
+                 "error": distance, "replaced": False, "folded": []}
+        if params is not None and distance <= max_error:
+            activation = native_activations[func.name]()
+            entry["folded"] = fold_affine_activation(model, rationals[name],
+                                                     activation, params)
+            entry["replaced"] = True
+        report["layers"].append(entry)
+
+    with torch.no_grad():
+        output = model(*sample_inputs)
+    report["output_max_error"] = (output - reference).abs().max().item()
+    report["speedup"] = time_before / _model_time(model, sample_inputs,
+                                                  repeats)
+    if metric is not None:
+        report["metric"] = (metric(reference), metric(output))
+    if verbose:
+        print(f"{'layer':<24}{'function':<12}{'error':>11}  replaced  folded")
+        for entry in report["layers"]:
+            print(f"{entry['name']:<24}{entry['function']:<12}"
+                  f"{entry['error']:>11.2e}  {str(entry['replaced']):<8}  "
+                  f"{entry['folded']}")
+        print(f"max deviation of the model outputs: "
+              f"{report['output_max_error']:.2e}, speedup: "
+              f"{report['speedup']:.2f}")
+        if metric is not None:
+            print("metric: {:.4g} -> {:.4g}".format(*report["metric"]))
+    return model, report
@@ -7,8 +7,6 @@ Finding the weights of the to map an specific activation function
 import json
 import numpy as np
 from .utils import fit_rational_to_base_function
-import matplotlib.pyplot as plt
-import torch
 import os
 from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
     Rational_version_C
@@ -16,6 +14,7 @@ from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
 
 def plot_result(x_array, rational_array, target_array,
                 original_func_name="Original function"):
+    import matplotlib.pyplot as plt
     plt.plot(x_array, rational_array, label="Rational approx")
     plt.plot(x_array, target_array, label=original_func_name)
     plt.legend()
@@ -23,40 +22,57 @@ def plot_result(x_array, rational_array, target_array,
     plt.show()
 
 
+def _config_file():
+    cfd = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    return f'{cfd}/rationals_config.json'
+
+
+def store_in_config_file(entries, config_file=None):
+    """
+    Stores several approximations in rationals_config.json at once. \
+    The file is read once and replaced atomically.
+
+    Arguments:
+            entries (list):
+                Tuples (params, approx_name, w_params, d_params), with \
+                params the dictionary with the keys `version`, `nd`, `dd`, \
+                `lb` and `ub`.\n
+            config_file (str):
+                The json file to update.\n
+                Default ``None`` (rationals_config.json of the package)
+    """
+    if config_file is None:
+        config_file = _config_file()
+    with open(config_file) as json_file:
+        rationals_dict = json.load(json_file)  # rational_version -> approx_func
+    for params, approx_name, w_params, d_params in entries:
+        rational_full_name = f'Rational_version_{params["version"]}{params["nd"]}/{params["dd"]}'
+        rationals_params = {"init_w_numerator": np.asarray(w_params).tolist(),
+                            "init_w_denominator": np.asarray(d_params).tolist(),
+                            "ub": params["ub"], "lb": params["lb"]}
+        rationals_dict.setdefault(rational_full_name, {})[approx_name.lower()] = rationals_params
+    tmp_file = f'{config_file}.tmp'
+    with open(tmp_file, 'w') as outfile:
+        json.dump(rationals_dict, outfile, indent=1)
+    os.replace(tmp_file, config_file)
+
+
 def append_to_config_file(params, approx_name, w_params, d_params, overwrite=None):
     rational_full_name = f'Rational_version_{params["version"]}{params["nd"]}/{params["dd"]}'
-    cfd = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-    with open(f'{cfd}/rationals_config.json') as json_file:
+    with open(_config_file()) as json_file:
         rationals_dict = json.load(json_file)  # rational_version -> approx_func
     approx_name = approx_name.lower()
-    if rational_full_name in rationals_dict:
-        if approx_name in rationals_dict[rational_full_name]:
-            if overwrite is None:
-                overwrite = input(f'Rational_{params["version"]} approximation of {approx_name} already exist. \
-                                  \nDo you want to replace it ? (y/n)') in ["y", "yes"]
-            if not overwrite:
-                print("Parameters not stored")
-                return
-        else:
-            rationals_params = {"init_w_numerator": w_params.tolist(),
-                                "init_w_denominator": d_params.tolist(),
-                                "ub": params["ub"], "lb": params["lb"]}
-            rationals_dict[rational_full_name][approx_name] = rationals_params
-            with open(f'{cfd}/rationals_config.json', 'w') as outfile:
-                json.dump(rationals_dict, outfile, indent=1)
-            print("Parameters stored in rationals_config.json")
+    if approx_name in rationals_dict.get(rational_full_name, {}):
+        if overwrite is None:
+            overwrite = input(f'Rational_{params["version"]} approximation of {approx_name} already exist. \
+                              \nDo you want to replace it ? (y/n)') in ["y", "yes"]
+        if not overwrite:
+            print("Parameters not stored")
             return
-    rationals_dict[rational_full_name] = {}
-    rationals_params = {"init_w_numerator": w_params.tolist(),
-                        "init_w_denominator": d_params.tolist(),
-                        "ub": params["ub"], "lb": params["lb"]}
-    rationals_dict[rational_full_name][approx_name] = rationals_params
-    with open(f'{cfd}/rationals_config.json', 'w') as outfile:
-        json.dump(rationals_dict, outfile, indent=1)
+    store_in_config_file([(params, approx_name, w_params, d_params)])
     print("Parameters stored in rationals_config.json")
 
 
-
 def typed_input(text, type, choice_list=None):
     assert isinstance(text, str)
     while True:
@@ -77,9 +93,23 @@ def typed_input(text, type, choice_list=None):
 
 FUNCTION = None
 
+# version D is fitted without noise, i.e. as version B
+rational_versions = {"A": Rational_version_A, "B": Rational_version_B,
+                     "C": Rational_version_C, "D": Rational_version_B}
+
 
 def find_weights(function, function_name=None, degrees=None, bounds=None,
-                 version=None, plot=None, save=None, overwrite=None):
+                 version=None, plot=None, save=None, overwrite=None,
+                 distribution=None):
+    """
+    Finds the coefficients of the rational function approximating \
+    `function` and (optionally) stores them in `rationals_config.json`. \
+    Every argument left to ``None`` is asked interactively.
+
+    If `distribution` (a retrieved input Histogram or a (freq, bins) tuple) \
+    is provided, the fit is done on its bins, weighted by their frequencies, \
+    instead of a uniform grid of 100000 points on the bounds.
+    """
     # To be changed by the function you want to approximate
     if function_name is None:
         function_name = input("approximated function name: ")
@@ -87,6 +117,7 @@ def find_weights(function, function_name=None, degrees=None, bounds=None,
 
     def function_to_approx(x):
         # return np.heaviside(x, 0)
+        import torch
         x = torch.tensor(x)
         return FUNCTION(x)
 
@@ -96,29 +127,32 @@ def find_weights(function, function_name=None, degrees=None, bounds=None,
         degrees = (nd, dd)
     else:
         nd, dd = degrees
-    if bounds is None:
-        print("On what range should the function be approximated ?")
-        lb = typed_input("lower bound: ", float)
-        ub = typed_input("upper bound: ", float)
+    weights = None
+    if distribution is not None:
+        if hasattr(distribution, "normalize"):
+            weights, x = distribution.normalize()
+        else:
+            weights, x = distribution
+        weights, x = np.asarray(weights, float), np.asarray(x, float)
+        lb, ub = float(x[0]), float(x[-1])
     else:
-        lb, ub = bounds
-    nb_points = 100000
-    step = (ub - lb) / nb_points
-    x = np.arange(lb, ub, step)
+        if bounds is None:
+            print("On what range should the function be approximated ?")
+            lb = typed_input("lower bound: ", float)
+            ub = typed_input("upper bound: ", float)
+        else:
+            lb, ub = bounds
+        nb_points = 100000
+        step = (ub - lb) / nb_points
+        x = np.arange(lb, ub, step)
     if version is None:
         version = typed_input("Rational Version: ", str, ["A", "B", "C", "D"])
-    if version == 'A':
-        rational = Rational_version_A
-    elif version == 'B':
-        rational = Rational_version_B
-    elif version == 'C':
-        rational = Rational_version_C
-    elif version == 'D':
-        rational = Rational_version_B
+    rational = rational_versions[version]
 
     w_params, d_params = fit_rational_to_base_function(rational, function_to_approx, x,
                                                        degrees=degrees,
-                                                       version=version)
+                                                       version=version,
+                                                       weights=weights)
     print(f"Found coeffient :\nP: {w_params}\nQ: {d_params}")
     if plot is None:
         plot = input("Do you want a plot of the result (y/n)") in ["y", "yes"]
@@ -0,0 +1,228 @@
+"""
+folding.py
+====================================
+Folding of scalar affine transformations, around activation functions, into
+the neighbouring layers of torch models (as batch normalization folding).
+
+An activation y = a * f(c * x + d) + b of a `nn.Sequential` is computed with
+the bare f by absorbing:
+
+- the input affine (c, d) into the preceding Linear, Conv or BatchNorm layer \
+(scaled weights, shifted bias),
+- the output affine (a, b) into the following Linear or Conv layer (scaled \
+weights, bias shifted by b times the sum of the weights). A padded \
+convolution does not absorb a non-zero shift b, as its zero padding is not \
+shifted: the output affine (a, b) is then not folded at all.
+
+The transformations that can not be absorbed are kept in a `ScalarAffine`
+layer.
+
+The affine transformations of an `AugmentedRational` (see
+:func:`fold_augmented_rationals`) are absorbed by the neighbouring layers,
+else by the coefficients of the rational function where it is exact: the
+scales for every version, the input bias for version `C` (whose denominator
+has a constant term inside its absolute value).
+"""
+import torch
+import torch.nn as nn
+
+_convolutions = (nn.Conv1d, nn.Conv2d, nn.Conv3d)
+_batch_norms = (nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d)
+
+
+class ScalarAffine(nn.Module):
+    """
+    scale * x + shift, for scalar scale and shift.
+    """
+    def __init__(self, scale=1., shift=0.):
+        super().__init__()
+        self.register_buffer("scale", torch.tensor(float(scale)))
+        self.register_buffer("shift", torch.tensor(float(shift)))
+
+    def forward(self, x):
+        return torch.addcmul(self.shift, x, self.scale)
+
+    def extra_repr(self):
+        return f"scale={self.scale.item():.4g}, shift={self.shift.item():.4g}"
+
+
+def fold_input_affine(layer, scale, shift):
+    """
+    Absorbs c * layer(x) + d in `layer` (Linear, Conv or affine BatchNorm).
+
+    Returns:
+        bool: ``True`` if folded, ``False`` if `layer` can not absorb it.
+    """
+    if not isinstance(layer, (nn.Linear,) + _convolutions) and \
+            not (isinstance(layer, _batch_norms) and layer.affine):
+        return False
+    with torch.no_grad():
+        if layer.bias is None:
+            layer.bias = nn.Parameter(torch.zeros(layer.weight.shape[0],
+                                                  dtype=layer.weight.dtype,
+                                                  device=layer.weight.device))
+        layer.weight.mul_(scale)
+        layer.bias.mul_(scale).add_(shift)
+    return True
+
+
+def fold_output_affine(layer, scale, shift):
+    """
+    Absorbs layer(a * x + b) in `layer` (Linear or Conv).
+
+    Returns:
+        bool: ``True`` if folded, ``False`` if `layer` can not absorb it, \
+        e.g. a padded convolution with a non-zero `shift` (nothing is \
+        absorbed then).
+    """
+    if isinstance(layer, _convolutions):
+        if shift != 0 and any(layer._reversed_padding_repeated_twice):
+            return False
+    elif not isinstance(layer, nn.Linear):
+        return False
+    with torch.no_grad():
+        weight = layer.weight
+        if shift != 0:
+            if layer.bias is None:
+                layer.bias = nn.Parameter(torch.zeros(weight.shape[0],
+                                                      dtype=weight.dtype,
+                                                      device=weight.device))
+            # every output sums its inputs (of its group) times the weights
+            layer.bias.add_(shift * weight.sum(dim=tuple(range(1, weight.dim()))))
+        weight.mul_(scale)
+    return True
+
+
+def sequential_neighbours(model, module):
+    """
+    Yields (container, name, previous layer, next layer) for every \
+    occurrence of `module` in `model`. The neighbours are the previous and \
+    next layers of a `nn.Sequential` container, ``None`` if missing or if \
+    the container has its own `forward`.
+    """
+    for container in model.modules():
+        # named_children() skips the repeated occurrences of a shared layer
+        children = list(container._modules.items())
+        for i, (name, child) in enumerate(children):
+            if child is not module:
+                continue
+            if isinstance(container, nn.Sequential):
+                previous_layer = children[i - 1][1] if i > 0 else None
+                next_layer = children[i + 1][1] if i + 1 < len(children) else None
+                yield container, name, previous_layer, next_layer
+            else:
+                yield container, name, None, None
+
+
+def fold_affine_activation(model, module, activation, params):
+    """
+    Replaces every occurrence of `module` in `model` by \
+    a * activation(c * x + d) + b, params being (a, b, c, d), absorbing the \
+    affine transformations in the neighbouring layers where possible.
+
+    Returns:
+        list: for every occurrence, the tuple (input folded, output folded)
+    """
+    a, b, c, d = (float(param) for param in params)
+    folded = []
+    for container, name, previous_layer, next_layer in \
+            list(sequential_neighbours(model, module)):
+        layers = [activation]
+        identity_in, identity_out = c == 1 and d == 0, a == 1 and b == 0
+        folded_in = identity_in or (previous_layer is not None and
+                                    fold_input_affine(previous_layer, c, d))
+        folded_out = identity_out or (next_layer is not None and
+                                      fold_output_affine(next_layer, a, b))
+        if not folded_in:
+            layers.insert(0, ScalarAffine(c, d))
+        if not folded_out:
+            layers.append(ScalarAffine(a, b))
+        setattr(container, name,
+                layers[0] if len(layers) == 1 else nn.Sequential(*layers))
+        folded.append((folded_in, folded_out))
+    return folded
+
+
+def _compose_affine(coefficients, scale, shift):
+    # coefficients of p(scale * x + shift), p being c_0 + c_1.x + ...
+    result = torch.zeros_like(coefficients)
+    for coefficient in reversed(coefficients):
+        # result * (shift + scale * x) + coefficient
+        result = torch.cat([result[:1] * shift,
+                            result[1:] * shift + result[:-1] * scale])
+        result[0] += coefficient
+    return result
+
+
+def _fused_rational(rational, in_scale, in_shift, out_scale):
+    """
+    Plain Rational computing out_scale * rational(in_scale * x + in_shift), \
+    in_shift being 0 unless version C.
+    """
+    from rational.torch import Rational
+    fused = Rational(rational.init_approximation, rational.degrees,
+                     rational.device, rational.version,
+                     rational.numerator.requires_grad)
+    fused.training = rational.training
+    with torch.no_grad():
+        numerator = _compose_affine(rational.numerator, in_scale, in_shift)
+        fused.numerator.copy_(out_scale * numerator)
+        if rational.version == "C":
+            denominator = _compose_affine(rational.denominator, in_scale,
+                                          in_shift)
+        else:
+            # no constant term: b_i.(scale.x)^i
+            powers = torch.arange(1, len(rational.denominator) + 1,
+                                  device=rational.denominator.device)
+            denominator = rational.denominator * in_scale ** powers
+        fused.denominator.copy_(denominator)
+    return fused
+
+
+def fold_augmented_rationals(model):
+    """
+    Replaces every AugmentedRational of `model` by a Rational, its affine \
+    transformations (horizontal_scale, in_bias, vertical_scale, out_bias) \
+    being absorbed by the neighbouring layers, else by the coefficients of \
+    the rational function, else kept in `ScalarAffine` layers (input bias \
+    of versions A, B, D, output bias).
+
+    Returns:
+        dict: name -> list of (input folded, output folded) for every \
+        occurrence of the AugmentedRational layers, folded meaning absorbed \
+        in a neighbouring layer or in the coefficients.
+    """
+    from rational.torch.rationals import AugmentedRational
+    augmented = {name: module for name, module in model.named_modules()
+                 if isinstance(module, AugmentedRational)}
+    folded = {}
+    for name, module in augmented.items():
+        folded[name] = []
+        h, i = module.horizontal_scale.item(), module.in_bias.item()
+        v, o = module.vertical_scale.item(), module.out_bias.item()
+        for container, child_name, previous_layer, next_layer in \
+                list(sequential_neighbours(model, module)):
+            layers = []
+            in_scale, in_shift, out_scale = 1., 0., 1.
+            if (h, i) == (1., 0.) or (previous_layer is not None and
+                                      fold_input_affine(previous_layer, h, i)):
+                folded_in = True
+            elif i == 0. or module.version == "C":
+                in_scale, in_shift, folded_in = h, i, True
+            else:
+                layers.append(ScalarAffine(h, i))
+                folded_in = False
+            if (v, o) == (1., 0.) or (next_layer is not None and
+                                      fold_output_affine(next_layer, v, o)):
+                folded_out, tail = True, None
+            else:
+                out_scale, folded_out = v, o == 0.
+                tail = None if folded_out else ScalarAffine(1., o)
+            layers.append(_fused_rational(module, in_scale, in_shift,
+                                          out_scale))
+            if tail is not None:
+                layers.append(tail)
+            setattr(container, child_name,
+                    layers[0] if len(layers) == 1 else nn.Sequential(*layers))
+            folded[name].append((folded_in, folded_out))
+    return folded
@@ -0,0 +1,191 @@
+"""
+function_index.py
+====================================
+Precomputed index of function shapes, to quickly find the functions of a
+(large) library closest to a rational function.
+
+Every library function f is evaluated once on a normalized grid u in [-1, 1],
+for a set of input scales and shifts s, t: f(s * u + t). The output affine
+transformation (a, b) is found in closed form at query time: for a row f and
+the rational outputs r on the grid (with weights w), the best a * f + b is at
+the weighted squared distance var(r) * (1 - corr(f, r)^2). All the rows are
+thus compared to the rational function by a few matrix-vector products, and
+only the k nearest functions are refined with
+:func:`rational.utils.find_closest_equivalent`.
+"""
+import numpy as np
+
+from .utils import find_closest_equivalent
+
+
+class TorchFunction():
+    """
+    Numpy wrapper of a function of `torch.nn.functional` (or `torch`), \
+    picklable and named after the function.
+    """
+    def __init__(self, name, module="torch.nn.functional", **kwargs):
+        self.name = name
+        self.module = module
+        self.kwargs = kwargs
+        self.__name__ = name
+
+    def __call__(self, x):
+        import importlib
+        import torch
+        function = getattr(importlib.import_module(self.module), self.name)
+        return function(torch.as_tensor(np.asarray(x, float)),
+                        **self.kwargs).numpy()
+
+    def __repr__(self):
+        return f"TorchFunction({self.name})"
+
+
+def torch_activations():
+    """
+    Returns the (numpy wrapped) activation functions of torch.
+    """
+    names = ["relu", "relu6", "leaky_relu", "elu", "selu", "celu", "gelu",
+             "silu", "mish", "softplus", "softsign", "logsigmoid",
+             "hardtanh", "hardsigmoid", "hardswish", "tanhshrink",
+             "softshrink", "hardshrink"]
+    functions = [TorchFunction(name) for name in names]
+    functions += [TorchFunction(name, "torch") for name in
+                  ["tanh", "sigmoid", "sin", "cos", "atan", "erf", "exp"]]
+    return functions
+
+
+class FunctionIndex():
+    """
+    Index of the shapes of a library of functions.
+
+    Arguments:
+            functions (list of callable):
+                The library, numpy functions (see \
+                :func:`torch_activations` for the activations of torch).\n
+            grid_size (int):
+                The number of points of the normalized grid.\n
+                Default ``64``
+            scales (array):
+                The input scales s of the indexed rows f(s * u + t).\n
+                Default ``±logspace(-1, 1, 9)``
+            shifts (array):
+                The input shifts t of the indexed rows f(s * u + t).\n
+                Default ``linspace(-3, 3, 13)``
+    """
+    def __init__(self, functions, grid_size=64, scales=None, shifts=None):
+        if scales is None:
+            scales = np.logspace(-1, 1, 9)
+            scales = np.concatenate([scales, - scales])
+        if shifts is None:
+            shifts = np.linspace(-3., 3., 13)
+        self.functions = list(functions)
+        self.grid = np.linspace(-1., 1., grid_size)
+        scale_grid, shift_grid = np.meshgrid(scales, shifts, indexing="ij")
+        self.scales = np.tile(scale_grid.ravel(), len(self.functions))
+        self.shifts = np.tile(shift_grid.ravel(), len(self.functions))
+        nb_transforms = scale_grid.size
+        self.function_ids = np.repeat(np.arange(len(self.functions)),
+                                      nb_transforms)
+        # one row per (function, scale, shift), computed once
+        inputs = scale_grid.reshape(-1, 1) * self.grid + shift_grid.reshape(-1, 1)
+        with np.errstate(all="ignore"):
+            shapes = [np.asarray(func(inputs.ravel()), float).reshape(inputs.shape)
+                      for func in self.functions]
+        self.shapes = np.concatenate(shapes)
+        # the rows that can not be evaluated are never matched
+        self.valid = np.all(np.isfinite(self.shapes), axis=1)
+        self.shapes[~self.valid] = 0.
+        self.squared_shapes = self.shapes ** 2
+
+    def __len__(self):
+        return len(self.functions)
+
+    def __repr__(self):
+        return (f"FunctionIndex of {len(self.functions)} functions "
+                f"({len(self.shapes)} shapes of {len(self.grid)} points)")
+
+    def query(self, rational_func, x, weights=None, k=3):
+        """
+        Finds the `k` indexed functions closest to `rational_func` on the \
+        range of `x`, with one vectorized distance computation.
+
+        Arguments:
+                rational_func (callable):
+                    The (numpy) rational function.\n
+                x (array):
+                    The inputs, e.g. the bins of the input distribution.\n
+                weights (array):
+                    The weights of `x`, e.g. the frequencies of the bins.\n
+                    Default ``None``
+                k (int):
+                    The number of functions to return.\n
+                    Default ``3``
+        Returns:
+            list: (function, (a, b, c, d), distance) of the k closest \
+            functions, the distance being the weighted RMS distance on the \
+            normalized grid.
+        """
+        x = np.asarray(x, float)
+        center, half_width = (x.max() + x.min()) / 2., (x.max() - x.min()) / 2.
+        grid_x = center + half_width * self.grid
+        if weights is None:
+            grid_w = np.ones_like(grid_x)
+        else:
+            grid_w = np.interp(grid_x, x, np.asarray(weights, float))
+        grid_w = grid_w / grid_w.sum()
+        r = np.asarray(rational_func(grid_x), float)
+        r_mean = r.dot(grid_w)
+        r_centered = r - r_mean
+        r_var = (grid_w * r_centered ** 2).sum()
+        # weighted (co)variances of every row with the rational outputs
+        means = self.shapes.dot(grid_w)
+        variances = self.squared_shapes.dot(grid_w) - means ** 2
+        covariances = self.shapes.dot(grid_w * r_centered)
+        flat = variances <= 1e-12 * max(r_var, 1e-12)
+        variances[flat] = 1.
+        covariances[flat] = 0.
+        squared_dist = r_var - covariances ** 2 / variances
+        squared_dist[~self.valid] = np.inf
+        # best row for every function
+        order = np.argsort(squared_dist)
+        results, seen = [], set()
+        for row in order:
+            function_id = self.function_ids[row]
+            if function_id in seen or not np.isfinite(squared_dist[row]):
+                continue
+            seen.add(function_id)
+            a = covariances[row] / variances[row]
+            b = r_mean - a * means[row]
+            # s * u + t with u = (x - center) / half_width
+            c = self.scales[row] / half_width
+            d = self.shifts[row] - c * center
+            distance = np.sqrt(max(squared_dist[row], 0.))
+            results.append((self.functions[function_id], (a, b, c, d),
+                             distance))
+            if len(results) == k:
+                break
+        return results
+
+    def best_fit(self, rational_func, x, weights=None, k=3):
+        """
+        Finds the indexed function closest to `rational_func`: the `k` \
+        nearest ones in the index are refined with \
+        :func:`rational.utils.find_closest_equivalent`, starting from the \
+        indexed match.
+
+        Returns:
+            tuple: (function, (a, b, c, d), distance), distance as \
+            returned by `find_closest_equivalent`.
+        """
+        x = np.asarray(x, float)
+        y = np.asarray(rational_func(x), float)
+        best = (None, None, np.inf)
+        for func, initials, _ in self.query(rational_func, x, weights, k):
+            try:
+                params, distance = find_closest_equivalent(
+                    None, func, x, weights, np.array(initials), y=y)
+            except RuntimeError:
+                continue
+            if distance < best[2]:
+                best = (func, params, distance)
+        return best
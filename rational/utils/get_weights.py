@@ -1,15 +1,23 @@
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
 
 
+@lru_cache(maxsize=4)
+def _load_config(config_path, mtime):
+    # parsed once per modification of the configuration file
+    with open(config_path) as json_file:
+        return json.load(json_file)
+
+
 def get_parameters(rational_version, degrees, approx_func):
     nd, dd = degrees
     rational_full_name = f"Rational_version_{rational_version}{nd}/{dd}"
     config_file = '../rationals_config.json'
     config_file_dir = str(Path(os.path.abspath(__file__)).parent)
-    with open(os.path.join(config_file_dir, config_file)) as json_file:
-        rationals_dict = json.load(json_file)
+    config_path = os.path.join(config_file_dir, config_file)
+    rationals_dict = _load_config(config_path, os.path.getmtime(config_path))
     config_not_found = f"{rational_full_name} approximating {approx_func} not found in {config_file}.\
                           \nPlease add it (modify and run find_init_weights.py)"
     if rational_full_name not in rationals_dict:
@@ -19,4 +27,4 @@ def get_parameters(rational_version, degrees, approx_func):
         print(config_not_found)
         exit(1)
     params = rationals_dict[rational_full_name][approx_func]
-    return params["init_w_numerator"], params["init_w_denominator"]
+    return list(params["init_w_numerator"]), list(params["init_w_denominator"])
@@ -0,0 +1,225 @@
+"""
+simplify.py
+====================================
+Cheaper evaluation of frozen (torch) rational functions, for inference.
+
+Within a tolerance on the observed input range, a rational function is
+refitted with the smallest degrees (of compiled CUDA kernels by default), and
+with only odd (or even) terms in P and only even terms in Q if it is odd (or
+even) on this range. The frozen evaluation (see
+:meth:`rational.torch.Rational.freeze`) then skips the zero terms, and
+evaluates P and Q in x^2 when their terms share their parity.
+"""
+import copy
+
+import numpy as np
+
+from .find_init_weights import rational_versions
+from .utils import _linear_initialization, _rational_jacobian
+
+# degrees of the compiled CUDA kernels (see setup.py)
+kernel_degrees = [(3, 3), (4, 4), (5, 4), (5, 5), (6, 6), (7, 6), (7, 7),
+                  (8, 8)]
+
+
+def _polynomial_cost(powers):
+    # multiplications and additions per element of Horner's scheme over the
+    # powers (in x^2 if they share their parity, see _horner in
+    # rational.torch.rational_pytorch_functions)
+    if len(powers) == 0:
+        return 0
+    parities = set(powers % 2)
+    if len(parities) == 1 and len(powers) > 1:
+        parity = parities.pop()
+        return int((powers[-1] - parity) // 2 + 1 + parity + len(powers) - 1)
+    return int(powers[-1] + len(powers) - 1)
+
+
+def _cost(degrees, version, mask=None):
+    """
+    Multiplications and additions per element of P and Q, with the \
+    coefficients of `mask` only.
+    """
+    if mask is None:
+        mask = _parity_mask(degrees, version, None)
+    first_power = 0 if version == "C" else 1
+    nb_num = degrees[0] + 1
+    numerator_powers = np.flatnonzero(mask[:nb_num])
+    denominator_powers = np.flatnonzero(mask[nb_num:]) + first_power
+    return _polynomial_cost(numerator_powers) + \
+        _polynomial_cost(denominator_powers)
+
+
+def _parity_mask(degrees, version, parity):
+    """
+    Free coefficients of a rational function with the given parity \
+    (None, 0 for even, 1 for odd): P of that parity, Q even.
+    """
+    numerator = np.ones(degrees[0] + 1, bool)
+    first_power = 0 if version == "C" else 1
+    denominator = np.ones(degrees[1] + (version == "C"), bool)
+    if parity is not None:
+        numerator = np.arange(degrees[0] + 1) % 2 == parity
+        if version != "A":
+            # Q(x) of version A only depends on |x|, hence is even
+            powers = np.arange(len(denominator)) + first_power
+            denominator = powers % 2 == 0
+    return np.concatenate([numerator, denominator])
+
+
+def _masked_fit(x, y, degrees, version, mask, weights=None):
+    """
+    Least-squares fit of the coefficients of `mask`, the others being 0.
+    """
+    from scipy.optimize import least_squares
+    nb_num = degrees[0] + 1
+    rational = rational_versions[version]
+    jacobian = _rational_jacobian(x, degrees, version)
+    sqrt_w = np.ones_like(x) if weights is None else np.sqrt(weights)
+    p0 = _linear_initialization(x, y, degrees, version, weights=weights)
+    if not np.all(np.isfinite(p0)):
+        p0 = np.ones_like(p0)
+
+    def expand(free):
+        params = np.zeros(len(mask))
+        params[mask] = free
+        return params
+
+    def residuals(free):
+        params = expand(free)
+        return sqrt_w * (rational(x, params[:nb_num], params[nb_num:]) - y)
+
+    def jac(free):
+        return sqrt_w[:, None] * jacobian(expand(free))[:, mask]
+
+    result = least_squares(residuals, p0[mask], jac=jac, method="lm")
+    params = expand(result.x)
+    return params[:nb_num], params[nb_num:]
+
+
+def _frozen_rational(rational, numerator, denominator, degrees, compile=False):
+    import torch
+    import torch.nn as nn
+    simplified = copy.deepcopy(rational)
+    device = rational.numerator.device
+    simplified.numerator = nn.Parameter(
+        torch.tensor(numerator, dtype=rational.numerator.dtype, device=device))
+    simplified.denominator = nn.Parameter(
+        torch.tensor(denominator, dtype=rational.denominator.dtype,
+                     device=device))
+    simplified.degrees = tuple(degrees)
+    return simplified.freeze(compile)
+
+
+def simplify_rational(rational, x=None, tolerance=1e-3, candidates=None,
+                      symmetric=True, compile=False):
+    """
+    Returns a frozen copy of the (torch) `rational`, refitted with the \
+    cheapest degrees of `candidates` whose max absolute error on `x` is \
+    below `tolerance`, and with odd (or even) terms only if the rational \
+    is odd (or even) within `tolerance`. The rational itself is returned \
+    frozen if no candidate is cheaper.
+
+    Arguments:
+            rational (Rational):
+                The torch rational function.\n
+            x (array):
+                The observed input range. If ``None``, the bins of the \
+                input distribution (if retrieved) weighted by their \
+                frequencies.\n
+                Default ``None``
+            tolerance (float):
+                The maximum absolute error on `x`.\n
+                Default ``1e-3``
+            candidates (list of tuple):
+                The degrees to try.\n
+                Default ``None`` (`kernel_degrees`)
+            symmetric (bool):
+                If ``True``, looks for an odd or even rational function.\n
+                Default ``True``
+            compile (bool):
+                If ``True``, fuses the evaluation with `torch.compile`.\n
+                Default ``False``
+    Returns:
+        tuple: (frozen rational, report), the report holding the \
+        `degrees`, the `parity` (None, 0 for even, 1 for odd), the \
+        `max_error` and the per element operations `cost` (before, after).
+    """
+    import torch
+    from rational.torch.rational_pytorch_functions import \
+        Rational_PYTORCH_horner_F
+    x, weights = rational._fit_inputs(x)
+    x = np.asarray(x, float)
+
+    def evaluate(inputs):
+        with torch.no_grad():
+            return Rational_PYTORCH_horner_F(
+                torch.tensor(inputs, dtype=torch.float64),
+                rational.numerator.detach().double().cpu(),
+                rational.denominator.detach().double().cpu(), False,
+                rational.version).numpy()
+
+    y = evaluate(x)
+    version = "B" if rational.version == "D" else rational.version
+    parity = None
+    if symmetric:
+        mirrored = evaluate(- x)
+        if np.abs(y - mirrored).max() <= tolerance:
+            parity = 0
+        elif np.abs(y + mirrored).max() <= tolerance:
+            parity = 1
+    current_cost = _cost(rational.degrees, version)
+    report = {"degrees": tuple(rational.degrees), "parity": None,
+              "max_error": 0., "cost": (current_cost, current_cost)}
+    candidates = kernel_degrees if candidates is None else candidates
+    costs = {tuple(degrees): _cost(degrees, version,
+                                   _parity_mask(degrees, version, parity))
+             for degrees in candidates}
+    for degrees in sorted(costs, key=lambda degs: (costs[degs], degs)):
+        mask = _parity_mask(degrees, version, parity)
+        cost = costs[degrees]
+        if cost >= current_cost:
+            break
+        try:
+            numerator, denominator = _masked_fit(x, y, degrees, version,
+                                                 mask, weights)
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+        error = np.abs(rational_versions[version](x, numerator, denominator)
+                       - y).max()
+        if error <= tolerance:
+            report.update(degrees=tuple(degrees), parity=parity,
+                          max_error=float(error), cost=(current_cost, cost))
+            return _frozen_rational(rational, numerator, denominator,
+                                    degrees, compile), report
+    return rational.freeze(compile), report
+
+
+def simplify_rationals(model, x=None, tolerance=1e-3, candidates=None,
+                       symmetric=True, compile=False, verbose=True):
+    """
+    Replaces every Rational layer of `model` by its simplified frozen \
+    version (see :func:`simplify_rational`), on the inputs of its \
+    retrieved distribution (or `x`).
+
+    Returns:
+        dict: layer name -> report
+    """
+    from rational.torch import Rational
+    reports, simplified = {}, {}
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module._modules.items()):
+            if not isinstance(child, Rational):
+                continue
+            if id(child) not in simplified:
+                full_name = f"{name}.{child_name}" if name else child_name
+                simplified[id(child)] = simplify_rational(
+                    child, x, tolerance, candidates, symmetric, compile)
+                reports[full_name] = simplified[id(child)][1]
+            setattr(module, child_name, simplified[id(child)][0])
+    if verbose:
+        for name, report in reports.items():
+            print(f"{name}: degrees {report['degrees']}, parity "
+                  f"{report['parity']}, cost {report['cost'][0]} -> "
+                  f"{report['cost'][1]}, max error {report['max_error']:.2e}")
+    return reports
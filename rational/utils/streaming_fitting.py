@@ -0,0 +1,313 @@
+"""
+streaming_fitting.py
+====================================
+Out of core fitting of rational functions to recorded (x, y) samples, e.g. the
+inputs and outputs of an activation function of a teacher network.
+
+The samples are streamed by minibatches, from shards of arrays (or of `.npy`
+files, memory-mapped) or from an iterator, and never held in memory at once
+(a `.npz` shard is loaded in memory, one shard at a time):
+
+- `lm`: one Levenberg-Marquardt step per pass over the samples, the normal \
+equations (J^T J, J^T r) being accumulated over the minibatches. A step is \
+accepted (or not) during the next pass, that computes the cost of the new \
+coefficients as well as their normal equations.
+- `adam`: one Adam step per minibatch.
+
+The coefficients are initialized by Sanathanan-Koerner iterations, whose
+normal equations are accumulated the same way. The progress can be saved to a
+checkpoint, from which an interrupted fit is resumed.
+"""
+import os
+
+import numpy as np
+
+from .utils import _rational_jacobian
+
+
+def _load(array, mmap=True):
+    if isinstance(array, (str, os.PathLike)):
+        return np.load(array, mmap_mode="r" if mmap else None)
+    return array
+
+
+def iterate_samples(samples, batch_size=65536, skip=0):
+    """
+    Iterates over the (x, y) minibatches of `samples`.
+
+    Arguments:
+            samples (list or callable):
+                Either a list of shards, each one a (x, y) tuple of arrays \
+                or of `.npy` paths (memory-mapped), or a `.npz` path with \
+                the arrays `x` and `y`. Or a callable returning an iterator \
+                of (x, y) minibatches (`batch_size` is then ignored). Only \
+                `.npy` shards are out of core: a `.npz` archive cannot be \
+                memory-mapped, each shard is decompressed in memory.\n
+            batch_size (int):
+                The size of the minibatches.\n
+                Default ``65536``
+            skip (int):
+                The number of minibatches to skip, e.g. already consumed \
+                before a checkpoint.\n
+                Default ``0``
+    """
+    def batches():
+        if callable(samples):
+            yield from samples()
+            return
+        for shard in samples:
+            if isinstance(shard, (str, os.PathLike)):
+                # loaded in memory, and the archive closed
+                with np.load(shard) as archive:
+                    shard = archive["x"], archive["y"]
+            x, y = (_load(array) for array in shard)
+            for start in range(0, len(x), batch_size):
+                yield x[start:start + batch_size], y[start:start + batch_size]
+
+    for i, (x, y) in enumerate(batches()):
+        if i >= skip:
+            yield (np.asarray(x, float).ravel(), np.asarray(y, float).ravel())
+
+
+class StreamingFit():
+    """
+    Fits a rational function to streamed (x, y) samples.
+
+    Arguments:
+            degrees (tuple of int):
+                The degrees of the numerator (P) and denominator (Q).\n
+                Default ``(5, 4)``
+            version (str):
+                Version of Rational to fit (`D` is fitted as `B`).\n
+                Default ``A``
+            optimizer (str):
+                `lm` (one Levenberg-Marquardt step per pass) or `adam` \
+                (one step per minibatch).\n
+                Default ``lm``
+            lr (float):
+                The learning rate of `adam`.\n
+                Default ``1e-3``
+            p0 (array):
+                The initial coefficients, numerator then denominator. If \
+                ``None``, found by linearized least squares.\n
+                Default ``None``
+            checkpoint (str):
+                The file (`.npz`) the progress is saved to, and resumed \
+                from if it exists.\n
+                Default ``None``
+    """
+    def __init__(self, degrees=(5, 4), version="A", optimizer="lm", lr=1e-3,
+                 p0=None, checkpoint=None):
+        if version not in ["A", "B", "C", "D"]:
+            raise ValueError("version %s not implemented" % version)
+        if optimizer not in ["lm", "adam"]:
+            raise ValueError("optimizer %s not implemented" % optimizer)
+        self.degrees = tuple(degrees)
+        self.version = version
+        self.optimizer = optimizer
+        self.lr = lr
+        self.checkpoint = checkpoint
+        self.nb_num = degrees[0] + 1
+        self.nb_params = sum(degrees) + (2 if version == "C" else 1)
+        self.params = None if p0 is None else np.array(p0, float)
+        self.epoch = 0
+        self.batch = 0
+        self.cost = np.inf
+        # levenberg-marquardt: normal equations of the accepted coefficients
+        self.damping = 1e-3
+        self.jtj = None
+        self.jtr = None
+        # adam moments
+        self.moments = np.zeros((2, self.nb_params))
+        self.steps = 0
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    @property
+    def numerator(self):
+        return self.params[:self.nb_num]
+
+    @property
+    def denominator(self):
+        return self.params[self.nb_num:]
+
+    def state_dict(self):
+        state = {"params": self.params, "epoch": self.epoch,
+                 "batch": self.batch, "cost": self.cost,
+                 "damping": self.damping, "moments": self.moments,
+                 "steps": self.steps}
+        if self.jtj is not None:
+            state.update(jtj=self.jtj, jtr=self.jtr)
+        return state
+
+    def save(self, path=None):
+        """
+        Saves the progress in `path` (default: the checkpoint), atomically.
+        """
+        path = path or self.checkpoint
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, version=self.version, degrees=self.degrees,
+                 optimizer=self.optimizer, **self.state_dict())
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        Resumes the progress saved in `path`.
+        """
+        with np.load(path) as state:
+            if str(state["version"]) != self.version or \
+                    tuple(state["degrees"]) != self.degrees or \
+                    str(state["optimizer"]) != self.optimizer:
+                raise ValueError(f"checkpoint {path} is not a {self.optimizer}"
+                                 f" fit of a {self.version} "
+                                 f"{self.degrees[0]}/{self.degrees[1]} rational")
+            self.params = state["params"]
+            self.epoch, self.batch = int(state["epoch"]), int(state["batch"])
+            self.cost = float(state["cost"])
+            self.damping = float(state["damping"])
+            self.moments = state["moments"]
+            self.steps = int(state["steps"])
+            if "jtj" in state:
+                self.jtj, self.jtr = state["jtj"], state["jtr"]
+
+    def _features(self, x):
+        # linearized denominator (see rational.utils.utils._linear_initialization)
+        features = np.vander(x, self.degrees[1] + 1, increasing=True)[:, 1:]
+        if self.version == "A":
+            return np.abs(features)
+        return features
+
+    def initialize(self, samples, batch_size=65536, max_iter=3):
+        """
+        Finds the initial coefficients by Sanathanan-Koerner iterations, \
+        one pass over the samples per iteration.
+        """
+        params = None
+        for _ in range(max_iter):
+            lhs, rhs = 0., 0.
+            for x, y in iterate_samples(samples, batch_size):
+                features = self._features(x)
+                system = np.hstack([np.vander(x, self.nb_num, increasing=True),
+                                    - y[:, None] * features])
+                if params is None:
+                    weights = np.ones_like(y)
+                else:
+                    denominator = np.abs(1. + features.dot(params[self.nb_num:]))
+                    weights = 1. / np.maximum(denominator, 1e-3) ** 2
+                lhs = lhs + (system * weights[:, None]).T.dot(system)
+                rhs = rhs + (system * weights[:, None]).T.dot(y)
+            new_params = np.linalg.lstsq(lhs, rhs, rcond=None)[0]
+            if not np.all(np.isfinite(new_params)):
+                break
+            params = new_params
+        if params is None:
+            params = np.ones(self.nb_params - (self.version == "C"))
+        if self.version == "A":
+            params[self.nb_num:] = np.abs(params[self.nb_num:])
+        elif self.version == "C":
+            params = np.insert(params, self.nb_num, 0.9)
+        self.params = params
+        return params
+
+    def _residuals_and_jacobian(self, x, y, params):
+        jacobian = _rational_jacobian(x, self.degrees, self.version)(params)
+        # the numerator columns are x^i / Q(x)
+        rational = jacobian[:, :self.nb_num].dot(params[:self.nb_num])
+        return rational - y, jacobian
+
+    def _lm_pass(self, samples, batch_size):
+        # candidate coefficients, from the accepted normal equations
+        params = self.params
+        if self.jtj is not None:
+            diag = np.maximum(np.diag(self.jtj), 1e-12)
+            params = params + np.linalg.solve(
+                self.jtj + self.damping * np.diag(diag), - self.jtr)
+        jtj, jtr, cost, count = 0., 0., 0., 0
+        for x, y in iterate_samples(samples, batch_size):
+            residuals, jacobian = self._residuals_and_jacobian(x, y, params)
+            jtj = jtj + jacobian.T.dot(jacobian)
+            jtr = jtr + jacobian.T.dot(residuals)
+            cost += residuals.dot(residuals)
+            count += len(x)
+        cost /= count
+        if self.jtj is None or cost < self.cost:
+            if self.jtj is not None:
+                self.damping /= 3.
+            self.params = params
+            self.jtj, self.jtr, self.cost = jtj / count, jtr / count, cost
+        else:
+            self.damping *= 2.
+
+    def _adam_step(self, x, y, beta1=0.9, beta2=0.999, eps=1e-8):
+        residuals, jacobian = self._residuals_and_jacobian(x, y, self.params)
+        gradient = 2. * jacobian.T.dot(residuals) / len(x)
+        self.steps += 1
+        self.moments[0] = beta1 * self.moments[0] + (1 - beta1) * gradient
+        self.moments[1] = beta2 * self.moments[1] + (1 - beta2) * gradient ** 2
+        m_hat = self.moments[0] / (1 - beta1 ** self.steps)
+        v_hat = self.moments[1] / (1 - beta2 ** self.steps)
+        self.params = self.params - self.lr * m_hat / (np.sqrt(v_hat) + eps)
+        return residuals.dot(residuals) / len(x)
+
+    def fit(self, samples, epochs=10, batch_size=65536, checkpoint_every=100,
+            verbose=False):
+        """
+        Fits the rational function to the samples (see \
+        :func:`iterate_samples`), until `epochs` passes over them.
+
+        Arguments:
+                samples (list or callable):
+                    The shards of (x, y) samples, or a callable returning \
+                    an iterator of (x, y) minibatches.\n
+                epochs (int):
+                    The total number of passes over the samples (including \
+                    the ones of a resumed checkpoint).\n
+                    Default ``10``
+                batch_size (int):
+                    The size of the minibatches.\n
+                    Default ``65536``
+                checkpoint_every (int):
+                    With `adam`, the number of minibatches between two \
+                    checkpoints (also saved after every pass).\n
+                    Default ``100``
+                verbose (bool):
+                    If ``True``, prints the cost after every pass.\n
+                    Default ``False``
+        Returns:
+            tuple: (numerator, denominator)
+        """
+        if self.params is None:
+            self.initialize(samples, batch_size)
+        while self.epoch < epochs:
+            if self.optimizer == "lm":
+                self._lm_pass(samples, batch_size)
+            else:
+                costs = []
+                for x, y in iterate_samples(samples, batch_size, self.batch):
+                    costs.append(self._adam_step(x, y))
+                    self.batch += 1
+                    if self.checkpoint is not None and \
+                            self.batch % checkpoint_every == 0:
+                        self.save()
+                self.cost = np.mean(costs) if costs else self.cost
+                self.batch = 0
+            self.epoch += 1
+            if self.checkpoint is not None:
+                self.save()
+            if verbose:
+                print(f"epoch {self.epoch}: mse {self.cost:.3e}")
+        return self.numerator, self.denominator
+
+
+def streaming_fit(samples, degrees=(5, 4), version="A", optimizer="lm",
+                  epochs=10, batch_size=65536, lr=1e-3, p0=None,
+                  checkpoint=None, verbose=False):
+    """
+    Fits a rational function to streamed (x, y) samples, out of core (see \
+    :class:`StreamingFit`).
+
+    Returns:
+        tuple: (numerator, denominator)
+    """
+    fitter = StreamingFit(degrees, version, optimizer, lr, p0, checkpoint)
+    return fitter.fit(samples, epochs, batch_size, verbose=verbose)
@@ -0,0 +1,3 @@
+"""
+This file makes the utils.tests directory a Python package.
+"""
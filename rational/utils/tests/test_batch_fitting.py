@@ -0,0 +1,25 @@
+"""
+This file tests the parallel batch fitting (rational.utils.batch_fitting).
+"""
+import json
+import shutil
+
+from rational.utils.batch_fitting import batch_fit
+from rational.utils.find_init_weights import _config_file
+
+
+def test_batch_fit_stores_all(tmp_path):
+    config_file = str(tmp_path / "rationals_config.json")
+    shutil.copy(_config_file(), config_file)
+    results = batch_fit(["tanh", "sigmoid"], versions=["B", "C"],
+                        degrees=[(5, 4)], nb_points=2000, workers=2,
+                        config_file=config_file, verbose=False)
+    assert len(results) == 4
+    assert all(res["max_error"] < 1e-3 for res in results)
+    with open(config_file) as json_file:
+        rationals_dict = json.load(json_file)
+    # existing entries are kept
+    assert "relu" in rationals_dict["Rational_version_B5/4"]
+    stored = rationals_dict["Rational_version_C5/4"]["sigmoid"]
+    assert len(stored["init_w_numerator"]) == 6
+    assert len(stored["init_w_denominator"]) == 5
@@ -0,0 +1,79 @@
+"""
+This file tests the parallel best fit (rational.utils.best_fit).
+"""
+import numpy as np
+
+from rational.utils import parallel_best_fit, best_fit_model
+
+x = np.arange(-3., 3., 0.01)
+
+
+def _relu(t):
+    return np.maximum(t, 0.)
+
+
+def _sigmoid(t):
+    return 1. / (1. + np.exp(-t))
+
+
+candidates = [_relu, np.tanh, _sigmoid, np.sin]
+
+
+def test_parallel_best_fit():
+    rational = lambda t: 2. * np.sin(0.5 * t) + 1.
+    best, params, distance, distances = parallel_best_fit(
+        rational, candidates, x, np.exp(- x ** 2))
+    assert best is np.sin
+    assert np.allclose(params, [2., 1., 0.5, 0.], atol=1e-4)
+    assert set(distances) == set(candidates)
+    assert min(distances.values()) == distance
+
+
+def test_parallel_best_fit_without_pruning():
+    from rational.utils.utils import find_closest_equivalent
+    rational = lambda t: 2. * np.sin(0.5 * t) + 1.
+    weights = np.exp(- x ** 2)
+    _, _, _, distances = parallel_best_fit(rational, candidates, x, weights,
+                                           prune_ratio=None)
+    # every candidate is fitted on all the inputs, as a sequential search
+    for func in candidates:
+        expected = find_closest_equivalent(rational, func, x, weights)[1]
+        assert np.isclose(distances[func], expected)
+
+
+def test_parallel_best_fit_processes():
+    rational = lambda t: _relu(t - 0.5)
+    best, params, distance, _ = parallel_best_fit(rational, candidates, x,
+                                                  executor="process",
+                                                  workers=2)
+    assert best is _relu and distance < 1e-6
+
+
+def test_best_fit_model():
+    import torch.nn as nn
+    from rational.torch import Rational
+    model = nn.Sequential(nn.Linear(2, 2),
+                          Rational("tanh", version="B", cuda=False),
+                          nn.Sequential(nn.Linear(2, 2),
+                                        Rational("relu", version="B",
+                                                 cuda=False)))
+    best_fits = best_fit_model(model, candidates, verbose=False)
+    assert best_fits["1"][0] is np.tanh
+    assert best_fits["2.1"][0] is _relu
+    assert model[1].best_fitted_function is np.tanh
+
+
+def test_best_fit_augmented_rational():
+    # the fitted outputs are the ones of the forward, affine parameters included
+    import torch
+    import torch.nn as nn
+    from rational.torch.rationals import AugmentedRational
+    rational = AugmentedRational("tanh", version="B", cuda=False)
+    with torch.no_grad():
+        rational.vertical_scale.fill_(3.)
+        rational.out_bias.fill_(2.)
+    best_fits = best_fit_model(nn.Sequential(rational), candidates,
+                               verbose=False)
+    func, (a, b, c, d), distance = best_fits["0"]
+    assert func is np.tanh
+    assert abs(a - 3.) < 0.1 and abs(b - 2.) < 0.1
@@ -0,0 +1,147 @@
+"""
+This file tests the conversion of torch models (rational.utils.convert_network).
+"""
+import torch
+import torch.nn as nn
+
+from rational.torch import Rational
+from rational.utils import convert_to_rational
+
+
+class Block(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(4, 4)
+        self.act = nn.ReLU()
+        self.gate = nn.Sequential(nn.Linear(4, 4), nn.Sigmoid())
+
+    def forward(self, x):
+        return x + self.act(self.linear(x)) * self.gate(x)
+
+
+def _model():
+    return nn.Sequential(Block(), nn.Sequential(Block(), nn.Tanh()),
+                         nn.Linear(4, 1))
+
+
+def _rationals(model):
+    return [module for module in model.modules() if isinstance(module, Rational)]
+
+
+def test_convert_in_place():
+    model = _model()
+    converted = convert_to_rational(model, version="B")
+    assert converted is model
+    assert isinstance(model[0].act, Rational)
+    assert isinstance(model[1][0].gate[1], Rational)
+    assert model[1][1].init_approximation == "tanh"
+    # every activation has its own layer, the forward is the custom one
+    assert len(set(map(id, _rationals(model)))) == 5
+    assert model(torch.randn(8, 4)).shape == (8, 1)
+
+
+def test_share_policies():
+    per_type = convert_to_rational(_model(), share="type")
+    assert len(set(map(id, _rationals(per_type)))) == 3
+    assert per_type[0].act is per_type[1][0].act
+    per_stage = convert_to_rational(_model(), share="stage")
+    assert len(set(map(id, _rationals(per_stage)))) == 5
+    assert per_stage[0].act is not per_stage[1][0].act
+    # shared layers are counted once in the parameters
+    assert len(list(per_type.parameters())) < len(list(per_stage.parameters()))
+
+
+def test_shared_activation():
+    # a layer registered twice is replaced at both places
+    act = nn.ReLU()
+    model = nn.Sequential(nn.Linear(4, 4), act, nn.Linear(4, 4), act)
+    convert_to_rational(model)
+    assert isinstance(model[1], Rational) and isinstance(model[3], Rational)
+    assert model(torch.randn(8, 4)).shape == (8, 4)
+
+
+def test_not_inplace():
+    model = _model()
+    converted = convert_to_rational(model, inplace=False)
+    assert isinstance(model[0].act, nn.ReLU)
+    assert isinstance(converted[0].act, Rational)
+    assert isinstance(convert_to_rational(nn.GELU()), Rational)
+
+
+def test_rational_surrogates():
+    from rational.utils.convert_network import convert_to_rational_surrogates
+    model = nn.Sequential(nn.Linear(4, 8), nn.GELU(), nn.Linear(8, 8),
+                          nn.SiLU(), nn.Linear(8, 8), nn.Tanh(),
+                          nn.Linear(8, 8), nn.Hardswish(), nn.Linear(8, 1))
+    x = torch.randn(64, 4)
+    converted, report = convert_to_rational_surrogates(
+        model, x, inplace=False, max_error=1e-4, repeats=2, verbose=False)
+    replaced = {entry["function"]: entry["replaced"]
+                for entry in report["layers"]}
+    # the gelu approximation of rationals_config.json is not that precise
+    assert replaced == {"gelu": False, "swish": True, "tanh": True,
+                        "hardswish": True}
+    assert isinstance(converted[1], nn.GELU)
+    assert isinstance(converted[3], Rational) and converted[3].frozen
+    assert not converted[3].numerator.requires_grad
+    assert all(entry["speedup"] > 0 for entry in report["layers"])
+    assert report["output_max_error"] < 1e-3
+    with torch.no_grad():
+        assert torch.allclose(converted(x), model(x), atol=1e-3)
+
+
+def test_frozen_rational():
+    for version in ["A", "B", "C", "D"]:
+        rational = Rational("tanh", version=version, cuda=False)
+        x = torch.linspace(-3., 3., 100, requires_grad=True)
+        with torch.no_grad():
+            rational.training = False
+            expected = rational(x)
+            rational.freeze()
+            assert torch.allclose(rational(x), expected, atol=1e-4)
+        rational(x).sum().backward()
+        assert x.grad is not None and rational.numerator.grad is None
+
+
+def test_rational_to_native():
+    import numpy as np
+    from rational.numpy.rationals import Rational_version_B
+    from rational.utils import fit_rational_to_base_function
+    from rational.utils.convert_network import convert_rational_to_native
+
+    rational = Rational(version="B", cuda=False)
+    num, den = fit_rational_to_base_function(
+        Rational_version_B, lambda t: 2. * np.tanh(0.7 * t + 0.2) - 0.3,
+        np.linspace(-4., 4., 1000), version="B")
+    with torch.no_grad():
+        rational.numerator.copy_(torch.tensor(num))
+        rational.denominator.copy_(torch.tensor(den))
+    model = nn.Sequential(nn.Linear(4, 8), rational, nn.Linear(8, 2))
+    x = torch.randn(64, 4)
+    converted, report = convert_rational_to_native(
+        model, x, functions=["relu", "tanh", "silu"], inplace=False,
+        repeats=2, verbose=False)
+    entry, = report["layers"]
+    assert entry["function"] == "tanh" and entry["replaced"]
+    assert entry["folded"] == [(True, True)]
+    assert isinstance(converted[1], nn.Tanh)
+    assert report["output_max_error"] < 1e-3
+    assert isinstance(model[1], Rational)
+
+
+def test_augmented_rational_to_native():
+    # the affine parameters are part of the fitted outputs
+    from rational.torch.rationals import AugmentedRational
+    from rational.utils.convert_network import convert_rational_to_native
+    rational = AugmentedRational("tanh", version="B", cuda=False)
+    with torch.no_grad():
+        rational.vertical_scale.fill_(3.)
+        rational.out_bias.fill_(2.)
+    model = nn.Sequential(nn.Linear(4, 8), rational, nn.Linear(8, 2))
+    converted, report = convert_rational_to_native(
+        model, torch.randn(64, 4), functions=["relu", "tanh"], inplace=False,
+        repeats=2, verbose=False)
+    entry, = report["layers"]
+    assert entry["function"] == "tanh" and entry["replaced"]
+    assert abs(entry["params"][0] - 3.) < 0.1 and abs(entry["params"][1] - 2.) < 0.1
+    assert report["output_max_error"] < 1e-2
@@ -0,0 +1,144 @@
+"""
+This file tests the fitting of rational functions (rational.utils.utils).
+"""
+import numpy as np
+
+from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
+    Rational_version_C
+from rational.utils.utils import _rational_jacobian, _wrap_func, _curve_fit, \
+    _linear_initialization
+
+x = np.linspace(-3., 3., 200)
+degrees = (5, 4)
+rational_funcs = {"A": Rational_version_A, "B": Rational_version_B,
+                  "C": Rational_version_C}
+
+
+def _numerical_jacobian(version, params, eps=1e-6):
+    func = _wrap_func(rational_funcs[version], x, np.zeros_like(x), degrees)
+    steps = np.eye(len(params)) * eps
+    return np.stack([(func(params + step) - func(params - step)) / (2 * eps)
+                     for step in steps], 1)
+
+
+def _test_jacobian(version):
+    nb_params = sum(degrees) + (2 if version == "C" else 1)
+    params = np.random.RandomState(0).normal(size=nb_params)
+    jacobian = _rational_jacobian(x, degrees, version)(params)
+    assert np.allclose(jacobian, _numerical_jacobian(version, params),
+                       atol=1e-6)
+
+
+def test_jacobian_a():
+    _test_jacobian("A")
+
+
+def test_jacobian_b():
+    _test_jacobian("B")
+
+
+def test_jacobian_c():
+    _test_jacobian("C")
+
+
+def test_analytic_fit_less_evaluations():
+    y = np.tanh(x)
+    nfevs = []
+    for jac in [None, "2-point"]:
+        _, _, infodict, _, _ = _curve_fit(Rational_version_B, x, y, degrees,
+                                          "B", jac=jac, maxfev=100000,
+                                          full_output=True)
+        assert np.abs(infodict["fvec"]).max() < 1e-3
+        nfevs.append(infodict["nfev"])
+    assert nfevs[0] < nfevs[1]
+
+
+def _test_linear_initialization(version):
+    y = np.tanh(x)
+    params = _linear_initialization(x, y, degrees, version)
+    approx = rational_funcs[version](x, params[:degrees[0]+1],
+                                     params[degrees[0]+1:])
+    assert np.abs(approx - y).max() < 1e-2
+
+
+def test_linear_initialization_a():
+    _test_linear_initialization("A")
+
+
+def test_linear_initialization_b():
+    _test_linear_initialization("B")
+
+
+def test_linear_initialization_c():
+    _test_linear_initialization("C")
+
+
+def test_weighted_fit_ignores_zero_weights():
+    # a step is not representable, but the weighted region is
+    y = np.where(x > 0., np.tanh(x), 5.)
+    weights = (x > 0.).astype(float)
+    popt = _curve_fit(Rational_version_B, x, y, degrees, "B", weights=weights,
+                      maxfev=100000)[0]
+    approx = Rational_version_B(x, popt[:degrees[0]+1], popt[degrees[0]+1:])
+    assert np.abs(approx - y)[x > 0.].max() < 1e-3
+
+
+def test_weighted_closest_equivalent():
+    from rational.utils import find_closest_equivalent
+    freq = np.exp(- x ** 2)
+    freq /= freq.sum()
+    (a, b, c, d), distance = find_closest_equivalent(
+        lambda t: 2. * np.tanh(t) + 1., np.tanh, x, freq)
+    assert np.allclose([a, b, c, d], [2., 1., 1., 0.], atol=1e-4)
+    assert distance < 1e-4
+
+
+def _counted(func, counts):
+    def counted_func(t):
+        counts[func] = counts.get(func, 0) + 1
+        return func(t)
+    return counted_func
+
+
+def test_incremental_best_fit():
+    from rational.utils import incremental_best_fit
+    counts = {}
+    candidates = [_counted(func, counts) for func in
+                  [np.tanh, np.sin, lambda t: np.maximum(t, 0.)]]
+    rational = lambda t: 2. * np.tanh(t) + 0.5
+    freq = np.exp(- x ** 2)
+    best, params, distance, state = incremental_best_fit(rational, candidates,
+                                                         x, freq)
+    assert best is candidates[0] and distance < 1e-4
+    # unchanged distribution: nothing is refitted
+    counts.clear()
+    best, params, distance, new_state = incremental_best_fit(
+        rational, candidates, x, freq, state)
+    assert best is candidates[0] and new_state is state and not counts
+    # small drift: warm start, the other candidates are pruned
+    shifted_freq = np.exp(- (x - 0.05) ** 2)
+    best, params, distance, _ = incremental_best_fit(
+        rational, candidates, x, shifted_freq, state)
+    assert best is candidates[0]
+    assert np.allclose(params, [2., 0.5, 1., 0.], atol=1e-4)
+    assert set(counts) == {np.tanh}
+
+
+def test_incremental_best_fit_slow_drift():
+    # the rational outputs drift slowly from tanh to sin: the distances of
+    # the skipped candidates must be bounded by the drift since their fit
+    from rational.utils import incremental_best_fit
+    from rational.utils.utils import find_closest_equivalent
+    candidates = [np.tanh, np.sin]
+    freq = np.exp(- x ** 2)
+    state = None
+    for t in np.linspace(0., 1., 101):
+        rational = lambda s: (1 - t) * np.tanh(s) + t * np.sin(s)
+        # every call refits (no drift tolerance), only pruning can skip fits
+        best, params, distance, state = incremental_best_fit(
+            rational, candidates, x, freq, state, drift_tolerance=0.)
+        distances = [find_closest_equivalent(rational, func, x, freq)[1]
+                     for func in candidates]
+        assert np.isclose(distance, min(distances), rtol=1e-6)
+        assert best is candidates[int(np.argmin(distances))] or \
+            np.isclose(distances[0], distances[1], rtol=1e-6)
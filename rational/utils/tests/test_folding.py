@@ -0,0 +1,112 @@
+"""
+This file tests the folding of affine transformations (rational.utils.folding).
+"""
+import pytest
+import torch
+import torch.nn as nn
+
+from rational.utils.folding import ScalarAffine, fold_affine_activation
+
+params = (1.5, -0.2, 0.7, 0.3)
+
+
+def _reference(first, second, x):
+    a, b, c, d = params
+    with torch.no_grad():
+        return second(a * torch.tanh(c * first(x) + d) + b)
+
+
+@pytest.mark.parametrize("first, second, x, folded", [
+    (nn.Linear(4, 8), nn.Linear(8, 2), torch.randn(16, 4), (True, True)),
+    (nn.Conv2d(3, 4, 3), nn.Conv2d(4, 2, 3, groups=2), torch.randn(2, 3, 9, 9),
+     (True, True)),
+    # the zero padding of the second convolution can not absorb the shift
+    (nn.Conv2d(3, 4, 3), nn.Conv2d(4, 2, 3, padding=1),
+     torch.randn(2, 3, 9, 9), (True, False)),
+    (nn.BatchNorm1d(4).eval(), nn.Identity(), torch.randn(16, 4),
+     (True, False)),
+])
+def test_fold_affine_activation(first, second, x, folded):
+    expected = _reference(first, second, x)
+    placeholder = nn.Identity()
+    model = nn.Sequential(first, placeholder, second)
+    assert fold_affine_activation(model, placeholder, nn.Tanh(),
+                                  params) == [folded]
+    with torch.no_grad():
+        assert torch.allclose(model(x), expected, atol=1e-5)
+    nb_affines = sum(isinstance(module, ScalarAffine)
+                     for module in model.modules())
+    assert nb_affines == 2 - sum(folded)
+
+
+def test_no_neighbours():
+    class Residual(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.act = nn.Identity()
+
+        def forward(self, x):
+            return x + self.act(x)
+
+    model = Residual()
+    x = torch.randn(8)
+    a, b, c, d = params
+    expected = x + a * torch.tanh(c * x + d) + b
+    assert fold_affine_activation(model, model.act, nn.Tanh(),
+                                  params) == [(False, False)]
+    assert torch.allclose(model(x), expected, atol=1e-6)
+
+
+def test_shared_activation():
+    # a layer registered twice is folded at both places
+    first, middle, second = nn.Linear(4, 8), nn.Linear(8, 8), nn.Linear(8, 2)
+    x = torch.randn(16, 4)
+    expected = _reference(middle, second, x=_reference(first, nn.Identity(), x))
+    placeholder = nn.Identity()
+    model = nn.Sequential(first, placeholder, middle, placeholder, second)
+    assert fold_affine_activation(model, placeholder, nn.Tanh(),
+                                  params) == [(True, True), (True, True)]
+    with torch.no_grad():
+        assert torch.allclose(model(x), expected, atol=1e-5)
+
+
+def _augmented(version):
+    from rational.torch.rationals import AugmentedRational
+    rational = AugmentedRational("tanh", version=version, cuda=False)
+    with torch.no_grad():
+        rational.horizontal_scale.fill_(0.8)
+        rational.in_bias.fill_(0.3)
+        rational.vertical_scale.fill_(1.7)
+        rational.out_bias.fill_(-0.4)
+    return rational
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C", "D"])
+def test_fold_augmented_rationals(version):
+    from rational.torch import Rational
+    from rational.utils.folding import fold_augmented_rationals
+
+    class Residual(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.act = _augmented(version)
+
+        def forward(self, x):
+            return x + self.act(x)
+
+    model = nn.Sequential(nn.Linear(4, 8), _augmented(version),
+                          nn.Linear(8, 8), Residual()).eval()
+    x = torch.randn(16, 4)
+    with torch.no_grad():
+        expected = model(x)
+    folded = fold_augmented_rationals(model)
+    # no neighbour: only version C absorbs its input bias, no version its
+    # output bias
+    assert folded == {"1": [(True, True)],
+                      "3.act": [(version == "C", False)]}
+    assert type(model[1]) is Rational
+    nb_affines = sum(isinstance(module, ScalarAffine)
+                     for module in model.modules())
+    assert nb_affines == (1 if version == "C" else 2)
+    with torch.no_grad():
+        assert torch.allclose(model(x), expected, atol=1e-4)
@@ -0,0 +1,54 @@
+"""
+This file tests the index of function shapes (rational.utils.function_index).
+"""
+import numpy as np
+
+from rational.utils import FunctionIndex
+
+x = np.arange(-3., 3., 0.01)
+
+
+def _relu(t):
+    return np.maximum(t, 0.)
+
+
+def _sigmoid(t):
+    return 1. / (1. + np.exp(-t))
+
+
+index = FunctionIndex([_relu, np.tanh, _sigmoid, np.sin, np.exp])
+
+
+def test_query_affine_invariant():
+    rational = lambda t: - 3. * np.sin(0.5 * t + 1.) + 2.
+    (best, (a, b, c, d), distance), = index.query(rational, x, k=1)
+    assert best is np.sin
+    # matched on the (coarse) grid of input scales and shifts
+    assert distance < 0.2
+    assert np.abs(a * np.sin(c * x + d) + b - rational(x)).max() < 0.5
+
+
+def test_query_top_k():
+    results = index.query(_relu, x, np.exp(- x ** 2), k=3)
+    assert len(results) == 3
+    assert results[0][0] is _relu
+    assert len(set(func for func, _, _ in results)) == 3
+    distances = [distance for _, _, distance in results]
+    assert distances == sorted(distances)
+
+
+def test_best_fit():
+    rational = lambda t: 2. * np.tanh(1.3 * t - 0.2) + 1.
+    best, params, distance = index.best_fit(rational, x, k=2)
+    assert best is np.tanh
+    a, b, c, d = params
+    assert np.allclose(a * np.tanh(c * x + d) + b, rational(x), atol=1e-5)
+    assert distance < 1e-6
+
+
+def test_rational_best_fit():
+    from rational.torch import Rational
+    rational = Rational("relu", version="B", cuda=False)
+    best, _ = rational.best_fit(index, np.arange(-3., 3., 0.1), k=2)
+    assert best is _relu
+    assert rational.best_fitted_function is _relu
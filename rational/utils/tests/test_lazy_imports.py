@@ -0,0 +1,56 @@
+"""
+This file tests that importing the rational packages does not import the
+heavy dependencies (backends, scipy, matplotlib) before they are used.
+"""
+import subprocess
+import sys
+
+
+def _imported_modules(statement):
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    out = subprocess.check_output([sys.executable, "-c", code],
+                                  universal_newlines=True)
+    return set(out.split())
+
+
+def test_utils_is_lazy():
+    modules = _imported_modules("import rational.utils")
+    assert "matplotlib" not in modules
+    assert "torch" not in modules
+    assert "scipy" not in modules
+
+
+def test_backends_are_lazy():
+    modules = _imported_modules("import rational.torch, rational.numpy, "
+                                "rational.keras, rational.mxnet")
+    assert "torch" not in modules
+    assert "tensorflow" not in modules
+    assert "mxnet" not in modules
+    assert "rational.torch.rationals" not in modules
+
+
+def test_lazy_attribute_access():
+    modules = _imported_modules("from rational.numpy import Rational")
+    assert "rational.numpy.rationals" in modules
+    assert "torch" not in modules
+
+
+def test_find_weights_without_matplotlib():
+    modules = _imported_modules("from rational.utils import find_weights")
+    assert "matplotlib" not in modules
+
+
+def test_find_weights_plot(monkeypatch):
+    # matplotlib is imported by the plot only
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import torch
+    from rational.utils import find_weights
+    monkeypatch.setattr(plt, "show", lambda: None)
+    w_params, d_params = find_weights(torch.tanh, "tanh", degrees=(3, 2),
+                                      bounds=(-2., 2.), version="B",
+                                      plot=True, save=False)
+    assert len(w_params) == 4 and len(d_params) == 2
+    assert len(plt.gca().lines) == 2
+    plt.close("all")
@@ -0,0 +1,54 @@
+"""
+This file tests the simplification of frozen rationals (rational.utils.simplify).
+"""
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from rational.torch import Rational
+from rational.utils.simplify import simplify_rational, simplify_rationals
+
+x = torch.linspace(-3., 3., 500)
+
+
+@pytest.mark.parametrize("version", ["A", "B", "C", "D"])
+def test_simplify_odd_rational(version):
+    rational = Rational("tanh", version=version, cuda=False)
+    with torch.no_grad():
+        rational.training = False
+        expected = rational(x)
+    simplified, report = simplify_rational(rational, tolerance=1e-2)
+    assert simplified is not rational and simplified.frozen
+    assert report["parity"] == 1
+    assert report["cost"][1] < report["cost"][0]
+    assert tuple(simplified.degrees) == report["degrees"]
+    # only odd terms in P, even terms in Q (except for version A)
+    assert np.all(simplified.numerator.numpy()[::2] == 0)
+    with torch.no_grad():
+        assert (simplified(x) - expected).abs().max() <= 1e-2
+
+
+def test_no_cheaper_candidate():
+    rational = Rational("leaky_relu", version="B", cuda=False)
+    simplified, report = simplify_rational(rational, tolerance=1e-6)
+    assert simplified is rational and rational.frozen
+    assert report["degrees"] == (5, 4) and report["cost"][0] == report["cost"][1]
+
+
+def test_exact_zeros():
+    # identity: P = x, Q = 1, evaluated with a single multiplication
+    rational = Rational("identity", version="B", cuda=False)
+    simplified, report = simplify_rational(rational, tolerance=1e-8,
+                                           candidates=[(1, 1)])
+    assert report["degrees"] == (1, 1)
+    with torch.no_grad():
+        assert torch.allclose(simplified(x), x)
+
+
+def test_simplify_rationals():
+    shared = Rational("tanh", version="B", cuda=False)
+    model = nn.Sequential(nn.Linear(2, 4), shared, nn.Linear(4, 4), shared)
+    reports = simplify_rationals(model, tolerance=1e-2, verbose=False)
+    assert list(reports) == ["1"]
+    assert model[1] is model[3] and model[1] is not shared
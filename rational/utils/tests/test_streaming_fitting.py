@@ -0,0 +1,68 @@
+"""
+This file tests the out of core fitting (rational.utils.streaming_fitting).
+"""
+import numpy as np
+import pytest
+
+from rational.numpy.rationals import Rational_version_B
+from rational.utils import StreamingFit, streaming_fit
+
+rng = np.random.default_rng(0)
+x_test = np.linspace(-3., 3., 1000)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    # two shards of .npy files (memory-mapped) and one of arrays
+    paths = []
+    for i in range(2):
+        x = rng.uniform(-3., 3., 20000)
+        np.save(tmp_path / f"x{i}.npy", x)
+        np.save(tmp_path / f"y{i}.npy", np.tanh(x))
+        paths.append((tmp_path / f"x{i}.npy", tmp_path / f"y{i}.npy"))
+    x = rng.uniform(-3., 3., 20000)
+    return paths + [(x, np.tanh(x))]
+
+
+@pytest.mark.parametrize("optimizer, epochs, tolerance",
+                         [("lm", 10, 1e-4), ("adam", 5, 1e-2)])
+def test_streaming_fit(shards, optimizer, epochs, tolerance):
+    num, den = streaming_fit(shards, version="B", optimizer=optimizer,
+                             epochs=epochs, batch_size=4096)
+    error = Rational_version_B(x_test, num, den) - np.tanh(x_test)
+    assert np.abs(error).max() < tolerance
+
+
+def test_npz_samples(tmp_path):
+    from rational.utils.streaming_fitting import iterate_samples
+    x = rng.uniform(-3., 3., 10000)
+    np.savez(tmp_path / "samples.npz", x=x, y=np.tanh(x))
+    batches = list(iterate_samples([tmp_path / "samples.npz"] * 2, 4096))
+    assert len(batches) == 6
+    assert np.array_equal(np.concatenate([x for x, _ in batches[:3]]), x)
+
+
+def test_iterator_samples():
+    def samples():
+        for _ in range(10):
+            x = rng.uniform(-3., 3., 1000)
+            yield x, np.tanh(x)
+    num, den = streaming_fit(samples, version="B", epochs=10)
+    error = Rational_version_B(x_test, num, den) - np.tanh(x_test)
+    assert np.abs(error).max() < 1e-4
+
+
+@pytest.mark.parametrize("optimizer", ["lm", "adam"])
+def test_resume_from_checkpoint(shards, tmp_path, optimizer):
+    checkpoint = str(tmp_path / "checkpoint.npz")
+    StreamingFit(version="B", optimizer=optimizer,
+                 checkpoint=checkpoint).fit(shards, 3, 4096)
+    resumed = StreamingFit(version="B", optimizer=optimizer,
+                           checkpoint=checkpoint)
+    assert resumed.epoch == 3
+    resumed.fit(shards, 6, 4096)
+    uninterrupted = StreamingFit(version="B", optimizer=optimizer)
+    uninterrupted.fit(shards, 6, 4096)
+    assert np.allclose(resumed.params, uninterrupted.params)
+    with pytest.raises(ValueError):
+        StreamingFit(version="A", optimizer=optimizer, checkpoint=checkpoint)
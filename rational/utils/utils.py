@@ -13,18 +13,103 @@ def _wrap_func(func, xdata, ydata, degrees):
     return func_wrapped
 
 
-def _curve_fit(f, xdata, ydata, degrees, version, p0=None, absolute_sigma=False,
-               method=None, jac=None, **kwargs):
-    from scipy.optimize.optimize import OptimizeWarning
-    from scipy.optimize._lsq.least_squares import prepare_bounds
-    from scipy.optimize.minpack import leastsq, _wrap_jac
-    bounds = (-np.inf, np.inf)
-    lb, ub = prepare_bounds(bounds, np.sum(degrees))
-    if p0 is None:
-        if version == "C":
-            p0 = np.ones(np.sum(degrees)+2)
+def _wrap_weights(func, sqrt_weights):
+    def func_weighted(params):
+        return func(params) * sqrt_weights
+    return func_weighted
+
+
+def _wrap_jac(jac, xdata, degrees):
+    def jac_wrapped(params):
+        params1 = params[:degrees[0]+1]
+        params2 = params[degrees[0]+1:]
+        return jac(xdata, params1, params2)
+    return jac_wrapped
+
+
+def _rational_jacobian(xdata, degrees, version):
+    """
+    Closed form jacobian of the residuals P(x)/Q(x) - y with respect to the \
+    numerator and denominator coefficients (same derivatives as the CUDA \
+    backward kernels). The powers of x are only computed once.
+    """
+    xps = np.vander(xdata, max(degrees) + 1, increasing=True)
+    nb_num = degrees[0] + 1
+
+    def jac(params):
+        w_array, d_array = params[:nb_num], params[nb_num:]
+        numerator = xps[:, :nb_num].dot(w_array)
+        if version == "A":
+            # dQ/db_i = sign(b_i) * |x^i|
+            xps_d = xps[:, 1:len(d_array)+1]
+            denominator = 1. + np.abs(xps_d * d_array).sum(1)
+            d_denominator = np.abs(xps_d) * np.sign(d_array)
         else:
-            p0 = np.ones(np.sum(degrees)+1)
+            # dQ/db_i = sign(A(x)) * x^i, A being the polynomial in the abs
+            if version == "C":
+                xps_d = xps[:, :len(d_array)]
+                eps = 0.1
+            else:
+                xps_d = xps[:, 1:len(d_array)+1]
+                eps = 1.
+            poly = xps_d.dot(d_array)
+            denominator = eps + np.abs(poly)
+            d_denominator = xps_d * np.sign(poly)[:, None]
+        jacobian = np.empty((len(xdata), len(params)))
+        np.divide(xps[:, :nb_num], denominator[:, None],
+                  out=jacobian[:, :nb_num])
+        np.multiply(d_denominator, (- numerator / denominator ** 2)[:, None],
+                    out=jacobian[:, nb_num:])
+        return jacobian
+    return jac
+
+
+def _linear_initialization(xdata, ydata, degrees, version, max_iter=10,
+                           tol=1e-8, weights=None):
+    """
+    Initial coefficients for the least-squares fit, found by \
+    Sanathanan-Koerner iterations: the linearized problem P(x) - y.Q(x) = 0 \
+    is solved by weighted linear least squares, weighted by the previous \
+    1/Q(x)^2. The denominator is taken without its absolute value(s) and \
+    normalized to Q(0) = 1, version A is fitted on the powers of |x|.
+    The optional `weights` of the points multiply these weights.
+    """
+    nb_num = degrees[0] + 1
+    vander_num = np.vander(xdata, nb_num, increasing=True)
+    if version == "A":
+        features = np.vander(np.abs(xdata), degrees[1] + 1,
+                             increasing=True)[:, 1:]
+    else:
+        features = np.vander(xdata, degrees[1] + 1, increasing=True)[:, 1:]
+    system = np.hstack([vander_num, - ydata[:, None] * features])
+    if weights is None:
+        weights = np.ones_like(ydata)
+    point_weights = weights
+    params = np.zeros(system.shape[1])
+    for _ in range(max_iter):
+        sqrt_w = np.sqrt(weights)
+        new_params = np.linalg.lstsq(system * sqrt_w[:, None],
+                                     ydata * sqrt_w, rcond=None)[0]
+        if not np.all(np.isfinite(new_params)):
+            break
+        converged = np.abs(new_params - params).max() < tol
+        params = new_params
+        if converged:
+            break
+        denominator = np.abs(1. + features.dot(params[nb_num:]))
+        weights = point_weights / np.maximum(denominator, 1e-3) ** 2
+    if version == "A":
+        # only |b_i| matter in version A
+        params[nb_num:] = np.abs(params[nb_num:])
+    elif version == "C":
+        # 0.1 + |b_0 + b_1.x + ...| = 1 + b_1.x + ... for b_0 = 0.9
+        params = np.insert(params, nb_num, 0.9)
+    return params
+
+
+def _curve_fit(f, xdata, ydata, degrees, version, p0=None, absolute_sigma=False,
+               method=None, jac=None, weights=None, **kwargs):
+    from scipy.optimize import OptimizeWarning, leastsq
     method = 'lm'
 
     ydata = np.asarray_chkfinite(ydata, float)
@@ -34,11 +119,28 @@ def _curve_fit(f, xdata, ydata, degrees, version, p0=None, absolute_sigma=False,
         # non-array_like `xdata`.
         xdata = np.asarray_chkfinite(xdata, float)
 
+    if weights is not None:
+        weights = np.asarray_chkfinite(weights, float)
+
+    if p0 is None:
+        p0 = _linear_initialization(xdata, ydata, degrees, version,
+                                    weights=weights)
+        if not np.all(np.isfinite(p0)):
+            p0 = np.ones_like(p0)
+
     func = _wrap_func(f, xdata, ydata, degrees)  # Modification here  !!!
     if callable(jac):
-        jac = _wrap_jac(jac, xdata, None)
-    elif jac is None and method != 'lm':
-        jac = '2-point'
+        jac = _wrap_jac(jac, xdata, degrees)
+    elif jac is None and version in ["A", "B", "C", "D"]:
+        jac = _rational_jacobian(xdata, degrees, version)
+    else:
+        # '2-point', estimated by finite differences in MINPACK
+        jac = None
+    if weights is not None:
+        # weighted least squares: residuals (and jacobian rows) * sqrt(w)
+        func = _wrap_weights(func, np.sqrt(weights))
+        if jac is not None:
+            jac = _wrap_weights(jac, np.sqrt(weights)[:, None])
 
     if 'args' in kwargs:
         raise ValueError("'args' is not a supported keyword argument.")
@@ -76,23 +178,169 @@ def _curve_fit(f, xdata, ydata, degrees, version, p0=None, absolute_sigma=False,
         return popt, pcov
 
 
-def fit_rational_to_base_function(rational_func, ref_func, x, degrees=(5, 4), version="A"):
+def fit_rational_to_base_function(rational_func, ref_func, x, degrees=(5, 4), version="A",
+                                  weights=None):
+    """
+    Finds the coefficients of the rational function approximating `ref_func` \
+    on `x`, by least squares (weighted by `weights` if provided, e.g. the \
+    frequencies of the histogram bins `x`).
+    """
     y = ref_func(x)
     final_params = _curve_fit(rational_func, x, y, degrees=degrees, version=version,
-                              maxfev=10000000)[0]
+                              weights=weights, maxfev=10000000)[0]
     return np.array(final_params[:degrees[0]+1]), np.array(final_params[degrees[0]+1:])
 
 
-def find_closest_equivalent(rational_func, new_func, x):
-    initials = np.array([1., 0., 1., 0.]) # a, b, c, d
-    y = rational_func(x)
+def find_closest_equivalent(rational_func, new_func, x, weights=None,
+                            initials=None, y=None):
+    """
+    Finds a, b, c, d such that a * new_func(c * x + d) + b is as close as \
+    possible to rational_func on x. If `weights` (e.g. the frequencies of \
+    the histogram bins `x`) are provided, the fit and the returned distance \
+    are weighted by them. The fit starts from `initials` (a, b, c, d) if \
+    provided, e.g. the result of a previous fit. If the outputs `y` of the \
+    rational function on x are provided, rational_func is not evaluated.
+    """
+    if initials is None:
+        initials = np.array([1., 0., 1., 0.]) # a, b, c, d
     from scipy.optimize import curve_fit
-    import torch
+    sigma = None
+    if weights is not None:
+        weights = np.asarray(weights, float)
+        # points that never occur do not constrain the fit
+        x = np.asarray(x)[weights > 0]
+        if y is not None:
+            y = np.asarray(y)[weights > 0]
+        weights = weights[weights > 0]
+        sigma = 1. / np.sqrt(weights)
+    if y is None:
+        y = rational_func(x)
 
     def equivalent_func(x_array, a, b, c, d):
         return a * new_func(c * x_array + d) + b
-    params = curve_fit(equivalent_func, x, y, initials)
+    params = curve_fit(equivalent_func, x, y, initials, sigma=sigma)
     a, b, c, d = params[0]
     final_func_output = np.array(equivalent_func(x, a, b, c, d))
-    final_distance = np.sqrt(((y - final_func_output)**2).sum())
+    if weights is None:
+        final_distance = np.sqrt(((y - final_func_output)**2).sum())
+    else:
+        final_distance = np.sqrt((weights * (y - final_func_output)**2).sum())
     return (a, b, c, d), final_distance
+
+
+def _output_drift(x, weights, y, old_x, old_y):
+    """
+    Returns the weighted distance between y and old_y (on old_x), \
+    interpolated on x.
+    """
+    old_y = np.interp(x, old_x, old_y)
+    return np.sqrt((weights * (y - old_y) ** 2).sum())
+
+
+def _distribution_drift(x, weights, y, previous):
+    """
+    Returns the total variation between the (normalized) weights of x and \
+    the previous ones, and the weighted distance between y and the previous \
+    y, both interpolated on x.
+    """
+    old_weights = np.interp(x, previous["x"], previous["weights"],
+                            left=0., right=0.)
+    normalized = weights / weights.sum()
+    old_normalized = old_weights / previous["weights"].sum()
+    # the previous mass outside of x counts as moved
+    total_variation = 0.5 * (np.abs(normalized - old_normalized).sum()
+                             + 1. - old_normalized.sum())
+    output_drift = _output_drift(x, weights, y, previous["x"], previous["y"])
+    return total_variation, output_drift
+
+
+def incremental_best_fit(rational_func, functions, x, weights=None,
+                         previous=None, drift_tolerance=1e-3,
+                         prune_tolerance=0.05):
+    """
+    Finds the function of `functions` closest to rational_func (see \
+    :func:`find_closest_equivalent`), reusing the result of a previous call \
+    to make periodic refits (e.g. during training) nearly free:
+
+    - if the input distribution (`x`, `weights`) and the rational outputs \
+      barely changed, the previous result is returned without any fit,
+    - every fit is warm-started from the previous (a, b, c, d),
+    - a candidate is skipped if its last distance, minus the change of the \
+      rational outputs since that fit (triangle inequality), cannot beat the \
+      current best one. The change is measured from the outputs the \
+      candidate was last fitted on, not from the previous call, so the bound \
+      holds over any number of skipped calls. It is exact for an unchanged \
+      distribution, it is therefore only used if the distribution moved by \
+      less than `prune_tolerance` (total variation).
+
+    Arguments:
+            rational_func (callable):
+                The rational function.\n
+            functions (list of callable):
+                The candidate functions.\n
+            x (array):
+                The inputs, e.g. the bins of the input distribution.\n
+            weights (array):
+                The weights of `x`, e.g. the frequencies of the bins.\n
+                Default ``None``
+            previous (dict):
+                The state returned by the previous call.\n
+                Default ``None``
+            drift_tolerance (float):
+                Below this total variation of the distribution and relative \
+                change of the rational outputs, nothing is refitted.\n
+                Default ``1e-3``
+            prune_tolerance (float):
+                Maximum total variation of the distribution for candidates \
+                to be pruned.\n
+                Default ``0.05``
+    Returns:
+        tuple: (function, (a, b, c, d), distance, state), state to be \
+        passed as `previous` to the next call.
+    """
+    x = np.asarray(x, float)
+    weights = np.ones_like(x) if weights is None else np.asarray(weights, float)
+    y = np.asarray(rational_func(x), float)
+    fits = {}
+    total_variation, output_drift = np.inf, np.inf
+    if previous is not None:
+        fits = dict(previous["fits"])
+        total_variation, output_drift = _distribution_drift(x, weights, y,
+                                                            previous)
+        scale = np.sqrt((weights * y ** 2).sum())
+        best = previous["best"]
+        if total_variation < drift_tolerance and \
+                output_drift <= drift_tolerance * scale and best in functions:
+            params, distance = fits[best][:2]
+            return best, params, distance, previous
+    # previously closest candidates first, the best one gets found early
+    candidates = sorted(functions, key=lambda func: fits[func][1]
+                        if func in fits else -np.inf)
+    best, best_params, min_dist = None, None, np.inf
+    for func in candidates:
+        if func in fits and total_variation < prune_tolerance:
+            _, distance, fitted_x, fitted_y = fits[func]
+            # the distance can decrease by at most the drift since that fit
+            if distance - _output_drift(x, weights, y, fitted_x,
+                                        fitted_y) > min_dist:
+                continue
+        initials = fits[func][0] if func in fits else None
+        try:
+            params, distance = find_closest_equivalent(rational_func, func, x,
+                                                       weights, initials)
+        except RuntimeError:
+            params, distance = None, np.inf
+        if params is None and initials is not None:
+            # the previous optimum may be a bad start after a large drift
+            try:
+                params, distance = find_closest_equivalent(rational_func,
+                                                           func, x, weights)
+            except RuntimeError:
+                pass
+        # failed fits are kept (infinite distance), to be pruned next time,
+        # with the outputs they were fitted on for the bound
+        fits[func] = (params, distance, x, y)
+        if distance < min_dist:
+            best, best_params, min_dist = func, params, distance
+    state = {"x": x, "weights": weights, "y": y, "fits": fits, "best": best}
+    return best, best_params, min_dist, state
@@ -0,0 +1,72 @@
+"""
+Compares the initialization of the rational least-squares fit: the linearized
+(Sanathanan-Koerner) initial coefficients against the former ``np.ones`` on
+every entry of ``scripts/compute_all_weights.py``.
+
+usage: python scripts/benchmarks/fit_initialization.py [--points 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
+    Rational_version_C
+from rational.utils.utils import _curve_fit
+
+
+def swish(x):
+    return x * torch.sigmoid(x)
+
+
+act_funcs = {"relu": F.relu, "leaky_relu": F.leaky_relu, "tanh": torch.tanh,
+             "gelu": F.gelu, "sigmoid": torch.sigmoid, "swish": swish}
+rational_funcs = {"A": Rational_version_A, "B": Rational_version_B,
+                  "C": Rational_version_C, "D": Rational_version_B}
+
+
+def run_fit(version, x, y, degrees, p0):
+    start = time.perf_counter()
+    try:
+        _, _, infodict, _, _ = _curve_fit(rational_funcs[version], x, y,
+                                          degrees=degrees, version=version,
+                                          p0=p0, maxfev=10000000,
+                                          full_output=True)
+    except RuntimeError:
+        return time.perf_counter() - start, None, None
+    rmse = np.sqrt(np.mean(infodict["fvec"] ** 2))
+    return time.perf_counter() - start, infodict["nfev"], rmse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=100000)
+    args = parser.parse_args()
+    degrees = (5, 4)
+    lb, ub = -3., 3.
+    x = np.arange(lb, ub, (ub - lb) / args.points)
+    totals = {"ones": [0., 0], "linear": [0., 0]}
+    print(f"{'function':<12}{'version':<9}{'init':<8}{'time (s)':>10}"
+          f"{'nfev':>9}{'rmse':>12}")
+    for name, function in act_funcs.items():
+        y = function(torch.tensor(x)).numpy()
+        for version in rational_funcs:
+            nb_params = sum(degrees) + (2 if version == "C" else 1)
+            for init, p0 in [("ones", np.ones(nb_params)), ("linear", None)]:
+                duration, nfev, rmse = run_fit(version, x, y, degrees, p0)
+                totals[init][0] += duration
+                if nfev is None:
+                    totals[init][1] += 1
+                    print(f"{name:<12}{version:<9}{init:<8}{duration:>10.2f}"
+                          f"{'failed':>9}")
+                    continue
+                print(f"{name:<12}{version:<9}{init:<8}{duration:>10.2f}"
+                      f"{nfev:>9}{rmse:>12.2e}")
+    for init, (duration, failures) in totals.items():
+        print(f"{init}: total {duration:.2f}s, {failures} failed fits")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares the rational least-squares fit (as run by ``find_weights``) with the
+closed form jacobian against the finite differences estimation of MINPACK.
+
+usage: python scripts/benchmarks/fit_jacobian.py [--points 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from rational.numpy.rationals import Rational_version_A, Rational_version_B, \
+    Rational_version_C
+from rational.utils.utils import _curve_fit
+
+rational_funcs = {"A": Rational_version_A, "B": Rational_version_B,
+                  "C": Rational_version_C}
+
+
+def run_fit(version, x, y, degrees, jac):
+    start = time.perf_counter()
+    try:
+        _, _, infodict, _, _ = _curve_fit(rational_funcs[version], x, y,
+                                          degrees=degrees, version=version,
+                                          jac=jac, maxfev=10000000,
+                                          full_output=True)
+    except RuntimeError:
+        return time.perf_counter() - start, None, None
+    rmse = np.sqrt(np.mean(infodict["fvec"] ** 2))
+    return time.perf_counter() - start, infodict["nfev"], rmse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--versions", default="ABC")
+    args = parser.parse_args()
+    lb, ub = -3., 3.
+    x = np.arange(lb, ub, (ub - lb) / args.points)
+    functions = {"gelu": F.gelu, "tanh": torch.tanh,
+                 "sigmoid": torch.sigmoid}
+    print(f"{'function':<10}{'version':<9}{'jacobian':<12}{'time (s)':>10}"
+          f"{'nfev':>9}{'rmse':>12}")
+    for name, function in functions.items():
+        y = function(torch.tensor(x)).numpy()
+        for version in args.versions:
+            for jac in [None, "2-point"]:
+                duration, nfev, rmse = run_fit(version, x, y, (5, 4), jac)
+                label = "analytic" if jac is None else jac
+                if nfev is None:
+                    print(f"{name:<10}{version:<9}{label:<12}{duration:>10.2f}"
+                          f"{'failed':>9}")
+                    continue
+                print(f"{name:<10}{version:<9}{label:<12}{duration:>10.2f}"
+                      f"{nfev:>9}{rmse:>12.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Checks the import time of the rational packages against a budget, using
+``python -X importtime``. Every module is imported in a fresh interpreter.
+
+usage: python scripts/benchmarks/import_time.py [--repeat 5]
+Exits with 1 if a module exceeds its budget.
+"""
+import argparse
+import subprocess
+import sys
+
+# cumulative import time budgets, in milliseconds
+BUDGETS = {
+    "rational": 50,
+    "rational.utils": 50,
+    "rational.numpy": 50,
+    "rational.torch": 50,
+    "rational.keras": 50,
+    "rational.mxnet": 50,
+    "rational.jax": 50,
+}
+
+# heavy modules, only reported for comparison
+REFERENCES = ["rational.utils.find_init_weights", "rational.torch.rationals"]
+
+
+def import_time(module):
+    """
+    Returns the cumulative import time of `module` (in ms) or None if it
+    could not be imported.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           f"import {module}"],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    if proc.returncode != 0:
+        return None
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000.
+    return None
+
+
+def best_import_time(module, repeat):
+    times = [import_time(module) for _ in range(repeat)]
+    if None in times:
+        return None
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    over_budget = []
+    for module, budget in BUDGETS.items():
+        duration = best_import_time(module, args.repeat)
+        if duration is None:
+            print(f"{module:<40} could not be imported")
+            over_budget.append(module)
+            continue
+        status = "ok" if duration <= budget else "OVER BUDGET"
+        print(f"{module:<40} {duration:>9.2f} ms (budget {budget} ms) {status}")
+        if duration > budget:
+            over_budget.append(module)
+    for module in REFERENCES:
+        duration = best_import_time(module, 1)
+        if duration is not None:
+            print(f"{module:<40} {duration:>9.2f} ms (reference)")
+    if over_budget:
+        print(f"Import budget exceeded: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
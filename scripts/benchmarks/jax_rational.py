@@ -0,0 +1,73 @@
+"""
+Compares the throughput of the JAX rational activation functions (jit-compiled forward and
+backward, with the analytic gradients of `jax.custom_vjp`) against the pytorch CPU path
+(`Rational_PYTORCH_*_F`, differentiated by autograd), on CPU. The gradients are the ones of the
+coefficients, as torch cannot differentiate `torch.vander` with respect to the inputs.
+
+usage: python scripts/benchmarks/jax_rational.py [--shape 64 128 128]
+"""
+import argparse
+import time
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import torch
+
+from rational.jax import apply, init_params
+from rational.torch.rational_pytorch_functions import Rational_PYTORCH_A_F, \
+    Rational_PYTORCH_B_F, Rational_PYTORCH_C_F, Rational_PYTORCH_D_F
+
+torch_functions = {"A": Rational_PYTORCH_A_F, "B": Rational_PYTORCH_B_F,
+                   "C": Rational_PYTORCH_C_F, "D": Rational_PYTORCH_D_F}
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shape", type=int, nargs="+", default=[64, 128, 128])
+    parser.add_argument("--versions", nargs="+", default=["A", "B", "C", "D"])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+    inputs = np.random.default_rng(0).standard_normal(args.shape).astype(np.float32)
+    size = inputs.size
+    print(f"{'version':<9}{'torch':>12}{'jax':>12}{'jax channels':>14}  (M elements / s)")
+    for version in args.versions:
+        params = init_params(version=version)
+        numerator = torch.tensor(np.asarray(params["numerator"]), requires_grad=True)
+        denominator = torch.tensor(np.asarray(params["denominator"]), requires_grad=True)
+        x_torch = torch.tensor(inputs)
+
+        def torch_step():
+            outputs = torch_functions[version](x_torch, numerator, denominator, True)
+            outputs.backward(torch.ones_like(outputs))
+
+        def loss(p, x, key):
+            return jnp.sum(apply(p, x, version, axis=1, key=key))
+
+        gradient = jax.jit(jax.grad(loss))
+        x_jax = jnp.asarray(inputs)
+        key = jax.random.PRNGKey(0) if version == "D" else None
+        per_channel = init_params(version=version, channels=args.shape[1])
+
+        def jax_step(p=params):
+            jax.block_until_ready(gradient(p, x_jax, key))
+
+        throughputs = [size / timeit(torch_step, args.repeats) / 1e6,
+                       size / timeit(jax_step, args.repeats) / 1e6,
+                       size / timeit(lambda: jax_step(per_channel), args.repeats) / 1e6]
+        print(f"{version:<9}{throughputs[0]:>12.1f}{throughputs[1]:>12.1f}"
+              f"{throughputs[2]:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
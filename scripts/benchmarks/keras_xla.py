@@ -0,0 +1,67 @@
+"""
+Compares the throughput of the Keras rational activation functions (forward and backward) in
+eager mode, in a tf.function and in a tf.function compiled by XLA (jit_compile=True), on cpu,
+for the float32 and mixed precision policies.
+
+usage: python scripts/benchmarks/keras_xla.py [--shape 64 128 128]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import numpy as np  # noqa: E402
+import tensorflow as tf  # noqa: E402
+
+from rational.keras import Rational  # noqa: E402
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shape", type=int, nargs="+", default=[64, 128, 128])
+    parser.add_argument("--versions", nargs="+", default=["A", "B", "C", "D"])
+    parser.add_argument("--policies", nargs="+",
+                        default=["float32", "mixed_bfloat16"])
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+    x = np.random.default_rng(0).standard_normal(args.shape).astype(np.float32)
+    size = np.prod(args.shape)
+    print(f"{'version':<9}{'policy':<16}{'eager':>10}{'function':>10}{'xla':>10}"
+          "  (M elements / s)")
+    with tf.device("/CPU:0"):
+        for policy in args.policies:
+            for version in args.versions:
+                rational = Rational(version=version, dtype=policy)
+                inputs = tf.cast(x, rational.compute_dtype)
+
+                def step(inputs):
+                    with tf.GradientTape() as tape:
+                        tape.watch(inputs)
+                        outputs = rational(inputs, training=True)
+                        loss = tf.reduce_sum(tf.cast(outputs, tf.float32))
+                    return tape.gradient(loss, [inputs, rational.numerator,
+                                                rational.denominator])
+
+                throughputs = []
+                for function in [step, tf.function(step),
+                                 tf.function(step, jit_compile=True)]:
+                    elapsed = timeit(lambda: [gradient.numpy() for gradient
+                                              in function(inputs)], args.repeats)
+                    throughputs.append(size / elapsed / 1e6)
+                print(f"{version:<9}{policy:<16}" +
+                      "".join(f"{throughput:>10.1f}" for throughput in throughputs))
+
+
+if __name__ == '__main__':
+    main()
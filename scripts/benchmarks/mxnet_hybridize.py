@@ -0,0 +1,73 @@
+"""
+Compares the throughput of the MXNet rational activation functions (forward and backward),
+imperative against hybridized (static graph, `hybridize(static_alloc=True, static_shape=True)`),
+with the functions of `F` and with the fused operator (`fused=True`), and exports the hybridized
+block. Version D is measured for every noise granularity.
+
+usage: python scripts/benchmarks/mxnet_hybridize.py [--shape 64 128 128]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import mxnet as mx
+from mxnet import autograd
+
+from rational.mxnet import Rational
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shape", type=int, nargs="+", default=[64, 128, 128])
+    parser.add_argument("--versions", nargs="+", default=["A", "B", "C", "D"])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--gpu", action="store_true")
+    args = parser.parse_args()
+    ctx = mx.gpu() if args.gpu else mx.cpu()
+    x = mx.nd.random.normal(shape=args.shape, ctx=ctx)
+    x.attach_grad()
+    size = x.size
+    print(f"{'version':<9}{'noise':<13}{'imperative':>12}{'hybridized':>12}"
+          f"{'fused':>12}{'fused hyb.':>12}  (M elements / s)")
+    configurations = [(version, "coefficient") for version in args.versions if version != "D"]
+    if "D" in args.versions:
+        configurations += [("D", noise) for noise in ["call", "coefficient", "element"]]
+    for version, noise in configurations:
+        throughputs = []
+        for fused, hybridize in [(False, False), (False, True), (True, False), (True, True)]:
+            if fused and noise == "element":
+                throughputs.append(float("nan"))
+                continue
+            rational = Rational(version=version, cuda=args.gpu, noise=noise, fused=fused)
+            rational.initialize(ctx=ctx)
+            if hybridize:
+                rational.hybridize(static_alloc=True, static_shape=True)
+
+            def step():
+                with autograd.record():
+                    outputs = rational(x)
+                outputs.backward()
+                mx.nd.waitall()
+
+            throughputs.append(size / timeit(step, args.repeats) / 1e6)
+        label = noise if version == "D" else ""
+        print(f"{version:<9}{label:<13}" + "".join(f"{throughput:>12.1f}"
+                                                   for throughput in throughputs))
+        with tempfile.TemporaryDirectory() as directory:
+            rational.export(os.path.join(directory, "rational"))
+            assert os.path.exists(os.path.join(directory, "rational-symbol.json"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares the evaluation of the numpy rational functions: the Horner's scheme
+of `rational.numpy.rationals` (blocked, with reused `out` and scratch arrays)
+against the former evaluation with the powers of x (copied below), in float64
+and float32.
+
+usage: python scripts/benchmarks/numpy_horner.py [--sizes 1000 100000 10000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rational.numpy.rationals import rational_horner
+
+
+def former_version_A(x, w_array, d_array):
+    xi = np.ones_like(x)
+    P = np.ones_like(x) * w_array[0]
+    for i in range(len(w_array) - 1):
+        xi *= x
+        P += w_array[i+1] * xi
+    xi = np.ones_like(x)
+    Q = np.ones_like(x)
+    for i in range(len(d_array)):
+        xi *= x
+        Q += np.abs(d_array[i] * xi)
+    return P/Q
+
+
+def former_version_B(x, w_array, d_array):
+    xi = np.ones_like(x)
+    P = np.ones_like(x) * w_array[0]
+    for i in range(len(w_array) - 1):
+        xi *= x
+        P += w_array[i+1] * xi
+    xi = np.ones_like(x)
+    Q = np.zeros_like(x)
+    for i in range(len(d_array)):
+        xi *= x
+        Q += d_array[i] * xi
+    Q = np.abs(Q) + np.ones_like(Q)
+    return P/Q
+
+
+def former_version_C(x, w_array, d_array):
+    xi = np.ones_like(x)
+    P = np.ones_like(x) * w_array[0]
+    for i in range(len(w_array) - 1):
+        xi *= x
+        P += w_array[i+1] * xi
+    xi = np.ones_like(x)
+    Q = np.zeros_like(x)
+    for i in range(len(d_array)):
+        Q += d_array[i] * xi  # Here b0 is considered
+        xi *= x
+    Q = np.abs(Q) + np.full_like(Q, 0.1)
+    return P/Q
+
+
+former = {"A": former_version_A, "B": former_version_B, "C": former_version_C}
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 100000, 10000000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    numerator = list(rng.standard_normal(6))
+    print(f"{'version':<9}{'dtype':<9}{'size':>10}{'former (ms)':>13}"
+          f"{'horner (ms)':>13}{'speedup':>9}  output dtype (former, horner)")
+    for version in ["A", "B", "C"]:
+        denominator = list(rng.standard_normal(5 if version == "C" else 4))
+        for dtype in [np.float64, np.float32]:
+            for size in args.sizes:
+                x = rng.standard_normal(size).astype(dtype)
+                out = np.empty_like(x)
+                scratch = np.empty(min(size, 65536), dtype)
+                former_time = timeit(lambda: former[version](x, numerator,
+                                                             denominator),
+                                     args.repeats)
+                horner_time = timeit(lambda: rational_horner(
+                    x, numerator, denominator, version, out, scratch),
+                    args.repeats)
+                former_dtype = former[version](x, numerator, denominator).dtype
+                print(f"{version:<9}{np.dtype(dtype).name:<9}{size:>10}"
+                      f"{former_time * 1e3:>13.3f}{horner_time * 1e3:>13.3f}"
+                      f"{former_time / horner_time:>9.1f}  "
+                      f"{former_dtype}, {out.dtype}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compares the single threaded evaluation of the numpy rational functions with
+the threaded one of `rational_parallel`, in memory and out of core (memory
+mapped `.npy` files).
+
+usage: python scripts/benchmarks/numpy_threads.py [--size 50000000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from rational.numpy import Rational
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=50000000)
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    rational = Rational("leaky_relu", version="A")
+    x = np.random.default_rng(0).standard_normal(args.size).astype(np.float32)
+    out = np.empty_like(x)
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "x.npy")
+        output_path = os.path.join(directory, "y.npy")
+        np.save(input_path, x)
+        print(f"{'threads':>7}{'in memory (ms)':>16}{'memmap (ms)':>13}")
+        for threads in sorted(set(args.threads)):
+            memory_time = timeit(lambda: rational(x, out, threads),
+                                 args.repeats)
+            memmap_time = timeit(lambda: rational.transform_file(
+                input_path, output_path, threads), args.repeats)
+            print(f"{threads:>7}{memory_time * 1e3:>16.1f}"
+                  f"{memmap_time * 1e3:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
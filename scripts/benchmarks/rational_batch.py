@@ -0,0 +1,65 @@
+"""
+Compares the evaluation of K rational functions on the same inputs: K
+separate `Rational` calls against one `rational_batch` call, in numpy and in
+torch (on cpu).
+
+usage: python scripts/benchmarks/rational_batch.py [--ks 1 10 100 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from rational.numpy import rational_batch as numpy_batch
+from rational.numpy.rationals import rational_horner
+from rational.torch import rational_batch as torch_batch
+from rational.torch.rational_pytorch_functions import Rational_PYTORCH_A_F
+
+
+def timeit(function, repeats):
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ks", type=int, nargs="+",
+                        default=[1, 10, 100, 1000])
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    x = np.linspace(-3., 3., args.size)
+    x_torch = torch.tensor(x)
+    print(f"{'K':>6}{'numpy loop (ms)':>17}{'numpy batch (ms)':>18}"
+          f"{'torch loop (ms)':>17}{'torch batch (ms)':>18}")
+    for k in args.ks:
+        numerators = rng.standard_normal((k, 6))
+        denominators = rng.standard_normal((k, 4))
+        num_torch = torch.tensor(numerators)
+        den_torch = torch.tensor(denominators)
+        numpy_loop = timeit(lambda: np.stack([
+            rational_horner(x, num, den, "A")
+            for num, den in zip(numerators, denominators)]), args.repeats)
+        numpy_batched = timeit(lambda: numpy_batch(x, numerators,
+                                                   denominators, "A"),
+                               args.repeats)
+        with torch.no_grad():
+            torch_loop = timeit(lambda: torch.stack([
+                Rational_PYTORCH_A_F(x_torch, num, den, False)
+                for num, den in zip(num_torch, den_torch)]), args.repeats)
+            torch_batched = timeit(lambda: torch_batch(x_torch, num_torch,
+                                                       den_torch, "A"),
+                                   args.repeats)
+        print(f"{k:>6}{numpy_loop * 1e3:>17.3f}{numpy_batched * 1e3:>18.3f}"
+              f"{torch_loop * 1e3:>17.3f}{torch_batched * 1e3:>18.3f}")
+
+
+if __name__ == '__main__':
+    main()